@@ -0,0 +1,286 @@
+# app/chunking.py
+"""Token-aware markdown / plain-text chunker for whole-document ingestion.
+
+Text arrives as a stream of lines. It is parsed into blocks (headings,
+paragraphs, fenced code) and packed into chunks of at most CHUNK_MAX_TOKENS
+embedding-model tokens. Consecutive chunks share CHUNK_OVERLAP_TOKENS worth of
+trailing blocks, except across headings, which always start a new chunk. A
+block longer than the limit is split on sentence boundaries, then on words. A
+run without whitespace that is still too long (inline base64, a long URL,
+minified JSON) is cut into fixed token windows. Everything is a generator:
+only the chunk being built and its overlap are held in memory. Tokenization
+is CPU work, so the async entry point feeds lines in batches to the ingestion
+embedding executor instead of running it on the event loop.
+"""
+from __future__ import annotations
+
+import codecs
+import re
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Callable, Iterator
+
+from app.config import settings
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+|\n")
+_LINES_PER_CALL = 256  # achunk_lines 가 executor 호출 한 번에 넘기는 줄 수
+
+
+@dataclass
+class Chunk:
+    index: int
+    text: str
+    tokens: int
+    section: str | None  # 가장 가까운 마크다운 제목
+
+
+def default_token_counter() -> Callable[[str], int]:
+    """임베딩 모델 토크나이저 기준 토큰 수 (특수 토큰 제외)"""
+    from app.embedding import get_model
+
+    tokenizer = get_model().tokenizer
+    return lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def default_token_windows() -> Callable[[str, int, int], list[str]] | None:
+    """(text, size, overlap) -> 토큰 id 를 size 개씩(overlap 만큼 겹침) 잘라 디코드한 조각들"""
+    from app.embedding import get_model
+
+    tokenizer = get_model().tokenizer
+
+    def windows(text: str, size: int, overlap: int) -> list[str]:
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        return [tokenizer.decode(ids[i:i + size]) for i in _window_starts(len(ids), size, overlap)]
+
+    return windows
+
+
+def _window_starts(n: int, size: int, overlap: int) -> range:
+    # 마지막 창이 끝까지 닿고, 오버랩 안에만 있는 빈 창은 만들지 않음
+    step = max(1, size - overlap)
+    return range(0, max(1, n - overlap), step)
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """바이트 스트림(요청 바디)을 UTF-8 줄 단위로. 멀티바이트 문자가 청크 경계에 걸려도 안전"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    async for raw in chunks:
+        buffer += decoder.decode(raw)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+class BlockParser:
+    """줄 단위 push → (블록 텍스트, 현재 섹션 제목, 제목 여부). 제목 줄도 하나의 블록으로 내보냄"""
+
+    def __init__(self):
+        self.section: str | None = None
+        self._paragraph: list[str] = []
+        self._fence: str | None = None
+
+    def push(self, line: str) -> list[tuple[str, str | None, bool]]:
+        line = line.rstrip("\r")
+        if self._fence is not None:
+            self._paragraph.append(line)
+            if line.strip().startswith(self._fence):
+                self._fence = None
+                return self._end_paragraph()
+            return []
+        fence = _FENCE.match(line)
+        if fence:
+            out = self._end_paragraph()
+            self._paragraph, self._fence = [line], fence.group(1)
+            return out
+        heading = _HEADING.match(line)
+        if heading:
+            out = self._end_paragraph()
+            self.section = heading.group(2) or self.section
+            out.append((line.strip(), self.section, True))
+            return out
+        if not line.strip():
+            return self._end_paragraph()
+        self._paragraph.append(line)
+        return []
+
+    def close(self) -> list[tuple[str, str | None, bool]]:
+        return self._end_paragraph()
+
+    def _end_paragraph(self) -> list[tuple[str, str | None, bool]]:
+        if not self._paragraph:
+            return []
+        block = "\n".join(self._paragraph)
+        self._paragraph = []
+        return [(block, self.section, False)]
+
+
+class Chunker:
+    """블록을 받아 토큰 한도 안으로 묶는 상태 기계 (동기/비동기 입력 모두에서 사용)"""
+
+    def __init__(
+        self,
+        *,
+        max_tokens: int | None = None,
+        overlap_tokens: int | None = None,
+        count_tokens: Callable[[str], int] | None = None,
+        token_windows: Callable[[str, int, int], list[str]] | None = None,
+    ):
+        self.max_tokens = max_tokens or settings.chunk_max_tokens
+        self.overlap_tokens = min(
+            overlap_tokens if overlap_tokens is not None else settings.chunk_overlap_tokens,
+            self.max_tokens // 2,
+        )
+        # 기본 카운터(모델 토크나이저)는 첫 사용 시 로드: executor 스레드에서 로드되도록
+        self._count = count_tokens
+        # 기본 토크나이저를 쓸 때만 필요할 때 로드. 사용자 카운터면 문자 창으로 대체
+        self._windows = token_windows
+        self._default_windows = count_tokens is None
+        self._blocks: list[tuple[str, int]] = []
+        self._tokens = 0
+        self._section: str | None = None
+        self._has_new = False  # 오버랩 외에 새 내용이 들어왔는지
+        self._index = 0
+
+    def count(self, text: str) -> int:
+        if self._count is None:
+            self._count = default_token_counter()
+        return self._count(text)
+
+    def feed(self, block: str, section: str | None, *, heading: bool = False) -> Iterator[Chunk]:
+        """heading=True 면 새 섹션: 진행 중인 청크를 닫고 오버랩 없이 새로 시작"""
+        tokens = self.count(block)
+        if tokens > self.max_tokens:
+            # 조각은 다시 나누지 않음 (_split 이 한도 안으로 맞춤)
+            for piece in self._split(block):
+                yield from self._add(piece, self.count(piece), section)
+            return
+        yield from self._add(block, tokens, section, heading=heading)
+
+    def _add(self, block: str, tokens: int, section: str | None, *, heading: bool = False) -> Iterator[Chunk]:
+        if heading:
+            if self._has_new:
+                yield self._emit()
+            self._blocks, self._tokens = [], 0
+        elif self._tokens + tokens + 1 > self.max_tokens:
+            if self._has_new:
+                yield self._emit()
+            if self._tokens + tokens + 1 > self.max_tokens:
+                # 오버랩만으로도 한도를 넘으면 오버랩을 포기
+                self._blocks, self._tokens = [], 0
+        if not self._blocks:
+            self._section = section
+        self._blocks.append((block, tokens))
+        self._tokens += tokens + 1  # 블록 사이 빈 줄
+        self._has_new = True
+
+    def flush(self) -> Iterator[Chunk]:
+        if self._has_new:
+            yield self._emit()
+
+    def _emit(self) -> Chunk:
+        chunk = Chunk(
+            index=self._index,
+            text="\n\n".join(b for b, _ in self._blocks),
+            tokens=self._tokens,
+            section=self._section,
+        )
+        self._index += 1
+        # 다음 청크는 직전 청크의 마지막 블록들(overlap_tokens 이내)로 시작
+        tail: list[tuple[str, int]] = []
+        total = 0
+        for block, tokens in reversed(self._blocks):
+            if total + tokens + 1 > self.overlap_tokens:
+                break
+            tail.insert(0, (block, tokens))
+            total += tokens + 1
+        self._blocks, self._tokens, self._has_new = tail, total, False
+        return chunk
+
+    def _split(self, block: str) -> list[str]:
+        """한도를 넘는 블록: 문장 단위로 자르고, 그래도 긴 문장은 단어 창으로 자름"""
+        pieces: list[str] = []
+        for sentence in filter(None, (s.strip() for s in _SENTENCE_END.split(block))):
+            if self.count(sentence) <= self.max_tokens:
+                pieces.append(sentence)
+                continue
+            words = sentence.split()
+            # 단어당 토큰 수 추정으로 창 크기를 잡고, 넘으면 줄여 가며 맞춤
+            size = max(1, len(words) * self.max_tokens // max(1, self.count(sentence)))
+            start = 0
+            while start < len(words):
+                end = min(len(words), start + size)
+                while end - start > 1 and self.count(" ".join(words[start:end])) > self.max_tokens:
+                    end -= max(1, (end - start) // 10)
+                piece = " ".join(words[start:end])
+                if end - start == 1 and self.count(piece) > self.max_tokens:
+                    # 공백 없는 한 단어가 한도를 넘음: 고정 토큰 창으로
+                    pieces.extend(self._hard_windows(piece))
+                else:
+                    pieces.append(piece)
+                start = end
+        return pieces
+
+    def _hard_windows(self, text: str) -> list[str]:
+        if self._windows is None and self._default_windows:
+            self._windows = default_token_windows()
+        if self._windows is not None:
+            return [p for p in self._windows(text, self.max_tokens, self.overlap_tokens) if p.strip()]
+        # 토큰 id 를 모르는 카운터: 문자 창을 한도에 맞을 때까지 줄임 (최소 1자씩 진행)
+        pieces: list[str] = []
+        size = max(1, len(text) * self.max_tokens // max(1, self.count(text)))
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + size)
+            while end - start > 1 and self.count(text[start:end]) > self.max_tokens:
+                end = start + max(1, (end - start) * 9 // 10)
+            pieces.append(text[start:end])
+            start = end
+        return pieces
+
+
+def chunk_text(text: str, **kwargs) -> Iterator[Chunk]:
+    parser, chunker = BlockParser(), Chunker(**kwargs)
+    for line in text.splitlines():
+        for block, section, heading in parser.push(line):
+            yield from chunker.feed(block, section, heading=heading)
+    for block, section, heading in parser.close():
+        yield from chunker.feed(block, section, heading=heading)
+    yield from chunker.flush()
+
+
+async def achunk_lines(lines: AsyncIterable[str], **kwargs) -> AsyncIterator[Chunk]:
+    """스트리밍 입력용 `chunk_text`: 줄이 들어오는 대로 블록/청크를 만들어 흘려보냄.
+
+    파싱/토크나이즈는 줄 _LINES_PER_CALL 개씩 적재용 임베딩 executor 에서 실행
+    (한 번에 한 호출만 돌므로 parser/chunker 상태는 순서대로 갱신됨).
+    """
+    from app.embedding import get_background_batcher
+
+    run = get_background_batcher().run
+    parser, chunker = BlockParser(), Chunker(**kwargs)
+    batch: list[str] = []
+    async for line in lines:
+        batch.append(line)
+        if len(batch) >= _LINES_PER_CALL:
+            for chunk in await run(_feed_lines, parser, chunker, batch, False):
+                yield chunk
+            batch = []
+    for chunk in await run(_feed_lines, parser, chunker, batch, True):
+        yield chunk
+
+
+def _feed_lines(parser: BlockParser, chunker: Chunker, lines: list[str], final: bool) -> list[Chunk]:
+    out: list[Chunk] = []
+    for line in lines:
+        for block, section, heading in parser.push(line):
+            out.extend(chunker.feed(block, section, heading=heading))
+    if final:
+        for block, section, heading in parser.close():
+            out.extend(chunker.feed(block, section, heading=heading))
+        out.extend(chunker.flush())
+    return out
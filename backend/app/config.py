@@ -9,22 +9,143 @@ class Settings(BaseSettings):
     db_name: str
     db_user: str
     db_password: str
+    # 읽기 전용 복제본 (설정 시 벡터 검색만 이쪽으로). 계정/DB 이름은 primary 와 같다고 가정
+    db_read_host: str | None = None
+    db_read_port: int | None = None
+
+    # Connection pool (엔진마다 적용)
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 10             # 커넥션 대기 최대 초 (넘으면 에러로 빨리 실패)
+    db_pool_recycle: int = 1800             # 이보다 오래된 커넥션은 재연결 (pre-ping 대신 오래된 커넥션 정리)
+    db_pool_pre_ping: bool = False          # 체크아웃마다 왕복 1회 추가. DB/프록시가 idle 커넥션을 끊는 환경에서만 켬
+    db_statement_cache_size: int = 500      # asyncpg prepared statement 캐시 (pgbouncer transaction 모드면 0)
 
     # Embeddings
     embedding_model_name: str = "intfloat/multilingual-e5-large"
     embedding_dim: int = 1024
+    embedding_batch_max_size: int = 32      # 한 번의 encode 에 묶을 최대 텍스트 수
+    embedding_batch_max_wait_ms: float = 5.0  # 배치를 모으기 위해 기다리는 최대 시간
+    embedding_workers: int = 1              # encode 전용 스레드 수
+    # 추론 백엔드: torch | torch-int8 (Linear 동적 양자화) | onnx | openvino (sentence-transformers>=3.2)
+    embedding_backend: str = "torch"
+    embedding_backend_file: str | None = None  # onnx/openvino 파일, 예: onnx/model_qint8_avx512_vnni.onnx
+    # 저장/인덱스 형식 (변경 후 `python -m app.indexes migrate-storage`)
+    embedding_storage: str = "vector"       # vector(float32) | halfvec(float16)
+    embedding_quantization: str = "none"    # none | binary (bit 인덱스 + float 재정렬)
+    embedding_truncate_dim: int | None = None  # Matryoshka: 앞 N 차원만 저장 (재정규화)
+    binary_rerank_factor: int = 4           # binary 일 때 k * factor 후보를 float 거리로 재정렬
+
+    # Query embedding cache
+    query_cache_max_entries: int = 4096     # 0 이면 캐시 끔
+    query_cache_max_mb: float = 32.0
+    query_cache_ttl_seconds: float = 0      # 0 이면 만료 없음
+    query_cache_backend: str = "memory"     # memory | postgres (워커 간 공유)
+
+    # Ingestion
+    ingest_batch_size: int = 64             # 벌크 적재 시 한 번에 인코딩/커밋할 문서 수
+    ingest_embed_batch_size: int = 16       # 적재용 encode 단위 (작을수록 질의가 끼어들 틈이 많음)
+    ingest_embedding_workers: int = 1       # 적재 전용 encode 스레드 수
+    ingest_yield_max_ms: float = 200        # 질의 인코딩 중이면 적재 encode 를 최대 이만큼 미룸
+    chunk_max_tokens: int = 400             # 원문 청킹: 임베딩 모델 토큰 기준 (e5 한도 512)
+    chunk_overlap_tokens: int = 50          # 인접 청크가 겹치는 토큰 수
+
+    # Ingestion jobs (app/jobs.py, /jobs)
+    job_workers: int = 1                    # 이 프로세스의 작업 워커 수 (0 이면 API 만)
+    job_poll_interval_seconds: float = 1.0
+    job_stale_seconds: float = 60           # 하트비트가 이보다 오래되면 다른 워커가 다시 가져감
+    job_max_attempts: int = 3
+
+    # Startup (app/warmup.py)
+    model_preload: str = "blocking"         # blocking (준비 후 서비스) | background (/readyz 로 구분) | off (첫 요청에 로드)
+    schema_on_startup: bool = True          # create_all + 컬럼 보강 (마이그레이션을 따로 돌리면 false 로 부팅 단축)
+
+    # Telemetry (app/telemetry.py)
+    server_timing_enabled: bool = True      # 응답에 Server-Timing 헤더 (span 별 ms)
+    otel_enabled: bool = False              # OpenTelemetry OTLP 내보내기 (OTEL_EXPORTER_OTLP_ENDPOINT)
+    otel_service_name: str = "rag-backend"
 
     # OpenAI
     openai_api_key: str | None = None
     openai_model_name: str = "gpt-4o-mini"
     openai_temperature: float = 0.3
+    openai_timeout_seconds: float = 60
+    openai_max_retries: int = 2             # SDK 자체 재시도 (429/5xx). 소진 후 429 는 LLM_RATE_LIMIT_COOLDOWN 으로
+
+    # LLM providers (app/llm): 동시 실행 제한 + 모델 라우팅
+    llm_provider: str = "openai"            # openai | fake (오프라인 개발/벤치마크)
+    llm_routes: list[dict] = []             # 프롬프트 크기별 모델, 예: [{"max_prompt_tokens": 1500, "model": "gpt-4.1-nano"}]
+    llm_max_concurrency: int = 16           # provider 별 동시 호출 수
+    llm_max_queue: int = 64                 # 슬롯을 기다릴 수 있는 요청 수 (넘으면 429 + Retry-After)
+    llm_queue_timeout_seconds: float = 10   # 대기열에서 이보다 오래 기다리면 429
+    llm_rate_limit_cooldown_seconds: float = 5  # 업스트림 429 에 Retry-After 가 없을 때 새 호출을 거절하는 시간
+    llm_http_max_connections: int = 32      # 공유 httpx 커넥션 풀
+    llm_http_keepalive_seconds: float = 60
+    fake_llm_ttft_ms: float = 300
+    fake_llm_tokens_per_sec: float = 60
+    fake_llm_reply_tokens: int = 120
 
     # RAG
     top_k: int = 5
     max_tokens: int = 512
+    search_mode: str = "vector"             # vector | hybrid (ANN + pg_trgm, RRF)
+    hybrid_candidates: int = 50             # 하이브리드에서 각 후보 목록 크기
+    hybrid_trgm_threshold: float = 0.3      # pg_trgm.word_similarity_threshold
+    rrf_k: int = 60
+    search_batch_max_queries: int = 64      # POST /documents/search/batch 한 번에 받는 최대 질의 수
+
+    # Prompt token budget (app/prompt.py, OPENAI_MODEL_NAME 의 tiktoken 인코딩 기준)
+    prompt_input_budget: int = 4000         # system + 히스토리 + 컨텍스트 + 질문
+    prompt_context_max_tokens: int = 2000   # 검색 청크에 쓸 최대 토큰
+    prompt_chunk_max_tokens: int = 500      # 청크 하나당 최대 토큰 (넘으면 절단)
+
+    # Conversation summary (services/summary.py, ChatSession.meta["summary"])
+    summary_enabled: bool = True
+    summary_trigger_messages: int = 12      # 요약 안 된 메시지가 이보다 많으면 압축
+    summary_keep_messages: int = 6          # 압축 후에도 원문으로 남기는 최근 메시지 수
+    summary_max_tokens: int = 300           # 요약문 최대 출력 토큰
+    summary_input_max_tokens: int = 6000    # 압축 1회에 넣는 메시지 토큰 상한 (나머지는 다음 압축에서)
+
+    # Re-ranking (app/reranker.py): ANN 후보 RERANK_CANDIDATES 개 → cross-encoder → 상위 top_k
+    rerank_enabled: bool = False            # 요청별로 ChatRequest.rerank / ?rerank= 로 덮어씀
+    rerank_model_name: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # 다국어(한국어 포함), CPU 용 소형
+    rerank_candidates: int = 30
+    rerank_min_score: float = 0.1           # 이 점수(0~1) 미만 청크는 버림 → 관련 문서가 없으면 컨텍스트 없이 답변
+    rerank_batch_size: int = 32
+    rerank_max_length: int = 512            # (질의, 청크) 쌍 최대 토큰
+
+    # Answer cache (첫 턴 답변 재사용, services/answer_cache.py)
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95    # 질의 임베딩 코사인 유사도 하한
+    answer_cache_ttl_seconds: float = 86400  # 0 이면 만료 없음
+
+    # Vector index (python -m app.indexes build|rebuild|status)
+    vector_index_type: str = "hnsw"         # hnsw | ivfflat | none
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40                # 커넥션 기본값, 요청별로 SET LOCAL 로 덮어씀
+    ivfflat_lists: int = 100
+    ivfflat_probes: int = 10
+    index_maintenance_work_mem: str = "512MB"
+    create_indexes_on_startup: bool = False  # 큰 테이블에서 부팅을 막지 않도록 기본은 CLI 로 생성
+
+    # Metadata filter (metadata @> filter)
+    filter_strategy: str = "auto"           # auto | partial | exact | iterative
+    filter_exact_max_rows: int = 2000       # 매칭 행이 이 이하면 HNSW 대신 정확 검색
+    filter_ef_search: int = 200             # iterative 전략의 hnsw.ef_search
+    filter_stats_ttl_seconds: float = 60    # 필터별 매칭 건수 추정 캐시
+    filter_stats_max_entries: int = 1024    # 위 캐시의 최대 필터 수 (LRU)
+    hot_filters: list[dict] = []            # 부분 HNSW 인덱스를 만들 필터, 예: [{"lang":"ko"}]
 
     model_config = SettingsConfigDict(env_file=".env")
 
+    @property
+    def embedding_store_dim(self) -> int:
+        """docs.embedding 에 실제로 저장되는 차원"""
+        if self.embedding_truncate_dim:
+            return min(self.embedding_truncate_dim, self.embedding_dim)
+        return self.embedding_dim
+
     @property
     def database_url(self) -> str:
         return (
@@ -32,4 +153,13 @@ class Settings(BaseSettings):
             f"@{self.db_host}:{self.db_port}/{self.db_name}"
         )
 
+    @property
+    def read_database_url(self) -> str | None:
+        if not self.db_read_host:
+            return None
+        return (
+            f"postgresql+asyncpg://{self.db_user}:{self.db_password}"
+            f"@{self.db_read_host}:{self.db_read_port or self.db_port}/{self.db_name}"
+        )
+
 settings = Settings()
\ No newline at end of file
@@ -1,16 +1,345 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from app.config import settings
+from app.embedding_cache import cache_key, get_query_cache, lookup_shared, normalize_query, store_shared
+from app.telemetry import record, traced
 
 _model: SentenceTransformer | None = None
+_model_lock = threading.Lock()  # 워밍업 스레드와 요청 encode 스레드가 동시에 로드하지 않도록
 
 def get_model() -> SentenceTransformer:
     global _model
     if _model is None:
-        _model = SentenceTransformer(settings.embedding_model_name)
+        with _model_lock:
+            if _model is None:
+                _model = load_model()
     return _model
 
+def load_model(backend: str | None = None) -> SentenceTransformer:
+    """EMBEDDING_BACKEND 에 맞춰 로드. 저장된 임베딩과 호환되도록 같은 모델의 가속 백엔드만 고름"""
+    backend = backend or settings.embedding_backend
+    name = settings.embedding_model_name
+    if backend in ("onnx", "openvino"):
+        model_kwargs = {"file_name": settings.embedding_backend_file} if settings.embedding_backend_file else None
+        return SentenceTransformer(name, device="cpu", backend=backend, model_kwargs=model_kwargs)
+    if backend not in ("torch", "torch-int8"):
+        raise ValueError(f"unknown embedding backend: {backend}")
+    model = SentenceTransformer(name)
+    if backend == "torch-int8":
+        import torch
+
+        # CPU 전용: Linear 가중치를 int8 로 (정확도 손실은 작고 encode 가 대략 2배 빠름)
+        model = torch.ao.quantization.quantize_dynamic(model.to("cpu"), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+def embedding_model_id() -> str:
+    """docs.embedding_model 에 기록되는 식별자: 바뀌면 기존 임베딩은 재계산 대상"""
+    if settings.embedding_store_dim != settings.embedding_dim:
+        return f"{settings.embedding_model_name}@{settings.embedding_store_dim}"
+    return settings.embedding_model_name
+
+def truncate_embeddings(vectors: np.ndarray, dim: int | None = None) -> np.ndarray:
+    """Matryoshka 절단: 앞 dim 차원만 남기고 다시 L2 정규화"""
+    dim = dim or settings.embedding_store_dim
+    if vectors.shape[-1] <= dim:
+        return vectors
+    cut = vectors[..., :dim]
+    norms = np.linalg.norm(cut, axis=-1, keepdims=True)
+    return cut / np.where(norms == 0, 1, norms)
+
 def embed_texts(texts: list[str]) -> list[list[float]]:
-    return get_model().encode(texts, normalize_embeddings=True).tolist()
+    vectors = get_model().encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    return truncate_embeddings(vectors).tolist()
 
 def embed_query(q: str) -> list[float]:
-    return embed_texts([q])[0]
\ No newline at end of file
+    return embed_texts([q])[0]
+
+
+class _Pending:
+    __slots__ = ("texts", "future", "encode_seconds", "failed")
+
+    def __init__(self, texts: list[str], future: asyncio.Future):
+        self.texts = texts
+        self.future = future
+        # 배치 encode 시간: 호출자 쪽에서 자기 요청의 span 으로 기록
+        self.encode_seconds: float | None = None
+        self.failed = False
+
+
+class EmbeddingBatcher:
+    """Runs `encode` on a dedicated executor and micro-batches concurrent callers.
+
+    Requests arriving within `max_wait_ms` of each other are merged into one
+    `encode` call of up to `max_batch_size` texts, so the event loop never blocks
+    on a forward pass and concurrent queries share one batch.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_batch_size: int,
+        max_wait_ms: float,
+        workers: int,
+        yield_to: "EmbeddingBatcher | None" = None,
+        yield_max_ms: float = 0.0,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.workers = max(1, workers)
+        # 백그라운드(적재) 배처: yield_to 가 바쁘면 최대 yield_max_ms 동안 인코딩을 미룸
+        self.yield_to = yield_to
+        self.yield_max = max(0.0, yield_max_ms) / 1000
+        self._executor: ThreadPoolExecutor | None = None
+        self._queue: asyncio.Queue[_Pending] | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._in_flight: set[asyncio.Task] = set()
+
+        # metrics
+        self.batches_total = 0
+        self.texts_total = 0
+        self.last_batch_size = 0
+        self.max_batch_size_seen = 0
+        self.yield_waits = 0
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._in_flight) or (self._queue is not None and not self._queue.empty())
+
+    def start(self) -> None:
+        if self._dispatcher is not None and not self._dispatcher.done():
+            return
+        self._executor = self._executor or ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="embed"
+        )
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        # 첫 요청 안에서 지연 시작되더라도 그 요청의 contextvars(요청 span, OTel 부모)를
+        # 물려받지 않도록 빈 컨텍스트에서 생성 (_run_batch 태스크도 이 컨텍스트를 상속)
+        self._dispatcher = contextvars.Context().run(asyncio.create_task, self._dispatch())
+
+    async def stop(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError("embedding batcher stopped"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def run(self, fn, *args):
+        """encode 외의 CPU 작업(적재 시 토크나이즈/청킹)을 같은 executor 에서 실행"""
+        self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        pending = _Pending(list(texts), future)
+        self._queue.put_nowait(pending)
+        try:
+            return await future
+        finally:
+            if pending.encode_seconds is not None:
+                record("embed_encode", pending.encode_seconds, failed=pending.failed)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight_batches": len(self._in_flight),
+            "batches_total": self.batches_total,
+            "texts_total": self.texts_total,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size_seen": self.max_batch_size_seen,
+            "avg_batch_size": (self.texts_total / self.batches_total) if self.batches_total else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "workers": self.workers,
+            "yield_waits": self.yield_waits,
+        }
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch = [first]
+            size = len(first.texts)
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                batch.append(item)
+                size += len(item.texts)
+
+            # 호출자가 이미 취소한 요청은 인코딩하지 않음
+            batch = [item for item in batch if not item.future.done()]
+            if not batch:
+                continue
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _run_batch(self, batch: list[_Pending]) -> None:
+        try:
+            texts = [t for item in batch for t in item.texts]
+            self.batches_total += 1
+            self.texts_total += len(texts)
+            self.last_batch_size = len(texts)
+            self.max_batch_size_seen = max(self.max_batch_size_seen, len(texts))
+            await self._yield()
+            started = time.perf_counter()
+            try:
+                vectors = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, embed_texts, texts
+                )
+            except Exception as exc:
+                for item in batch:
+                    item.encode_seconds, item.failed = time.perf_counter() - started, True
+                    if not item.future.done():
+                        item.future.set_exception(exc)
+                return
+            elapsed = time.perf_counter() - started
+
+            offset = 0
+            for item in batch:
+                n = len(item.texts)
+                item.encode_seconds = elapsed
+                if not item.future.done():
+                    item.future.set_result(vectors[offset:offset + n])
+                offset += n
+        finally:
+            self._slots.release()
+
+    async def _yield(self) -> None:
+        """검색/채팅 질의 인코딩이 진행 중이면 잠시 양보 (CPU 경합으로 질의 지연이 늘지 않도록)"""
+        if self.yield_to is None:
+            return
+        deadline = asyncio.get_running_loop().time() + self.yield_max
+        if self.yield_to.busy:
+            self.yield_waits += 1
+        while self.yield_to.busy and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.005)
+
+
+_batcher: EmbeddingBatcher | None = None
+_background_batcher: EmbeddingBatcher | None = None
+
+def get_batcher() -> EmbeddingBatcher:
+    """질의(검색/채팅)용 배처"""
+    global _batcher
+    if _batcher is None:
+        _batcher = EmbeddingBatcher(
+            max_batch_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_max_wait_ms,
+            workers=settings.embedding_workers,
+        )
+    return _batcher
+
+def get_background_batcher() -> EmbeddingBatcher:
+    """문서 적재용 배처: 별도 스레드, 질의 배처가 바쁘면 양보"""
+    global _background_batcher
+    if _background_batcher is None:
+        _background_batcher = EmbeddingBatcher(
+            max_batch_size=settings.ingest_embed_batch_size,
+            max_wait_ms=0,
+            workers=settings.ingest_embedding_workers,
+            yield_to=get_batcher(),
+            yield_max_ms=settings.ingest_yield_max_ms,
+        )
+    return _background_batcher
+
+async def aembed_texts(texts: list[str], *, background: bool = False) -> list[list[float]]:
+    """Async `embed_texts`: encodes on the embedding executor without blocking the loop.
+
+    background=True (document ingestion) encodes in slices of
+    INGEST_EMBED_BATCH_SIZE on a separate batcher that yields to queries.
+    """
+    if not background:
+        return await get_batcher().embed(texts)
+    batcher = get_background_batcher()
+    size = batcher.max_batch_size
+    vectors: list[list[float]] = []
+    for start in range(0, len(texts), size):
+        vectors.extend(await batcher.embed(texts[start:start + size]))
+    return vectors
+
+@traced("embed_query")
+async def aembed_query(q: str) -> list[float]:
+    # 캐시 키와 같은 정규화 텍스트를 encode (공백/NFKC 만 다른 질의가 다른 벡터를 캐시에 남기지 않도록)
+    q = normalize_query(q)
+    cache = get_query_cache()
+    if not cache.enabled:
+        return (await aembed_texts([q]))[0]
+
+    key = cache_key(q)
+    vec = cache.get(key)
+    if vec is not None:
+        cache.hits += 1
+        return vec
+
+    shared = settings.query_cache_backend == "postgres"
+    if shared:
+        vec = await lookup_shared(key)
+        if vec is not None:
+            cache.hits += 1
+            cache.shared_hits += 1
+            cache.put(key, vec)
+            return vec
+
+    cache.misses += 1
+    vec = (await aembed_texts([q]))[0]
+    cache.put(key, vec)
+    if shared:
+        store_shared(key, vec)
+    return vec
+
+@traced("embed_queries")
+async def aembed_queries(queries: list[str]) -> list[list[float]]:
+    """배치 검색용 `aembed_query`: 메모리 캐시 miss 만 모아 한 번의 encode 로 (공유 캐시는 저장만)"""
+    queries = [normalize_query(q) for q in queries]
+    cache = get_query_cache()
+    if not cache.enabled:
+        return await aembed_texts(queries)
+
+    keys = [cache_key(q) for q in queries]
+    vectors: list[list[float] | None] = [cache.get(key) for key in keys]
+    missing = [i for i, vec in enumerate(vectors) if vec is None]
+    cache.hits += len(queries) - len(missing)
+    cache.misses += len(missing)
+    if missing:
+        encoded = await aembed_texts([queries[i] for i in missing])
+        shared = settings.query_cache_backend == "postgres"
+        for i, vec in zip(missing, encoded):
+            vectors[i] = vec
+            cache.put(keys[i], vec)
+            if shared:
+                store_shared(keys[i], vec)
+    return vectors
@@ -0,0 +1,155 @@
+# app/embedding_cache.py
+"""Query embedding cache in front of `app.embedding.aembed_query`.
+
+L1 is a bounded in-process LRU (entry count + memory budget, optional TTL).
+With `QUERY_CACHE_BACKEND=postgres` misses fall through to the shared
+`query_embeddings` table so every worker benefits from each encode.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import QueryEmbedding
+
+
+def normalize_query(text: str) -> str:
+    """NFKC + 공백 정리: "소개해줘 ", "소개해줘" 를 같은 키로 취급"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(text: str, model: str | None = None) -> str:
+    raw = f"{model or settings.embedding_model_name}:{settings.embedding_store_dim}\x1f{normalize_query(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """In-process LRU of query vectors, stored as float32 arrays to keep the byte budget honest."""
+
+    def __init__(self, *, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, array]] = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> list[float] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, vec = entry
+        if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return vec.tolist()
+
+    def put(self, key: str, vector: list[float]) -> None:
+        if not self.enabled:
+            return
+        if key in self._entries:
+            self._remove(key)
+        vec = array("f", vector)
+        self._entries[key] = (time.monotonic(), vec)
+        self._bytes += vec.itemsize * len(vec)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": settings.query_cache_backend,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, vec = self._entries.pop(key)
+        self._bytes -= vec.itemsize * len(vec)
+
+
+_cache: QueryEmbeddingCache | None = None
+_pending_writes: set[asyncio.Task] = set()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = QueryEmbeddingCache(
+            max_entries=settings.query_cache_max_entries,
+            max_bytes=int(settings.query_cache_max_mb * 1024 * 1024),
+            ttl_seconds=settings.query_cache_ttl_seconds,
+        )
+    return _cache
+
+
+async def lookup_shared(key: str) -> list[float] | None:
+    stmt = select(QueryEmbedding.embedding).where(QueryEmbedding.key == key)
+    if settings.query_cache_ttl_seconds > 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.query_cache_ttl_seconds)
+        stmt = stmt.where(QueryEmbedding.created_at >= cutoff)
+    try:
+        async with SessionLocal() as db:
+            vec = (await db.execute(stmt)).scalar_one_or_none()
+    except SQLAlchemyError:
+        # 공유 캐시 장애가 검색 자체를 막지 않도록 miss 로 처리
+        return None
+    if vec is None:
+        return None
+    # EMBEDDING_STORAGE=halfvec 이면 HalfVector (iterable 아님), vector 면 numpy 배열
+    return [float(x) for x in (vec.to_list() if hasattr(vec, "to_list") else vec)]
+
+
+async def _store_shared(key: str, vector: list[float]) -> None:
+    stmt = insert(QueryEmbedding).values(key=key, model=settings.embedding_model_name, embedding=vector)
+    # TTL 이 지난 행은 lookup 에서 miss 이므로 덮어써서 created_at 을 갱신 (do_nothing 이면 영원히 miss)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[QueryEmbedding.key],
+        set_={"embedding": stmt.excluded.embedding, "model": stmt.excluded.model, "created_at": func.now()},
+    )
+    try:
+        async with SessionLocal() as db:
+            await db.execute(stmt)
+            await db.commit()
+    except SQLAlchemyError:
+        pass
+
+
+def store_shared(key: str, vector: list[float]) -> None:
+    """응답 지연을 늘리지 않도록 공유 캐시 쓰기는 백그라운드로 처리"""
+    task = asyncio.create_task(_store_shared(key, vector))
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
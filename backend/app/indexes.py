@@ -0,0 +1,271 @@
+# app/indexes.py
+"""Index management for the docs and messages tables, outside of app startup.
+
+    python -m app.indexes status
+    python -m app.indexes build              # 없는 인덱스만 CONCURRENTLY 생성
+    python -m app.indexes rebuild [NAME ...]  # 새 파라미터로 재생성 후 교체
+    python -m app.indexes migrate-storage     # EMBEDDING_STORAGE/TRUNCATE_DIM 변경 후 기존 행 변환
+
+Vector index type and parameters come from Settings (VECTOR_INDEX_TYPE,
+HNSW_M, HNSW_EF_CONSTRUCTION, IVFFLAT_LISTS, HOT_FILTERS ...).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.db import engine
+
+EMBEDDING_INDEX = "docs_embedding_hnsw"  # 기존 이름 유지 (ivfflat 이어도 같은 이름 사용)
+
+
+def _canonical(meta_filter: dict) -> str:
+    return json.dumps(meta_filter, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def jsonb_literal(meta_filter: dict) -> str:
+    return "'" + _canonical(meta_filter).replace("'", "''") + "'::jsonb"
+
+
+def hot_filter_index_name(meta_filter: dict) -> str | None:
+    key = _canonical(meta_filter)
+    for hot in settings.hot_filters:
+        if _canonical(hot) == key:
+            slug = re.sub(r"[^a-z0-9]+", "_", key.lower()).strip("_")[:30]
+            # 한글 값 등은 slug 에서 지워지므로 해시로 충돌 방지
+            return f"docs_embedding_hnsw_{slug}_{hashlib.sha1(key.encode()).hexdigest()[:8]}"
+    return None
+
+
+def _indexed_expression() -> str:
+    """EMBEDDING_STORAGE / EMBEDDING_QUANTIZATION 에 맞는 인덱스 대상 + opclass"""
+    if settings.embedding_quantization == "binary":
+        return f"(binary_quantize(embedding)::bit({settings.embedding_store_dim})) bit_hamming_ops"
+    if settings.embedding_quantization != "none":
+        raise ValueError(f"unknown embedding_quantization: {settings.embedding_quantization}")
+    return f"embedding {settings.embedding_storage}_cosine_ops"
+
+
+def _vector_using() -> str | None:
+    kind = settings.vector_index_type
+    if kind == "hnsw":
+        return (
+            f"hnsw ({_indexed_expression()}) "
+            f"WITH (m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)})"
+        )
+    if kind == "ivfflat":
+        return f"ivfflat ({_indexed_expression()}) WITH (lists = {int(settings.ivfflat_lists)})"
+    if kind == "none":
+        return None
+    raise ValueError(f"unknown vector_index_type: {kind}")
+
+
+def _vector_index_names() -> list[str]:
+    return [EMBEDDING_INDEX, *(hot_filter_index_name(hot) for hot in settings.hot_filters)]
+
+
+def index_definitions() -> dict[str, str]:
+    """인덱스 이름 -> `ON ...` 이후 정의 (CREATE INDEX [CONCURRENTLY] <name> 뒤에 붙음)"""
+    defs: dict[str, str] = {}
+    using = _vector_using()
+    if using:
+        defs[EMBEDDING_INDEX] = f"ON docs USING {using}"
+        for hot in settings.hot_filters:
+            defs[hot_filter_index_name(hot)] = f"ON docs USING {using} WHERE metadata @> {jsonb_literal(hot)}"
+    defs["docs_content_trgm"] = "ON docs USING gin (content gin_trgm_ops)"
+    defs["docs_metadata_gin"] = "ON docs USING gin (metadata jsonb_path_ops)"
+    # 기존 테이블에 컬럼만 추가된 경우용 (새 테이블은 create_all 이 같은 이름으로 생성)
+    defs["ix_docs_parent_id"] = "ON docs (parent_id)"
+    # 세션 히스토리 키셋 조회 (기존 messages 테이블용, 새 테이블은 create_all 이 생성)
+    defs["messages_session_created_id"] = "ON messages (session_id, created_at, id)"
+    return defs
+
+
+def create_index_sql(name: str, definition: str, *, concurrently: bool) -> str:
+    return f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} {definition}"
+
+
+async def create_missing_indexes(conn: AsyncConnection) -> None:
+    """startup(CREATE_INDEXES_ON_STARTUP=true) 용: 트랜잭션 안에서 일반 CREATE INDEX"""
+    for name, definition in index_definitions().items():
+        await conn.exec_driver_sql(create_index_sql(name, definition, concurrently=False))
+
+
+async def index_status() -> list[dict]:
+    async with engine.connect() as conn:
+        rows = await conn.execute(text("""
+            SELECT c.relname, am.amname, i.indisvalid, pg_relation_size(c.oid), pg_get_indexdef(c.oid)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE i.indrelid IN ('docs'::regclass, 'messages'::regclass)
+            ORDER BY c.relname
+        """))
+        return [
+            {"name": r[0], "method": r[1], "valid": r[2], "bytes": r[3], "definition": r[4]}
+            for r in rows
+        ]
+
+
+async def build_indexes(names: list[str] | None = None, *, rebuild: bool = False) -> None:
+    """CONCURRENTLY 로 생성/재생성: 서비스 중에도 쓰기를 막지 않음.
+
+    rebuild 는 `<name>_new` 를 만든 뒤 기존 인덱스를 지우고 이름을 바꾼다
+    (REINDEX 는 m/ef_construction/lists 같은 파라미터를 바꿀 수 없음).
+    """
+    defs = index_definitions()
+    targets = names or list(defs)
+    unknown = [n for n in targets if n not in defs]
+    if unknown:
+        raise SystemExit(f"unknown index: {', '.join(unknown)} (known: {', '.join(defs)})")
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql(f"SET maintenance_work_mem = '{settings.index_maintenance_work_mem}'")
+        for name in targets:
+            definition = defs[name]
+            started = time.perf_counter()
+            # 이전에 실패한 CONCURRENTLY 빌드는 INVALID 로 남으므로 먼저 정리
+            await _drop_if_invalid(conn, name)
+            if rebuild and await _exists(conn, name):
+                tmp = f"{name}_new"[:63]
+                await _drop_if_invalid(conn, tmp)
+                await conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp}")
+                await conn.exec_driver_sql(create_index_sql(tmp, definition, concurrently=True))
+                await conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                await conn.exec_driver_sql(f"ALTER INDEX {tmp} RENAME TO {name}")
+                action = "rebuilt"
+            elif await _exists(conn, name):
+                print(f"{name}: exists, skipped")
+                continue
+            else:
+                await conn.exec_driver_sql(create_index_sql(name, definition, concurrently=True))
+                action = "built"
+            print(f"{name}: {action} in {time.perf_counter() - started:.1f}s")
+
+
+async def storage_report() -> dict:
+    """docs 테이블/인덱스 크기와 embedding 컬럼 타입 (메모리 사용량 비교용)"""
+    async with engine.connect() as conn:
+        row = (await conn.execute(text("""
+            SELECT format_type(a.atttypid, a.atttypmod),
+                   pg_table_size('docs'), pg_indexes_size('docs'), pg_total_relation_size('docs'),
+                   (SELECT count(*) FROM docs),
+                   (SELECT avg(pg_column_size(embedding)) FROM docs)
+            FROM pg_attribute a
+            WHERE a.attrelid = 'docs'::regclass AND a.attname = 'embedding'
+        """))).one()
+    return {
+        "column_type": row[0],
+        "table_bytes": row[1],
+        "index_bytes": row[2],
+        "total_bytes": row[3],
+        "rows": row[4],
+        "avg_embedding_bytes": float(row[5] or 0),
+    }
+
+
+async def migrate_storage() -> None:
+    """기존 행을 현재 설정(EMBEDDING_STORAGE / EMBEDDING_TRUNCATE_DIM)으로 변환.
+
+    벡터 인덱스를 지우고 컬럼 타입을 바꾼 뒤(테이블 재작성, ACCESS EXCLUSIVE 락)
+    인덱스를 다시 만든다. 절단은 subvector + l2_normalize 로 DB 안에서 처리하므로
+    재인코딩이 필요 없다.
+    """
+    from app.embedding import embedding_model_id
+
+    dim = settings.embedding_store_dim
+    target = f"{settings.embedding_storage}({dim})"
+    async with engine.connect() as conn:
+        current = (await conn.execute(text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'docs'::regclass AND attname = 'embedding'"
+        ))).scalar_one()
+    print(f"docs.embedding: {current} -> {target}")
+
+    current_dim = int(current[current.index("(") + 1:-1])
+    if dim > current_dim:
+        raise SystemExit(f"cannot widen embedding from {current_dim} to {dim} dims; re-ingest instead")
+
+    if current != target:
+        source = "embedding::vector"
+        if dim < current_dim:
+            source = f"l2_normalize(subvector(embedding::vector, 1, {dim}))"
+        async with engine.begin() as conn:
+            for name in _vector_index_names():
+                await conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+            await conn.exec_driver_sql(
+                f"ALTER TABLE docs ALTER COLUMN embedding TYPE {target} USING ({source})::{target}"
+            )
+            # 절단된 벡터는 재인코딩 결과와 같으므로 증분 적재가 다시 인코딩하지 않도록 모델 id 갱신
+            await conn.execute(
+                text("UPDATE docs SET embedding_model = :new WHERE split_part(embedding_model, '@', 1) = :name"),
+                {"new": embedding_model_id(), "name": settings.embedding_model_name},
+            )
+            # 질의 임베딩/답변 캐시는 다시 채우면 되므로 비우고 타입만 맞춤
+            for table, column in (("query_embeddings", "embedding"), ("answer_cache", "query_embedding")):
+                await conn.exec_driver_sql(f"TRUNCATE {table}")
+                await conn.exec_driver_sql(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {target} USING NULL"
+                )
+
+    # 양자화/opclass 변경도 인덱스 재생성으로 반영
+    await build_indexes([n for n in _vector_index_names() if n in index_definitions()], rebuild=True)
+    print(await storage_report())
+
+
+async def _exists(conn: AsyncConnection, name: str) -> bool:
+    return (await conn.execute(text("SELECT to_regclass(:n) IS NOT NULL"), {"n": name})).scalar_one()
+
+
+async def _drop_if_invalid(conn: AsyncConnection, name: str) -> None:
+    invalid = (await conn.execute(
+        text("""
+            SELECT NOT i.indisvalid
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :n
+        """),
+        {"n": name},
+    )).scalar_one_or_none()
+    if invalid:
+        await conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+async def _main(args: argparse.Namespace) -> None:
+    try:
+        if args.command == "status":
+            for row in await index_status():
+                state = "valid" if row["valid"] else "INVALID"
+                print(f"{row['name']:<45} {row['method']:<8} {state:<8} {row['bytes'] / 1024 / 1024:>9.1f} MB")
+                print(f"    {row['definition']}")
+            report = await storage_report()
+            print(
+                f"docs: {report['rows']} rows, embedding {report['column_type']} "
+                f"(~{report['avg_embedding_bytes']:.0f} B/row), table {report['table_bytes'] / 1024 / 1024:.1f} MB, "
+                f"indexes {report['index_bytes'] / 1024 / 1024:.1f} MB"
+            )
+        elif args.command == "migrate-storage":
+            await migrate_storage()
+        else:
+            await build_indexes(args.names or None, rebuild=args.command == "rebuild")
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "build", "rebuild", "migrate-storage"])
+    parser.add_argument("names", nargs="*", help="index names (default: all)")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# app/jobs.py
+"""Background ingestion jobs persisted in Postgres (`ingest_jobs`).
+
+API handlers only insert a job row and return its id. Every app process runs
+JOB_WORKERS worker tasks that claim queued jobs with
+`FOR UPDATE SKIP LOCKED`, so several processes can share the queue without
+handing out a job twice. While a job runs, a heartbeat task refreshes
+`heartbeat_at` every JOB_STALE_SECONDS / 3, so even a long batch keeps it.
+If a process dies, its job is re-claimed once the heartbeat is older than
+JOB_STALE_SECONDS, up to JOB_MAX_ATTEMPTS attempts. Progress and final status
+are written only while `worker_id` still names this worker, so a worker whose
+job was re-claimed stops at the next batch boundary instead of racing the new
+owner. Cancellation sets `cancel_requested`, and the worker stops at the next
+batch boundary.
+
+Embedding for jobs goes through the background batcher
+(`aembed_texts(background=True)`), which yields to query encoding so chat
+and search latency stay flat while a large job runs.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+from typing import AsyncIterator
+from uuid import uuid4
+
+from sqlalchemy import func, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.chunking import Chunk, achunk_lines
+from app.config import settings
+from app.db import SessionLocal
+from app.models import IngestJob
+from app.schemas import DocumentCreate
+from app.services.docs import replace_source, upsert_docs_bulk
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("bulk", "source")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobLost(Exception):
+    """하트비트가 끊긴 사이 다른 워커가 작업을 다시 가져감"""
+
+
+async def submit_job(db: AsyncSession, kind: str, payload: dict, total: int | None = None) -> IngestJob:
+    if kind not in JOB_KINDS:
+        raise ValueError(f"unknown job kind: {kind}")
+    job = IngestJob(
+        id=str(uuid4()),
+        kind=kind,
+        status="queued",
+        payload=payload,
+        progress={"total": total} if total is not None else {},
+    )
+    db.add(job)
+    await db.commit()
+    get_worker_pool().wake()
+    return job
+
+
+async def cancel_job(db: AsyncSession, job_id: str) -> IngestJob | None:
+    """대기 중이면 바로 cancelled, 실행 중이면 다음 배치 경계에서 워커가 멈춤"""
+    job = await db.get(IngestJob, job_id, with_for_update=True)
+    if job is None:
+        return None
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = func.now()
+    elif job.status == "running":
+        job.cancel_requested = True
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def claim_next(worker_id: str) -> IngestJob | None:
+    stale = text(f"now() - interval '{float(settings.job_stale_seconds)} seconds'")
+    pick = (
+        select(IngestJob.id)
+        .where(or_(
+            IngestJob.status == "queued",
+            # 하트비트가 끊긴 실행 중 작업(프로세스 종료 등)은 다시 가져감
+            (IngestJob.status == "running") & (IngestJob.heartbeat_at < stale),
+        ))
+        .order_by(IngestJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    async with SessionLocal() as db:
+        job = (await db.execute(
+            update(IngestJob)
+            .where(IngestJob.id == pick)
+            .values(
+                status="running",
+                worker_id=worker_id,
+                attempts=IngestJob.attempts + 1,
+                started_at=func.coalesce(IngestJob.started_at, func.now()),
+                heartbeat_at=func.now(),
+            )
+            .returning(IngestJob)
+        )).scalar_one_or_none()
+        await db.commit()
+    return job
+
+
+def _owned(job: IngestJob):
+    """이 워커가 아직 작업을 갖고 있을 때만 맞는 조건 (다시 가져가면 worker_id 가 바뀜)"""
+    return (IngestJob.id == job.id) & (IngestJob.worker_id == job.worker_id)
+
+
+async def run_job(job: IngestJob) -> None:
+    if job.attempts > settings.job_max_attempts:
+        await _finish(job, "failed", f"gave up after {job.attempts - 1} attempts")
+        return
+    progress = dict(job.progress or {})
+
+    async def on_batch(counts: dict) -> None:
+        progress.update(counts)
+        async with SessionLocal() as db:
+            cancel = (await db.execute(
+                update(IngestJob)
+                .where(_owned(job))
+                .values(progress=dict(progress), heartbeat_at=func.now())
+                .returning(IngestJob.cancel_requested)
+            )).scalar_one_or_none()
+            await db.commit()
+        if cancel is None:
+            raise JobLost()
+        if cancel:
+            raise JobCancelled()
+
+    heartbeat = asyncio.create_task(_heartbeat(job))
+    try:
+        async with SessionLocal() as db:
+            if job.kind == "bulk":
+                await upsert_docs_bulk(db, _bulk_items(job.payload), on_batch=on_batch)
+            else:
+                chunks = _source_chunks(job.payload["text"])
+                await replace_source(
+                    db, job.payload["parent_id"], chunks, job.payload.get("meta"), on_batch=on_batch
+                )
+    except JobLost:
+        # 새 워커가 처음부터 다시 처리 중이므로 진행 상황/상태는 건드리지 않음
+        logger.warning("ingest job %s was re-claimed by another worker, stopping %s", job.id, job.worker_id)
+    except JobCancelled:
+        # bulk 는 이미 커밋된 배치까지 반영, source 는 전체 롤백
+        await _finish(job, "cancelled", None, progress)
+    except Exception as exc:
+        await _finish(job, "failed", str(exc), progress)
+    else:
+        await _finish(job, "succeeded", None, progress)
+    finally:
+        heartbeat.cancel()
+
+
+async def _heartbeat(job: IngestJob) -> None:
+    """배치 하나가 JOB_STALE_SECONDS 보다 오래 걸려도 다른 워커가 가져가지 않도록 주기적으로 갱신"""
+    interval = max(1.0, settings.job_stale_seconds / 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    update(IngestJob)
+                    .where(_owned(job), IngestJob.status == "running")
+                    .values(heartbeat_at=func.now())
+                )
+                await db.commit()
+        except Exception:
+            # 일시적인 DB 오류: 다음 주기에 다시 (계속 실패하면 stale 로 회수됨)
+            logger.exception("heartbeat for ingest job %s failed", job.id)
+            continue
+        if not result.rowcount:
+            return  # 작업을 잃음: on_batch/_finish 가 JobLost 로 멈춤
+
+
+async def _finish(job: IngestJob, status: str, error: str | None, progress: dict | None = None) -> None:
+    values = {"status": status, "error": error, "finished_at": func.now(), "heartbeat_at": func.now()}
+    if progress is not None:
+        values["progress"] = progress
+    async with SessionLocal() as db:
+        result = await db.execute(update(IngestJob).where(_owned(job)).values(**values))
+        await db.commit()
+    if not result.rowcount:
+        logger.warning("ingest job %s was re-claimed by another worker, not marking it %s", job.id, status)
+
+
+async def _bulk_items(payload: dict) -> AsyncIterator[tuple[int, DocumentCreate | str]]:
+    # 제출 시 검증을 통과한 항목만 저장되므로 여기서는 그대로 변환
+    for index, raw in enumerate(payload["items"]):
+        yield index, DocumentCreate.model_validate(raw)
+
+
+async def _source_chunks(source: str) -> AsyncIterator[Chunk]:
+    # 토크나이즈는 achunk_lines 가 임베딩 executor 에서 (이벤트 루프를 잡지 않음)
+    async def lines() -> AsyncIterator[str]:
+        for line in source.splitlines():
+            yield line
+
+    async for chunk in achunk_lines(lines()):
+        yield chunk
+
+
+class JobWorkerPool:
+    """Polls `ingest_jobs` with JOB_WORKERS concurrent workers in this process."""
+
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self.running: dict[str, str] = {}  # worker id -> job id
+
+    def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        self._wake = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._loop(f"{self.worker_prefix}:{i}")) for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        # 진행 중인 작업은 하트비트가 끊겨 다른 프로세스(또는 재시작 후)가 다시 가져감
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {"workers": len(self._tasks), "running": dict(self.running)}
+
+    async def _loop(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await claim_next(worker_id)
+            except Exception:
+                logger.exception("job claim failed (%s)", worker_id)
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.running[worker_id] = job.id
+            try:
+                await run_job(job)
+            except Exception:
+                # _finish 의 DB 오류 등: 작업은 하트비트가 끊긴 뒤 다시 회수되고 워커는 계속 돔
+                logger.exception("ingest job %s failed outside the job handler", job.id)
+            finally:
+                self.running.pop(worker_id, None)
+
+
+_pool: JobWorkerPool | None = None
+
+
+def get_worker_pool() -> JobWorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = JobWorkerPool(settings.job_workers, settings.job_poll_interval_seconds)
+    return _pool
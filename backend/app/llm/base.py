@@ -0,0 +1,176 @@
+# app/llm/base.py
+"""LLM provider interface and per-provider concurrency limiting.
+
+Every backend (`openai_client.OpenAIClient`, the offline `fake.FakeLLM`)
+implements `LLMProvider`. The registry (`app/llm/registry.py`) wraps each one
+in `LimitedProvider`: at most LLM_MAX_CONCURRENCY calls run at once, up to
+LLM_MAX_QUEUE more wait for LLM_QUEUE_TIMEOUT_SECONDS, and anything beyond
+that fails fast with `LLMBusyError`. The routers turn that error into a 429
+with Retry-After, so a burst is rejected instead of fanning out into upstream
+rate-limit errors and retries. An upstream 429 puts the provider into a short
+cooldown in which new calls are rejected the same way.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+from app.config import settings
+from app.telemetry import record
+
+
+class LLMBusyError(Exception):
+    """동시 실행 한도 + 대기열이 가득 찼거나 업스트림이 429 를 돌려줌. retry_after 초 뒤 재시도"""
+
+    def __init__(self, provider: str, retry_after: float, reason: str = "busy"):
+        super().__init__(f"LLM provider '{provider}' is {reason}, retry after {math.ceil(retry_after)}s")
+        self.provider = provider
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class LLMProvider(ABC):
+    """acomplete/astream 시그니처는 OpenAIClient 기준. model 을 주면 호출마다 모델을 바꿈"""
+
+    name: str = "base"
+    model: str = ""
+
+    @abstractmethod
+    async def acomplete(
+        self,
+        *,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None,
+        model: Optional[str] = None,
+        **kwargs,
+    ) -> Union[str, Dict]:
+        ...
+
+    @abstractmethod
+    def astream(
+        self,
+        *,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None,
+        model: Optional[str] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        ...
+
+    async def aclose(self) -> None:
+        return None
+
+
+class ConcurrencyLimiter:
+    """세마포어 + 길이 제한 대기열. 한도를 넘으면 기다리지 않고 LLMBusyError"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_concurrency: int | None = None,
+        max_queue: int | None = None,
+        queue_timeout: float | None = None,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency or settings.llm_max_concurrency)
+        self.max_queue = max(0, settings.llm_max_queue if max_queue is None else max_queue)
+        self.queue_timeout = settings.llm_queue_timeout_seconds if queue_timeout is None else queue_timeout
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self._avg_seconds = 0.0  # 호출 시간 EWMA (Retry-After 추정용)
+        self._cooldown_until = 0.0
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.upstream_limited = 0
+
+    def retry_after(self) -> float:
+        """대기열이 빠질 때까지의 추정 시간 (최소 1초)"""
+        cooldown = self._cooldown_until - time.monotonic()
+        if cooldown > 0:
+            return max(1.0, cooldown)
+        per_call = self._avg_seconds or 1.0
+        return max(1.0, (self.waiting + 1) / self.max_concurrency * per_call)
+
+    def check(self) -> None:
+        """입장 검사만 (슬롯은 잡지 않음). 스트리밍 응답을 시작하기 전에 429 를 돌려줄 때 사용"""
+        if time.monotonic() < self._cooldown_until:
+            self.rejected += 1
+            raise LLMBusyError(self.name, self.retry_after(), "rate limited")
+        # 획득 직전의 대기자도 waiting 에 포함되므로 합계로 판단
+        if self.in_flight + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise LLMBusyError(self.name, self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        self.check()
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            # asyncio.timeout 은 3.11+ 이므로 wait_for (타임아웃과 동시에 획득돼도 결과를 돌려줌)
+            await asyncio.wait_for(self._sem.acquire(), self.queue_timeout if self.queue_timeout > 0 else None)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise LLMBusyError(self.name, self.retry_after()) from None
+        finally:
+            self.waiting -= 1
+        record("llm_queue_wait", time.perf_counter() - started)
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            yield
+        except LLMBusyError as exc:
+            # 업스트림 429: Retry-After 동안 새 호출은 바로 거절 (재시도가 한도를 더 깎지 않도록)
+            self.upstream_limited += 1
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + exc.retry_after)
+            raise
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
+            elapsed = time.perf_counter() - started
+            self._avg_seconds = elapsed if not self._avg_seconds else 0.8 * self._avg_seconds + 0.2 * elapsed
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "upstream_limited": self.upstream_limited,
+            "avg_call_ms": round(self._avg_seconds * 1000, 1),
+        }
+
+
+class LimitedProvider(LLMProvider):
+    """provider 를 감싸 모든 호출이 limiter 슬롯 안에서 실행되도록 함"""
+
+    def __init__(self, inner: LLMProvider, limiter: ConcurrencyLimiter | None = None):
+        self.inner = inner
+        self.name = inner.name
+        self.model = inner.model
+        self.limiter = limiter or ConcurrencyLimiter(inner.name)
+
+    async def acomplete(self, **kwargs) -> Union[str, Dict]:
+        async with self.limiter.slot():
+            return await self.inner.acomplete(**kwargs)
+
+    async def astream(self, **kwargs) -> AsyncIterator[str]:
+        # 스트림이 끝나거나 소비자가 닫을 때까지 슬롯 유지
+        async with self.limiter.slot():
+            async for delta in self.inner.astream(**kwargs):
+                yield delta
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
@@ -0,0 +1,82 @@
+# app/llm/fake.py
+"""Offline LLM provider (LLM_PROVIDER=fake).
+
+Replies are deterministic word sequences whose latency and streaming speed
+are configurable (FAKE_LLM_TTFT_MS, FAKE_LLM_TOKENS_PER_SEC,
+FAKE_LLM_REPLY_TOKENS). It needs no API key or network access, so the full
+chat path can run in local development, offline tests and load benchmarks
+(`bench/serve.py`).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from typing import AsyncGenerator, Dict, List, Optional
+
+from app.config import settings
+from app.llm.base import LLMProvider
+from app.telemetry import record, span
+
+_WORDS = (
+    "검색 결과 문서 프로젝트 배포 성능 데이터 모델 서버 캐시 the a of to and "
+    "latency vector index postgres embedding stream session answer"
+).split()
+
+
+class FakeLLM(LLMProvider):
+    """OpenAIClient 와 같은 acomplete/astream 시그니처. 토큰은 공백 단위 단어로 근사"""
+
+    name = "fake"
+
+    def __init__(
+        self,
+        *,
+        ttft_ms: float | None = None,
+        tokens_per_sec: float | None = None,
+        reply_tokens: int | None = None,
+        model: str = "fake",
+    ):
+        ttft_ms = settings.fake_llm_ttft_ms if ttft_ms is None else ttft_ms
+        tokens_per_sec = settings.fake_llm_tokens_per_sec if tokens_per_sec is None else tokens_per_sec
+        self.ttft = ttft_ms / 1000
+        self.token_interval = 1 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+        self.reply_tokens = settings.fake_llm_reply_tokens if reply_tokens is None else reply_tokens
+        self.model = model
+
+    def _tokens(self, messages: List[Dict[str, str]]) -> List[str]:
+        # 입력에 따라 결정적으로 달라지는 답변 (캐시/저장 경로가 매번 같은 문자열만 보지 않도록)
+        seed = int.from_bytes(hashlib.sha256(messages[-1]["content"].encode()).digest()[:4], "big")
+        return [_WORDS[(seed + i * 7) % len(_WORDS)] for i in range(self.reply_tokens)]
+
+    async def acomplete(
+        self,
+        *,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None,
+        model: Optional[str] = None,
+        max_output_tokens: Optional[int] = None,
+        **kwargs,
+    ) -> str:
+        tokens = self._tokens(messages)[:max_output_tokens or None]
+        with span("llm_complete", model=model or self.model):
+            await asyncio.sleep(self.ttft + self.token_interval * len(tokens))
+        return " ".join(tokens)
+
+    async def astream(
+        self,
+        *,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None,
+        model: Optional[str] = None,
+        max_output_tokens: Optional[int] = None,
+        **kwargs,
+    ) -> AsyncGenerator[str, None]:
+        started = time.perf_counter()
+        await asyncio.sleep(self.ttft)
+        record("llm_ttft", time.perf_counter() - started)
+        for i, token in enumerate(self._tokens(messages)[:max_output_tokens or None]):
+            if i:
+                await asyncio.sleep(self.token_interval)
+            yield token if i == 0 else " " + token
+        record("llm_stream", time.perf_counter() - started)
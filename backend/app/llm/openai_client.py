@@ -1,9 +1,37 @@
 # openai_client.py
 import json
+import time
 from typing import AsyncGenerator, Dict, List, Optional, Union
 
-from openai import AsyncOpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, RateLimitError
 from app.config import settings   # ✅ os 안 쓰고 settings 사용
+from app.llm.base import LLMBusyError, LLMProvider
+from app.telemetry import record, span
+
+# 프로세스 전체가 공유하는 HTTP 커넥션 풀 (클라이언트/모델이 여러 개여도 TLS 연결 재사용)
+_http_client: httpx.AsyncClient | None = None
+
+
+def shared_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_http_max_connections,
+                max_keepalive_connections=settings.llm_http_max_connections,
+                keepalive_expiry=settings.llm_http_keepalive_seconds,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 
 def _to_blocks(messages: List[Dict[str, str]], system: Optional[str]) -> List[Dict]:
     blocks = []
@@ -26,20 +54,23 @@ def _to_blocks(messages: List[Dict[str, str]], system: Optional[str]) -> List[Di
     return blocks
 
 
-class OpenAIClient:
+class OpenAIClient(LLMProvider):
+    name = "openai"
+
     def __init__(
         self,
         model: Optional[str] = None,
         api_key: Optional[str] = None,
         timeout: Optional[float] = None,
-        max_retries: int = 2,
+        max_retries: Optional[int] = None,
     ):
         # ✅ 기본값은 settings에서 가져오기
         self.model = model or settings.openai_model_name
         self.client = AsyncOpenAI(
             api_key=api_key or settings.openai_api_key,
-            timeout=timeout,
-            max_retries=max_retries,
+            timeout=timeout or settings.openai_timeout_seconds,
+            max_retries=settings.openai_max_retries if max_retries is None else max_retries,
+            http_client=shared_http_client(),
         )
 
     async def acomplete(
@@ -73,7 +104,8 @@ class OpenAIClient:
         if metadata: kwargs["metadata"] = metadata
         if response_format == "json": kwargs["response_format"] = {"type": "json_object"}
 
-        resp = await self.client.responses.create(**kwargs)
+        with span("llm_complete", model=kwargs["model"]):
+            resp = await self._create(kwargs)
         if response_format == "json":
             text = resp.output_text or ""
             try:
@@ -112,25 +144,61 @@ class OpenAIClient:
         if seed is not None: kwargs["seed"] = seed
         if metadata: kwargs["metadata"] = metadata
 
-        stream = await self.client.responses.create(**kwargs)
-        async for ev in stream:
-            event_type = getattr(ev, "type", "")
-            if event_type in ("response.output_text.delta", "response.refusal.delta"):
-                delta = getattr(ev, "delta", None)
-                if delta is not None:
-                    yield delta
-                continue
-            if event_type == "response.completed":
-                break
-            if event_type in ("response.failed", "response.cancelled", "response.error"):
-                error = getattr(ev, "error", None)
-                if error:
-                    if isinstance(error, dict):
-                        code = error.get("code")
-                        message = error.get("message")
-                    else:
-                        code = getattr(error, "code", None)
-                        message = getattr(error, "message", None)
-                    detail = f"{code}: {message}" if code else message
-                    raise RuntimeError(detail or "OpenAI streaming error")
-                raise RuntimeError(f"OpenAI streaming {event_type}")           
\ No newline at end of file
+        # 제너레이터는 소비자 쪽에서 중단될 수 있어 with span 대신 직접 측정 (llm_ttft: 첫 토큰까지)
+        started = time.perf_counter()
+        first = True
+        failed = False
+        try:
+            stream = await self._create(kwargs)
+            async for ev in stream:
+                event_type = getattr(ev, "type", "")
+                if event_type in ("response.output_text.delta", "response.refusal.delta"):
+                    delta = getattr(ev, "delta", None)
+                    if delta is not None:
+                        if first:
+                            record("llm_ttft", time.perf_counter() - started)
+                            first = False
+                        yield delta
+                    continue
+                if event_type == "response.completed":
+                    break
+                if event_type in ("response.failed", "response.cancelled", "response.error"):
+                    _raise_stream_error(ev, event_type)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            record("llm_stream", time.perf_counter() - started, failed=failed)
+
+    async def _create(self, kwargs: Dict):
+        try:
+            return await self.client.responses.create(**kwargs)
+        except RateLimitError as exc:
+            # SDK 재시도(OPENAI_MAX_RETRIES)까지 소진한 429 → 호출자에게 Retry-After 로 전달
+            raise LLMBusyError(self.name, _retry_after(exc.response), "rate limited") from exc
+
+    async def aclose(self) -> None:
+        # 공유 HTTP 클라이언트는 close_http_client 가 닫음
+        return None
+
+
+def _retry_after(response: httpx.Response | None) -> float:
+    raw = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(1.0, float(raw))
+    except (TypeError, ValueError):
+        return settings.llm_rate_limit_cooldown_seconds
+
+
+def _raise_stream_error(ev, event_type: str) -> None:
+    error = getattr(ev, "error", None)
+    if error:
+        if isinstance(error, dict):
+            code = error.get("code")
+            message = error.get("message")
+        else:
+            code = getattr(error, "code", None)
+            message = getattr(error, "message", None)
+        detail = f"{code}: {message}" if code else message
+        raise RuntimeError(detail or "OpenAI streaming error")
+    raise RuntimeError(f"OpenAI streaming {event_type}")
@@ -0,0 +1,79 @@
+# app/llm/registry.py
+"""Provider instances and prompt-size model routing.
+
+`get_provider(name)` returns one lazily built `LimitedProvider` per provider
+name (LLM_PROVIDER is the default). `route(prompt_tokens)` picks the provider
+and model for a request from LLM_ROUTES, an ordered list such as
+`[{"max_prompt_tokens": 1500, "model": "gpt-4.1-nano"}]`. The first entry
+whose `max_prompt_tokens` is at least the prompt size wins. An entry without
+a limit matches everything, and without a match the default provider/model
+is used. Short prompts can therefore go to a cheaper, faster model while long
+contexts keep the default one.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from app.config import settings
+from app.llm.base import LimitedProvider, LLMProvider
+
+_providers: dict[str, LimitedProvider] = {}
+
+
+class Route(NamedTuple):
+    provider: LimitedProvider
+    model: str
+
+
+def _build(name: str) -> LLMProvider:
+    if name == "openai":
+        from app.llm.openai_client import OpenAIClient
+
+        return OpenAIClient()
+    if name == "fake":
+        from app.llm.fake import FakeLLM
+
+        return FakeLLM()
+    raise ValueError(f"unknown LLM provider: {name}")
+
+
+def get_provider(name: str | None = None) -> LimitedProvider:
+    name = name or settings.llm_provider
+    provider = _providers.get(name)
+    if provider is None:
+        provider = _providers[name] = LimitedProvider(_build(name))
+    return provider
+
+
+def install(provider: LLMProvider, name: str | None = None) -> LimitedProvider:
+    """provider 교체 (벤치마크/테스트). name 을 생략하면 기본 provider 자리에 등록"""
+    limited = provider if isinstance(provider, LimitedProvider) else LimitedProvider(provider)
+    _providers[name or settings.llm_provider] = limited
+    return limited
+
+
+def route(prompt_tokens: int) -> Route:
+    for entry in settings.llm_routes:
+        limit = entry.get("max_prompt_tokens")
+        if limit is None or prompt_tokens <= limit:
+            provider = get_provider(entry.get("provider"))
+            return Route(provider, entry.get("model") or provider.model)
+    provider = get_provider()
+    return Route(provider, provider.model)
+
+
+def stats() -> dict:
+    return {
+        "provider": settings.llm_provider,
+        "routes": settings.llm_routes,
+        "limits": {name: p.limiter.stats() for name, p in _providers.items()},
+    }
+
+
+async def aclose() -> None:
+    from app.llm.openai_client import close_http_client
+
+    for provider in _providers.values():
+        await provider.aclose()
+    _providers.clear()
+    await close_http_client()
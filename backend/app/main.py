@@ -1,22 +1,95 @@
-from fastapi import FastAPI
-from app.db import Base, engine
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from app.db import Base, engine, pool_stats, read_engine
 from app.config import settings
-from app.routers import documents, chat
+from app.embedding import get_background_batcher, get_batcher
+from app.embedding_cache import get_query_cache
+from app import reranker, retriever, warmup
+from app.indexes import create_missing_indexes
+from app.jobs import get_worker_pool
+from app.llm import registry as llm_registry
+from app.routers import documents, chat, jobs
+from app.services import answer_cache
+from app.telemetry import TelemetryMiddleware, metrics_response, setup_tracing, shutdown_tracing
+
+# 부팅 단계별 소요 시간 (GET /readyz)
+_startup_ms: dict[str, float] = {}
+
+async def startup():
+    started = time.perf_counter()
+    retriever.check_filter_strategy()
+    setup_tracing()
+    if settings.schema_on_startup:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # create_all 은 기존 테이블에 컬럼을 추가하지 않으므로 직접 보강
+            await conn.exec_driver_sql("ALTER TABLE docs ADD COLUMN IF NOT EXISTS content_hash varchar(64)")
+            await conn.exec_driver_sql("ALTER TABLE docs ADD COLUMN IF NOT EXISTS embedding_model varchar")
+            await conn.exec_driver_sql("ALTER TABLE docs ADD COLUMN IF NOT EXISTS parent_id varchar")
+            await conn.exec_driver_sql("ALTER TABLE docs ADD COLUMN IF NOT EXISTS chunk_index integer")
+            # 인덱스 생성은 기본적으로 `python -m app.indexes build` (CONCURRENTLY) 로 분리
+            if settings.create_indexes_on_startup:
+                await create_missing_indexes(conn)
+        _startup_ms["schema"] = round((time.perf_counter() - started) * 1000, 1)
+    # MODEL_PRELOAD=blocking 이면 여기서 모델 로드 + 워밍업까지 끝내고 트래픽을 받음
+    await warmup.start()
+    # 적재 작업 워커 (JOB_WORKERS=0 이면 이 프로세스는 API 만)
+    get_worker_pool().start()
+    _startup_ms["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+async def shutdown():
+    await warmup.stop()
+    await get_worker_pool().stop()
+    await get_batcher().stop()
+    await get_background_batcher().stop()
+    await llm_registry.aclose()
+    shutdown_tracing()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    yield
+    await shutdown()
 
-app = FastAPI(title=settings.app_name)
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app.add_middleware(TelemetryMiddleware)
 
 app.include_router(documents.router)
 app.include_router(chat.router)
-
-@app.on_event("startup")
-async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        await conn.exec_driver_sql(
-            "CREATE INDEX IF NOT EXISTS docs_embedding_hnsw "
-            "ON docs USING hnsw (embedding vector_cosine_ops)"
-        )
+app.include_router(jobs.router)
 
 @app.get("/healthz")        
 async def healthz():
-    return {"ok": True}
\ No newline at end of file
+    """liveness: 프로세스가 응답하면 항상 200"""
+    return {"ok": True}
+
+@app.get("/readyz")
+async def readyz():
+    """readiness: 모델 워밍업이 끝나기 전(MODEL_PRELOAD=background)에는 503"""
+    body = {"ready": warmup.is_ready(), "startup_ms": _startup_ms, "models": warmup.state()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = metrics_response()
+    return Response(body, media_type=content_type)
+
+@app.get("/stats")
+async def stats():
+    return {
+        "embedding": get_batcher().stats(),
+        "embedding_background": get_background_batcher().stats(),
+        "query_cache": get_query_cache().stats(),
+        "answer_cache": answer_cache.stats(),
+        "rerank": reranker.stats(),
+        "jobs": get_worker_pool().stats(),
+        "llm": llm_registry.stats(),
+        "db_pool": pool_stats(),
+        "warmup": warmup.state(),
+    }
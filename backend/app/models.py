@@ -3,15 +3,24 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, DateTime, ForeignKey, func
-from sqlalchemy.dialects.postgresql import JSONB
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.orm import Mapped, WriteOnlyMapped, mapped_column, relationship
+from sqlalchemy import Boolean, Index, Integer, String, Text, DateTime, ForeignKey, func, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from pgvector.sqlalchemy import HALFVEC, Vector
 
 from app.db import Base
 from app.config import settings
 
-EMBED_DIM = settings.embedding_dim  # .env: EMBEDDING_DIM
+EMBED_DIM = settings.embedding_store_dim  # .env: EMBEDDING_DIM / EMBEDDING_TRUNCATE_DIM
+
+
+def embedding_column_type():
+    """EMBEDDING_STORAGE 에 맞는 pgvector 타입 (바인드 파라미터에도 같은 타입 사용)"""
+    if settings.embedding_storage == "halfvec":
+        return HALFVEC(EMBED_DIM)
+    if settings.embedding_storage == "vector":
+        return Vector(EMBED_DIM)
+    raise ValueError(f"unknown embedding_storage: {settings.embedding_storage}")
 
 # 지식베이스(문서/청크)
 class Document(Base):
@@ -21,7 +30,13 @@ class Document(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     # 속성명은 meta, 실제 DB 컬럼명은 "metadata"
     meta: Mapped[dict | None] = mapped_column("metadata", JSONB, nullable=True)
-    embedding = mapped_column(Vector(EMBED_DIM), nullable=False)
+    embedding = mapped_column(embedding_column_type(), nullable=False)
+    # 재적재 시 내용/모델이 같으면 인코딩을 건너뛰기 위한 값
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64))  # sha256(content)
+    embedding_model: Mapped[Optional[str]] = mapped_column(String)
+    # 원문 단위 적재(PUT /documents/{parent_id}/source)로 만들어진 청크면 원문 id 와 순번
+    parent_id: Mapped[Optional[str]] = mapped_column(String, index=True)
+    chunk_index: Mapped[Optional[int]] = mapped_column(Integer)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -29,6 +44,76 @@ class Document(Base):
         index=True,
     )
 
+# 질의 임베딩 공유 캐시 (QUERY_CACHE_BACKEND=postgres)
+class QueryEmbedding(Base):
+    __tablename__ = "query_embeddings"
+
+    # sha256(모델명 + 정규화된 질의)
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    embedding = mapped_column(embedding_column_type(), nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+# 첫 턴 답변의 의미 캐시: 질의 임베딩이 가깝고 검색된 문서가 같으면 LLM 호출 없이 재사용
+class AnswerCache(Base):
+    __tablename__ = "answer_cache"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # sha256(LLM 모델 + 시스템 프롬프트 + temperature/max_tokens): 생성 조건이 바뀌면 다른 키
+    variant: Mapped[str] = mapped_column(String(64), nullable=False)
+    query: Mapped[str] = mapped_column(Text, nullable=False)
+    query_embedding = mapped_column(embedding_column_type(), nullable=False)
+    # 검색된 Document.id (순서 포함 정확히 일치해야 hit)
+    source_ids: Mapped[list[str]] = mapped_column(ARRAY(String), nullable=False)
+    reply: Mapped[str] = mapped_column(Text, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), index=True)
+
+    __table_args__ = (
+        Index("answer_cache_lookup", "variant", "source_ids"),
+        # 문서 변경 시 `source_ids && ARRAY[...]` 로 무효화
+        Index("answer_cache_sources_gin", "source_ids", postgresql_using="gin"),
+    )
+
+# 백그라운드 적재 작업 (app/jobs.py, 워커들이 SKIP LOCKED 로 가져감)
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # uuid 문자열
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)  # "bulk" | "source"
+    # queued | running | succeeded | failed | cancelled
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="queued")
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    # 건수 집계: total/processed/inserted/updated/skipped/failed/batches ...
+    progress: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default="{}")
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    worker_id: Mapped[Optional[str]] = mapped_column(String(100))
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # 대기/실행 중인 작업만 훑으므로 부분 인덱스
+        Index(
+            "ingest_jobs_pending",
+            "created_at",
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
 # 대화 세션(스레드)
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
@@ -46,10 +131,11 @@ class ChatSession(Base):
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True
     )
 
-    messages: Mapped[list["Message"]] = relationship(
+    # write-only: 세션을 읽을 때 전체 스레드를 실수로 로드하지 않도록 (읽기는 select + 키셋 페이지)
+    messages: WriteOnlyMapped["Message"] = relationship(
         back_populates="session",
         cascade="all, delete-orphan",
-        order_by="Message.created_at",
+        order_by="(Message.created_at, Message.id)",
         passive_deletes=True,
     )
 
@@ -58,8 +144,9 @@ class Message(Base):
     __tablename__ = "messages"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # 단일 인덱스 대신 아래 (session_id, created_at, id) 복합 인덱스가 세션 조회를 담당
     session_id: Mapped[str] = mapped_column(
-        String, ForeignKey("chat_sessions.id", ondelete="CASCADE"), index=True
+        String, ForeignKey("chat_sessions.id", ondelete="CASCADE")
     )
     role: Mapped[str] = mapped_column(String(10))  # "user" | "assistant" | "system"
     content: Mapped[str] = mapped_column(Text, nullable=False)
@@ -71,3 +158,8 @@ class Message(Base):
     )
 
     session: Mapped["ChatSession"] = relationship(back_populates="messages")
+
+    __table_args__ = (
+        # 세션 히스토리/페이지: 정렬까지 인덱스 순서로 (created_at 이 같은 한 턴의 메시지는 id 로 구분)
+        Index("messages_session_created_id", "session_id", "created_at", "id"),
+    )
@@ -0,0 +1,170 @@
+# app/prompt.py
+"""Token-budgeted assembly of the LLM input for a chat turn.
+
+Counts use the tiktoken encoding of OPENAI_MODEL_NAME. The latest question
+and the system prompt are always kept. Retrieved chunks are deduplicated,
+truncated to PROMPT_CHUNK_MAX_TOKENS and added in rank order up to
+PROMPT_CONTEXT_MAX_TOKENS. A rolling session summary, when present, is always
+kept. The remaining budget is filled with history, newest first, and older
+turns that do not fit are dropped.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Sequence
+
+import tiktoken
+
+from app.config import settings
+
+# 메시지마다 role/구분자에 붙는 대략적인 오버헤드 (OpenAI chat 포맷 기준)
+_MESSAGE_OVERHEAD = 4
+# 이 비율 이상이 이미 들어간 청크와 겹치면 중복으로 보고 제외
+_OVERLAP_THRESHOLD = 0.8
+
+_CONTEXT_TEMPLATE = (
+    "{question}\n\n"
+    "Relevant context:\n"
+    "{context}\n\n"
+    "If the answer uses the context, cite using [number]."
+)
+_SUMMARY_TEMPLATE = "Summary of the earlier conversation:\n{summary}"
+
+
+@lru_cache(maxsize=4)
+def get_encoding(model: str | None = None) -> tiktoken.Encoding:
+    model = model or settings.openai_model_name
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # 목록에 없는 모델명(파인튜닝/신규 모델)은 최신 기본 인코딩으로 근사
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> tuple[str, bool]:
+    enc = get_encoding()
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text, False
+    # 토큰 경계가 멀티바이트 문자 중간일 수 있으므로 깨진 문자는 버림
+    return enc.decode(tokens[:max_tokens]).rstrip("�").rstrip() + " …", True
+
+
+@dataclass
+class Prompt:
+    messages: list[dict[str, str]]
+    sources: list[str]
+    usage: dict[str, int] = field(default_factory=dict)
+
+
+def assemble(
+    system: str,
+    history: Sequence[tuple[str, str]],
+    question: str,
+    hits: Sequence[dict],
+    *,
+    budget: int | None = None,
+    context_max: int | None = None,
+    chunk_max: int | None = None,
+    summary: str | None = None,
+) -> Prompt:
+    """history: 오래된 순 (role, content), hits: 검색 순위 순 {"id", "content"}
+
+    summary 는 요약된 이전 대화(services/summary.py)로, 항상 히스토리 앞에 포함된다.
+    """
+    budget = budget or settings.prompt_input_budget
+    context_max = context_max if context_max is not None else settings.prompt_context_max_tokens
+    chunk_max = chunk_max or settings.prompt_chunk_max_tokens
+
+    system_tokens = count_tokens(system) + _MESSAGE_OVERHEAD
+    summary_message = {"role": "system", "content": _SUMMARY_TEMPLATE.format(summary=summary)} if summary else None
+    summary_tokens = count_tokens(summary_message["content"]) + _MESSAGE_OVERHEAD if summary_message else 0
+    question_tokens = count_tokens(question) + _MESSAGE_OVERHEAD
+    fixed = system_tokens + summary_tokens + question_tokens
+
+    # 1) 검색 청크: 중복 제거 + 청크별 절단 + 컨텍스트 예산
+    context_budget = max(0, min(context_max, budget - fixed))
+    chunks: list[str] = []
+    sources: list[str] = []
+    seen: list[set[str]] = []
+    context_tokens = 0
+    deduped = truncated = 0
+    for hit in hits:
+        snippet = hit["content"].strip()
+        shingles = _shingles(snippet)
+        if any(_overlap(shingles, other) >= _OVERLAP_THRESHOLD for other in seen):
+            deduped += 1
+            continue
+        snippet, cut = truncate_tokens(snippet, chunk_max)
+        entry = f"[{len(chunks) + 1}] {snippet}"
+        cost = count_tokens(entry) + 2  # 청크 사이 "\n\n"
+        if context_tokens + cost > context_budget:
+            break
+        truncated += cut
+        chunks.append(entry)
+        sources.append(hit["id"])
+        seen.append(shingles)
+        context_tokens += cost
+
+    if chunks:
+        latest = _CONTEXT_TEMPLATE.format(question=question, context="\n\n".join(chunks))
+        question_tokens = count_tokens(latest) + _MESSAGE_OVERHEAD
+    else:
+        latest = question
+
+    # 2) 히스토리: 최신 메시지부터 남은 예산만큼
+    remaining = budget - system_tokens - summary_tokens - question_tokens
+    kept: list[dict[str, str]] = []
+    history_tokens = 0
+    for role, content in reversed(history):
+        cost = count_tokens(content) + _MESSAGE_OVERHEAD
+        if history_tokens + cost > remaining:
+            break
+        kept.append({"role": role, "content": content})
+        history_tokens += cost
+    kept.reverse()
+    # 잘린 경계가 어시스턴트 답변으로 시작하면 질문 없는 답이 되므로 제외
+    while kept and kept[0]["role"] == "assistant":
+        history_tokens -= count_tokens(kept.pop(0)["content"]) + _MESSAGE_OVERHEAD
+
+    messages = [*kept, {"role": "user", "content": latest}]
+    if summary_message:
+        messages.insert(0, summary_message)
+    return Prompt(
+        messages=messages,
+        sources=sources,
+        usage={
+            "budget": budget,
+            "system": system_tokens,
+            "summary": summary_tokens,
+            "history": history_tokens,
+            "history_messages": len(kept),
+            "history_dropped": len(history) - len(kept),
+            "context": context_tokens,
+            "chunks": len(chunks),
+            "chunks_deduped": deduped,
+            "chunks_truncated": truncated,
+            "chunks_dropped": len(hits) - len(chunks) - deduped,
+            "input": system_tokens + summary_tokens + history_tokens + question_tokens,
+        },
+    )
+
+
+def _shingles(text: str, n: int = 3) -> set[str]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _overlap(a: set[str], b: set[str]) -> float:
+    """a 가 b 에 포함된 비율 (짧은 청크가 긴 청크의 일부인 경우도 잡도록 containment 사용)"""
+    if not a:
+        return 1.0
+    return len(a & b) / len(a)
@@ -0,0 +1,80 @@
+# app/reranker.py
+"""Optional second retrieval stage: cross-encoder re-ranking of ANN candidates.
+
+`search_docs` over-fetches RERANK_CANDIDATES rows and `arerank` scores every
+(query, chunk) pair with a local CrossEncoder. It then keeps the best k with a
+score of at least RERANK_MIN_SCORE. Scoring runs in batches on a dedicated
+thread, so the event loop and the embedding executor are never blocked.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sentence_transformers import CrossEncoder
+
+from app.config import settings
+from app.telemetry import traced
+
+_model: CrossEncoder | None = None
+_model_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+
+# metrics
+_stats = {"calls": 0, "pairs": 0, "dropped": 0, "last_ms": 0.0}
+
+
+def get_reranker() -> CrossEncoder:
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = CrossEncoder(settings.rerank_model_name, max_length=settings.rerank_max_length, device="cpu")
+    return _model
+
+
+def score_pairs(query: str, passages: list[str]) -> list[float]:
+    scores = get_reranker().predict(
+        [(query, p) for p in passages],
+        batch_size=settings.rerank_batch_size,
+        show_progress_bar=False,
+    )
+    return [float(s) for s in scores]
+
+
+@traced("rerank")
+async def arerank(query: str, hits: list[dict], k: int, min_score: float | None = None) -> list[dict]:
+    """hits({"id","content","score"})를 cross-encoder 점수로 재정렬해 상위 k 개만 반환.
+
+    `score` 는 cross-encoder 점수로 바뀌고 원래 벡터 점수는 `vector_score` 에 남는다.
+    min_score 미만은 버리므로 관련 문서가 없으면 빈 목록이 될 수 있다.
+    """
+    if not hits:
+        return []
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+    min_score = settings.rerank_min_score if min_score is None else min_score
+
+    started = time.perf_counter()
+    scores = await asyncio.get_running_loop().run_in_executor(
+        _executor, score_pairs, query, [h["content"] for h in hits]
+    )
+    _stats["calls"] += 1
+    _stats["pairs"] += len(hits)
+    _stats["last_ms"] = (time.perf_counter() - started) * 1000
+
+    ranked = sorted(
+        ({**h, "vector_score": h["score"], "score": s} for h, s in zip(hits, scores)),
+        key=lambda h: h["score"],
+        reverse=True,
+    )
+    kept = [h for h in ranked if h["score"] >= min_score]
+    _stats["dropped"] += len(ranked) - len(kept)
+    return kept[:k]
+
+
+def stats() -> dict:
+    return {"enabled": settings.rerank_enabled, "model": settings.rerank_model_name, **_stats}
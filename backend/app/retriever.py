@@ -1,22 +1,327 @@
-from sqlalchemy import text, bindparam
+import json
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from sqlalchemy import Text, text, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
-from pgvector.sqlalchemy import Vector
-from app.embedding import embed_query
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from pgvector import Vector
+from app.embedding import aembed_queries, aembed_query
+from app.indexes import hot_filter_index_name, jsonb_literal
+from app.models import embedding_column_type
+from app.telemetry import traced
 from app.config import settings
 
-async def search_docs(db: AsyncSession, query: str, k: int | None = None):
-    k = k or settings.top_k
-    q_vec = embed_query(query)
+FILTER_STRATEGIES = ("partial", "exact", "iterative")
 
-    sql = text("""
-        SELECT id, content, 1 - (embedding <=> :q) AS score
-        FROM docs
-        ORDER BY embedding <=> :q
-        LIMIT :k
-    """).bindparams(
-        bindparam("q", type_=Vector(settings.embedding_dim))
+# 거리순 후보: {source} 는 docs 또는 필터로 좁힌 scope CTE, {where} 는 메타데이터 조건
+_CANDIDATES_SQL = """
+    SELECT id, content, embedding <=> :q AS dist
+    FROM {source}
+    {where}
+    ORDER BY embedding <=> :q
+    LIMIT {limit}
+"""
+
+# binary 양자화: bit 인덱스(해밍 거리)로 limit * factor 개를 뽑고 float 거리로 재정렬
+_BINARY_CANDIDATES_SQL = """
+    SELECT id, content, embedding <=> :q AS dist
+    FROM (
+        SELECT id, content, embedding
+        FROM {source}
+        {where}
+        ORDER BY binary_quantize(embedding)::bit({dim}) <~> binary_quantize(:q)
+        LIMIT {limit} * :rerank_factor
+    ) b
+    ORDER BY dist
+    LIMIT {limit}
+"""
+
+_VECTOR_SQL = """
+    {prefix}
+    SELECT id, content, 1 - dist AS score
+    FROM ({candidates}) c
+    ORDER BY dist
+"""
+
+# 벡터(HNSW) 후보와 트라이그램 후보를 한 번의 왕복으로 가져와 RRF 로 합침
+_HYBRID_SQL = """
+    WITH {prefix}
+    vec AS (
+        SELECT id, row_number() OVER (ORDER BY dist) AS rank
+        FROM ({candidates}) v
+    ),
+    lex AS (
+        SELECT id, row_number() OVER (ORDER BY sim DESC) AS rank
+        FROM (
+            SELECT id, word_similarity(:text, content) AS sim
+            FROM docs
+            WHERE :text <% content {lex_where}
+            ORDER BY sim DESC
+            LIMIT :n
+        ) l
     )
+    SELECT d.id, d.content,
+           COALESCE(1.0 / (:rrf_k + vec.rank), 0) + COALESCE(1.0 / (:rrf_k + lex.rank), 0) AS score
+    FROM vec
+    FULL OUTER JOIN lex ON lex.id = vec.id
+    JOIN docs d ON d.id = COALESCE(vec.id, lex.id)
+    ORDER BY score DESC
+    LIMIT :k
+"""
+
+# 배치 검색: 질의 벡터 배열을 unnest 하고 질의마다 LATERAL 로 인덱스 k-NN (한 번의 왕복)
+# 벡터는 텍스트 배열로 넘겨 서브쿼리에서 한 번만 캐스팅 (asyncpg 에 vector[] 코덱이 없음)
+_BATCH_SQL = """
+    SELECT q.ord, c.id, c.content, 1 - c.dist AS score
+    FROM (
+        SELECT CAST(v AS {vtype}) AS vec, ord
+        FROM unnest(:qs) WITH ORDINALITY AS u(v, ord)
+    ) q
+    CROSS JOIN LATERAL ({candidates}) c
+    ORDER BY q.ord, c.dist
+"""
+
+_BATCH_CANDIDATES_SQL = """
+    SELECT id, content, embedding <=> q.vec AS dist
+    FROM docs
+    {where}
+    ORDER BY embedding <=> q.vec
+    LIMIT :k
+"""
+
+_BATCH_BINARY_CANDIDATES_SQL = """
+    SELECT id, content, embedding <=> q.vec AS dist
+    FROM (
+        SELECT id, content, embedding
+        FROM docs
+        {where}
+        ORDER BY binary_quantize(embedding)::bit({dim}) <~> binary_quantize(q.vec)
+        LIMIT :k * :rerank_factor
+    ) b
+    ORDER BY dist
+    LIMIT :k
+"""
+
+_COUNT_SQL = text("""
+    SELECT count(*) FROM (
+        SELECT 1 FROM docs WHERE metadata @> :filter LIMIT :cap
+    ) s
+""").bindparams(bindparam("filter", type_=JSONB))
+
+# 필터별 매칭 건수 추정 캐시: key -> (측정 시각, 건수). 키가 클라이언트 필터이므로 LRU 로 개수 제한
+_selectivity: OrderedDict[str, tuple[float, int]] = OrderedDict()
+
+
+def check_filter_strategy() -> None:
+    """lifespan 시작 시 호출: 오타난 FILTER_STRATEGY 가 검색 요청마다 늦게 터지지 않도록"""
+    if settings.filter_strategy != "auto" and settings.filter_strategy not in FILTER_STRATEGIES:
+        raise ValueError(f"unknown FILTER_STRATEGY: {settings.filter_strategy}")
+
+
+async def search_docs(
+    db: AsyncSession,
+    query: str,
+    k: int | None = None,
+    mode: str | None = None,
+    meta_filter: dict | None = None,
+    filter_strategy: str | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+):
+    """mode: "vector"(코사인 ANN) | "hybrid"(ANN + pg_trgm, RRF 결합). 미지정 시 settings.search_mode
+
+    meta_filter 는 `metadata @> meta_filter` 로 적용되며, HNSW 후처리 필터링으로
+    결과가 k 개보다 적게 나오지 않도록 `plan_filter` 가 실행 전략을 고른다.
+    """
+    q_vec = await aembed_query(query)
+    return await search_by_vector(db, q_vec, query, k, mode, meta_filter, filter_strategy, ef_search, probes)
+
+
+@traced("search")
+async def search_by_vector(
+    db: AsyncSession,
+    q_vec: list[float],
+    query: str = "",
+    k: int | None = None,
+    mode: str | None = None,
+    meta_filter: dict | None = None,
+    filter_strategy: str | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+):
+    """`search_docs` 에서 임베딩 단계를 뺀 것 (벤치마크/배치 검색용)"""
+    k = k or settings.top_k
+    mode = mode or settings.search_mode
+    if mode not in ("vector", "hybrid"):
+        raise ValueError(f"unknown search mode: {mode}")
+
+    params: dict = {"q": q_vec, "k": k}
+    prefix, source, where, lex_where = "", "docs", "", ""
+    n = max(k, settings.hybrid_candidates) if mode == "hybrid" else k
+    binary = settings.embedding_quantization == "binary"
+    # HNSW 는 ef_search 보다 많은 후보를 돌려주지 못하므로 인덱스에서 뽑을 개수 이상으로 맞춤
+    index_limit = n * settings.binary_rerank_factor if binary else n
+    # 트랜잭션 범위 설정 (SET LOCAL). 기본값은 커넥션 생성 시 server_settings 로 들어가 있음
+    local: dict[str, str] = {}
+    if ef_search or index_limit > settings.hnsw_ef_search:
+        local["hnsw.ef_search"] = str(max(ef_search or settings.hnsw_ef_search, index_limit))
+    if probes:
+        local["ivfflat.probes"] = str(probes)
+    if meta_filter:
+        strategy = filter_strategy or await plan_filter(db, meta_filter)
+        if strategy == "partial" and hot_filter_index_name(meta_filter) is None:
+            strategy = "iterative"
+        if strategy == "partial":
+            # 부분 인덱스는 쿼리 조건이 상수여야 매칭되므로 설정에 등록된 필터만 리터럴로 렌더링
+            pred = f"metadata @> {jsonb_literal(meta_filter)}"
+        else:
+            pred = "metadata @> :filter"
+            params["filter"] = meta_filter
+        if strategy == "exact":
+            # 선택도가 높으면 필터된 행만 모아 정확 정렬 (HNSW 우회, recall 100%)
+            prefix = f"scope AS MATERIALIZED (SELECT id, content, embedding FROM docs WHERE {pred})"
+            source = "scope"
+        else:
+            where = f"WHERE {pred}"
+            if strategy == "iterative":
+                local["hnsw.iterative_scan"] = "strict_order"
+                local["ivfflat.iterative_scan"] = "relaxed_order"
+                local["hnsw.ef_search"] = str(max(settings.filter_ef_search, ef_search or 0, index_limit))
+        lex_where = f"AND {pred}"
 
-    res = await db.execute(sql, {"q": q_vec, "k": k})
+    if local:
+        await _set_local(db, local)
+
+    limit = ":n" if mode == "hybrid" else ":k"
+    if binary and source == "docs":
+        candidates = _BINARY_CANDIDATES_SQL.format(
+            source=source, where=where, limit=limit, dim=settings.embedding_store_dim
+        )
+        params["rerank_factor"] = settings.binary_rerank_factor
+    else:
+        # exact 전략(scope)은 어차피 전체 정렬이므로 float 거리로 바로 정렬
+        candidates = _CANDIDATES_SQL.format(source=source, where=where, limit=limit)
+
+    if mode == "hybrid":
+        sql = _HYBRID_SQL.format(
+            prefix=f"{prefix}," if prefix else "", candidates=candidates, lex_where=lex_where
+        )
+        params.update(text=query, n=n, rrf_k=settings.rrf_k)
+    else:
+        sql = _VECTOR_SQL.format(prefix=f"WITH {prefix}" if prefix else "", candidates=candidates)
+
+    res = await db.execute(_statement(sql, "filter" in params), params)
     rows = res.fetchall()
     return [{"id": r[0], "content": r[1], "score": float(r[2])} for r in rows]
+
+
+@lru_cache(maxsize=64)
+def _statement(sql: str, with_filter: bool):
+    """SQL 문자열별 text() 재사용: 모양(모드/전략)이 몇 가지뿐이라 asyncpg prepared statement 도 그대로 재사용됨"""
+    stmt = text(sql).bindparams(bindparam("q", type_=embedding_column_type()))
+    if with_filter:
+        stmt = stmt.bindparams(bindparam("filter", type_=JSONB))
+    return stmt
+
+
+@traced("search_batch")
+async def search_batch(
+    db: AsyncSession,
+    queries: list[str],
+    k: int | None = None,
+    meta_filter: dict | None = None,
+    ef_search: int | None = None,
+) -> list[list[dict]]:
+    """여러 질의를 한 번에: 중복 제거 → 한 번의 배치 임베딩 → 한 번의 SQL 왕복. 결과는 입력 순서대로"""
+    unique = list(dict.fromkeys(queries))
+    vectors = await aembed_queries(unique)
+    by_query = dict(zip(unique, await search_batch_by_vector(db, vectors, k, meta_filter, ef_search)))
+    return [by_query[q] for q in queries]
+
+
+async def search_batch_by_vector(
+    db: AsyncSession,
+    vectors: list[list[float]],
+    k: int | None = None,
+    meta_filter: dict | None = None,
+    ef_search: int | None = None,
+) -> list[list[dict]]:
+    """벡터 모드 전용 (하이브리드의 트라이그램 후보는 질의마다 따로 돌아야 해서 제외)"""
+    if not vectors:
+        return []
+    k = k or settings.top_k
+    binary = settings.embedding_quantization == "binary"
+    index_limit = k * settings.binary_rerank_factor if binary else k
+    params: dict = {"qs": [Vector(v).to_text() for v in vectors], "k": k}
+    local: dict[str, str] = {}
+    if ef_search or index_limit > settings.hnsw_ef_search:
+        local["hnsw.ef_search"] = str(max(ef_search or settings.hnsw_ef_search, index_limit))
+    where = ""
+    if meta_filter:
+        # 질의마다 선택도를 따로 볼 수 없으므로 필터는 항상 iterative scan 으로 (결과 수 부족 방지)
+        where = "WHERE metadata @> :filter"
+        params["filter"] = meta_filter
+        local["hnsw.iterative_scan"] = "strict_order"
+        local["ivfflat.iterative_scan"] = "relaxed_order"
+        local["hnsw.ef_search"] = str(max(settings.filter_ef_search, ef_search or 0, index_limit))
+    if local:
+        await _set_local(db, local)
+
+    if binary:
+        candidates = _BATCH_BINARY_CANDIDATES_SQL.format(where=where, dim=settings.embedding_store_dim)
+        params["rerank_factor"] = settings.binary_rerank_factor
+    else:
+        candidates = _BATCH_CANDIDATES_SQL.format(where=where)
+    vtype = f"{settings.embedding_storage}({settings.embedding_store_dim})"
+    res = await db.execute(_batch_statement(_BATCH_SQL.format(vtype=vtype, candidates=candidates), bool(meta_filter)), params)
+
+    grouped: list[list[dict]] = [[] for _ in vectors]
+    for ord_, doc_id, content, score in res.fetchall():
+        grouped[ord_ - 1].append({"id": doc_id, "content": content, "score": float(score)})
+    return grouped
+
+
+@lru_cache(maxsize=16)
+def _batch_statement(sql: str, with_filter: bool):
+    stmt = text(sql).bindparams(bindparam("qs", type_=ARRAY(Text)))
+    if with_filter:
+        stmt = stmt.bindparams(bindparam("filter", type_=JSONB))
+    return stmt
+
+
+async def plan_filter(db: AsyncSession, meta_filter: dict) -> str:
+    """필터 실행 전략 선택.
+
+    - partial:   settings.hot_filters 에 등록돼 부분 HNSW 인덱스가 있는 필터
+    - exact:     매칭 행이 filter_exact_max_rows 이하 → 필터 후 정확 정렬
+    - iterative: 그 외 → pgvector iterative index scan + 큰 ef_search
+    """
+    if settings.filter_strategy != "auto":
+        return settings.filter_strategy
+    if hot_filter_index_name(meta_filter) is not None:
+        return "partial"
+
+    key = json.dumps(meta_filter, sort_keys=True, ensure_ascii=False)
+    cached = _selectivity.get(key)
+    now = time.monotonic()
+    if cached is None or now - cached[0] > settings.filter_stats_ttl_seconds:
+        cap = settings.filter_exact_max_rows + 1
+        count = (await db.execute(_COUNT_SQL, {"filter": meta_filter, "cap": cap})).scalar_one()
+        cached = (now, count)
+        _selectivity[key] = cached
+        while len(_selectivity) > max(1, settings.filter_stats_max_entries):
+            _selectivity.popitem(last=False)
+    _selectivity.move_to_end(key)
+    return "exact" if cached[1] <= settings.filter_exact_max_rows else "iterative"
+
+
+async def _set_local(db: AsyncSession, values: dict[str, str]) -> None:
+    """set_config(name, value, is_local=true) 를 한 번의 왕복으로 적용"""
+    exprs, params = [], {}
+    for i, (name, value) in enumerate(values.items()):
+        exprs.append(f"set_config(:n{i}, :v{i}, true)")
+        params[f"n{i}"] = name
+        params[f"v{i}"] = value
+    await db.execute(text("SELECT " + ", ".join(exprs)), params)
@@ -1,9 +1,13 @@
-﻿from fastapi import APIRouter, Depends, HTTPException
+﻿import math
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
-from app.schemas import ChatRequest, ChatResponse
-from app.services.chat import ask_llm
+from app.llm.base import LLMBusyError
+from app.schemas import ChatRequest, ChatResponse, MessagePage
+from app.services.chat import ask_llm, list_messages, stream_llm
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -13,4 +17,45 @@ async def chat(payload: ChatRequest, db: AsyncSession = Depends(get_db)):
     try:
         return await ask_llm(db, payload)
     except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except LLMBusyError as exc:
+        raise _busy(exc) from exc
+
+
+@router.post("/stream")
+async def chat_stream(payload: ChatRequest):
+    """SSE: sources → delta* → done | error"""
+    try:
+        events = await stream_llm(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except LLMBusyError as exc:
+        raise _busy(exc) from exc
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/sessions/{session_id}/messages", response_model=MessagePage)
+async def session_messages(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="이전 응답의 next_cursor"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="desc: 최신 메시지부터"),
+    db: AsyncSession = Depends(get_db),
+):
+    """세션 히스토리 (키셋 페이지네이션)"""
+    try:
+        page = await list_messages(db, session_id, limit=limit, cursor=cursor, order=order)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if page is None:
+        raise HTTPException(status_code=404, detail="session not found")
+    return page
+
+
+def _busy(exc: LLMBusyError) -> HTTPException:
+    # LLM 동시 실행 한도/대기열 초과 또는 업스트림 rate limit: 쌓아두지 않고 재시도 시점을 알려줌
+    return HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(math.ceil(exc.retry_after))})
@@ -1,18 +1,138 @@
-from fastapi import APIRouter, Depends
+import json
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_db
-from app.schemas import DocumentCreate, SearchResponse, SearchHit
-from app.services.docs import upsert_doc
-from app.retriever import search_docs
+from app.chunking import achunk_lines, iter_lines
+from app.db import get_db, get_read_db
+from app.schemas import (
+    BatchSearchRequest, BatchSearchResponse, BulkIngestResponse, DocumentCreate, SearchMode, SearchResponse,
+    SearchHit, SourceIngestResponse,
+)
+from app.services.docs import replace_source, upsert_doc, upsert_docs_bulk
+from app.config import settings
+from app.reranker import arerank
+from app.retriever import search_batch, search_docs
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
+_NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
 @router.post("")
 async def upsert_document(payload: DocumentCreate, db: AsyncSession = Depends(get_db)):
-    await upsert_doc(db, payload.id, payload.content, payload.meta)
-    return {"ok": True}
+    status = await upsert_doc(db, payload.id, payload.content, payload.meta)
+    return {"ok": True, "status": status}
+
+@router.post("/bulk", response_model=BulkIngestResponse)
+async def bulk_upsert_documents(request: Request, db: AsyncSession = Depends(get_db)):
+    """JSON 배열 또는 NDJSON(한 줄에 문서 하나) 바디를 받아 배치 단위로 적재"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in _NDJSON_TYPES:
+        items = _iter_ndjson(request)
+    else:
+        try:
+            body = json.loads(await request.body())
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"invalid JSON body: {exc}") from exc
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="body must be a JSON array of documents")
+        items = _iter_array(body)
+    return await upsert_docs_bulk(db, items)
+
+@router.put("/{parent_id}/source", response_model=SourceIngestResponse)
+async def put_document_source(
+    parent_id: str,
+    request: Request,
+    meta: str | None = Query(None, description='JSON object stored on every chunk, e.g. {"lang":"ko"}'),
+    db: AsyncSession = Depends(get_db),
+):
+    """원문(markdown/plain text) 바디를 스트리밍으로 청킹·임베딩해 `parent_id` 의 청크를 통째로 교체"""
+    if "#" in parent_id:
+        raise HTTPException(status_code=400, detail="parent_id must not contain '#'")
+    chunks = achunk_lines(iter_lines(request.stream()))
+    return await replace_source(db, parent_id, chunks, _parse_json_object(meta, "meta"))
 
 @router.get("/search", response_model=SearchResponse)
-async def search(q: str, k: int = 5, db: AsyncSession = Depends(get_db)):
-    hits = await search_docs(db, q, k)
-    return SearchResponse(query=q, hits=[SearchHit(**h) for h in hits])
\ No newline at end of file
+async def search(
+    q: str,
+    k: int = 5,
+    mode: SearchMode | None = None,
+    filter: str | None = Query(None, description='JSON object matched as metadata @> filter, e.g. {"lang":"ko"}'),
+    ef_search: int | None = Query(None, ge=1, le=1000, description="hnsw.ef_search for this request"),
+    probes: int | None = Query(None, ge=1, le=10000, description="ivfflat.probes for this request"),
+    rerank: bool | None = Query(None, description="cross-encoder re-ranking (default: RERANK_ENABLED)"),
+    candidates: int | None = Query(None, ge=1, le=500, description="ANN candidates to re-rank"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    meta_filter = _parse_json_object(filter, "filter") or None
+    rerank = settings.rerank_enabled if rerank is None else rerank
+    fetch_k = max(k, candidates or settings.rerank_candidates) if rerank else k
+    hits = await search_docs(
+        db, q, fetch_k, mode.value if mode else None, meta_filter, ef_search=ef_search, probes=probes
+    )
+    if rerank:
+        # cross-encoder 점수 계산 동안 커넥션을 잡고 있지 않도록 읽기 트랜잭션 종료
+        await db.rollback()
+        hits = await arerank(q, hits, k)
+    return SearchResponse(query=q, hits=[SearchHit(**h) for h in hits])
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_many(payload: BatchSearchRequest, db: AsyncSession = Depends(get_read_db)):
+    """질의 N 개 → 배치 임베딩 1회 + SQL 왕복 1회 (unnest + LATERAL k-NN)"""
+    queries = [q.strip() for q in payload.queries]
+    if any(not q for q in queries):
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(queries) > settings.search_batch_max_queries:
+        raise HTTPException(
+            status_code=400, detail=f"at most {settings.search_batch_max_queries} queries per request"
+        )
+    grouped = await search_batch(db, queries, payload.k, payload.filter or None, payload.ef_search)
+    return BatchSearchResponse(
+        results=[SearchResponse(query=q, hits=[SearchHit(**h) for h in hits]) for q, hits in zip(queries, grouped)],
+        unique_queries=len(set(queries)),
+    )
+
+
+def _parse_json_object(raw: str | None, name: str) -> dict | None:
+    if not raw:
+        return None
+    try:
+        value = json.loads(raw)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"invalid {name} JSON: {exc}") from exc
+    if not isinstance(value, dict):
+        raise HTTPException(status_code=400, detail=f"{name} must be a JSON object")
+    return value
+
+def _validate(raw) -> DocumentCreate | str:
+    try:
+        return DocumentCreate.model_validate(raw)
+    except ValidationError as exc:
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+
+async def _iter_array(body: list) -> AsyncIterator[tuple[int, DocumentCreate | str]]:
+    for index, raw in enumerate(body):
+        yield index, _validate(raw)
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[tuple[int, DocumentCreate | str]]:
+    # 바디 전체를 메모리에 올리지 않고 줄 단위로 흘려보냄
+    index = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _parse_line(line)
+                index += 1
+    if buffer.strip():
+        yield index, _parse_line(buffer)
+
+def _parse_line(line: bytes) -> DocumentCreate | str:
+    try:
+        raw = json.loads(line)
+    except ValueError as exc:
+        return f"invalid JSON: {exc}"
+    return _validate(raw)
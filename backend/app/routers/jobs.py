@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_db
+from app.jobs import cancel_job, submit_job
+from app.models import IngestJob
+from app.routers.documents import _parse_json_object
+from app.schemas import DocumentCreate, JobOut
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.post("/documents", response_model=JobOut, status_code=202)
+async def submit_documents(payload: list[DocumentCreate], db: AsyncSession = Depends(get_db)):
+    """`POST /documents/bulk` 와 같은 적재를 백그라운드 작업으로 (즉시 job id 반환)"""
+    items = [doc.model_dump() for doc in payload]
+    return await submit_job(db, "bulk", {"items": items}, total=len(items))
+
+
+@router.put("/documents/{parent_id}/source", response_model=JobOut, status_code=202)
+async def submit_source(
+    parent_id: str,
+    request: Request,
+    meta: str | None = Query(None, description='JSON object stored on every chunk, e.g. {"lang":"ko"}'),
+    db: AsyncSession = Depends(get_db),
+):
+    """`PUT /documents/{parent_id}/source` 의 백그라운드 버전"""
+    if "#" in parent_id:
+        raise HTTPException(status_code=400, detail="parent_id must not contain '#'")
+    body = (await request.body()).decode("utf-8", errors="replace")
+    payload = {"parent_id": parent_id, "text": body, "meta": _parse_json_object(meta, "meta")}
+    return await submit_job(db, "source", payload)
+
+
+@router.get("", response_model=list[JobOut])
+async def list_jobs(
+    status: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    stmt = select(IngestJob).order_by(IngestJob.created_at.desc()).limit(limit)
+    if status:
+        stmt = stmt.where(IngestJob.status == status)
+    return list((await db.execute(stmt)).scalars())
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await db.get(IngestJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=JobOut)
+async def cancel(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await cancel_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    if job.status in ("succeeded", "failed"):
+        raise HTTPException(status_code=409, detail=f"job already {job.status}")
+    return job
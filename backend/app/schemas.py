@@ -14,6 +14,10 @@ class Role(str, Enum):
     assistant = "assistant"
     system = "system"
 
+class SearchMode(str, Enum):
+    vector = "vector"   # 코사인 ANN (HNSW)
+    hybrid = "hybrid"   # ANN + pg_trgm 을 RRF 로 결합
+
 # ---------------------------
 # Document (지식 베이스)
 # ---------------------------
@@ -23,18 +27,78 @@ class DocumentCreate(BaseModel):
     content: str
     # 입력 받을 때는 meta/metadata 둘 다 OK, 코드에선 payload.meta 로 사용
     meta: Optional[dict] = Field(default=None, validation_alias=AliasChoices("meta", "metadata"))
+    parent_id: Optional[str] = None   # 같은 원문에서 나온 청크끼리 묶는 id
+    chunk_index: Optional[int] = None
+
+class BulkItemResult(BaseModel):
+    """벌크 적재 결과 한 건"""
+    index: int                  # 요청 내 순번 (NDJSON 이면 줄 번호, 0부터)
+    id: Optional[str] = None
+    status: str                 # inserted | updated | skipped | duplicate | failed
+    error: Optional[str] = None
+
+class BulkIngestResponse(BaseModel):
+    """벌크 적재 응답: 건별 결과 + 처리량"""
+    total: int
+    inserted: int
+    updated: int
+    skipped: int                # 내용/모델이 같아 인코딩을 생략한 건수
+    failed: int
+    batches: int
+    elapsed_ms: float
+    docs_per_sec: float
+    items: List[BulkItemResult]
+
+class SourceIngestResponse(BaseModel):
+    """원문 적재 응답: 청크 단위 결과 집계"""
+    parent_id: str
+    chunks: int
+    inserted: int
+    updated: int
+    skipped: int                # 내용이 같아 재인코딩하지 않은 청크
+    deleted: int                # 새 원문에 없어져 지운 이전 청크
+    batches: int
+    elapsed_ms: float
+
+class JobOut(BaseModel):
+    """백그라운드 적재 작업 상태"""
+    model_config = ConfigDict(from_attributes=True)
+    id: str
+    kind: str                   # bulk | source
+    status: str                 # queued | running | succeeded | failed | cancelled
+    progress: dict = {}         # total/processed/inserted/updated/skipped/failed/batches
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 class SearchHit(BaseModel):
     """벡터 검색 결과 한 건"""
     id: str
     content: str
-    score: float  # 0~1 (코사인 유사도면 보통 1 - distance)
+    score: float  # 0~1 (코사인 유사도면 보통 1 - distance, 재정렬 시 cross-encoder 점수)
+    vector_score: Optional[float] = None  # 재정렬 전 검색 점수
 
 class SearchResponse(BaseModel):
     """검색 응답 포맷"""
     query: str
     hits: List[SearchHit]
 
+class BatchSearchRequest(BaseModel):
+    """여러 질의를 한 번에 검색 (벡터 모드). 같은 질의는 한 번만 임베딩/검색"""
+    queries: List[str] = Field(min_length=1)
+    k: int = Field(5, ge=1, le=100)
+    filter: Optional[dict] = None           # metadata @> filter (모든 질의에 공통)
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+
+class BatchSearchResponse(BaseModel):
+    """질의 순서대로의 결과 (중복 질의는 같은 결과를 반복)"""
+    results: List[SearchResponse]
+    unique_queries: int
+
 # ---------------------------
 # ChatSession / Message (대화 히스토리)
 # ---------------------------
@@ -71,6 +135,11 @@ class MessageOut(BaseModel):
     meta: Optional[dict] = None
     created_at: datetime
 
+class MessagePage(BaseModel):
+    """세션 메시지 한 페이지 (키셋 페이지네이션). next_cursor 를 다음 요청의 cursor 로"""
+    items: List[MessageOut]
+    next_cursor: Optional[str] = None   # 더 없으면 None
+
 # ---------------------------
 # Chat API (RAG 엔드포인트)
 # ---------------------------
@@ -79,9 +148,15 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = None
     message: str
     top_k: Optional[int] = None  # 미지정 시 settings.top_k 사용
+    search_mode: Optional[SearchMode] = None  # 미지정 시 settings.search_mode 사용
+    filter: Optional[dict] = None  # 메타데이터 필터: metadata @> filter, 예: {"lang": "ko"}
+    rerank: Optional[bool] = None  # cross-encoder 재정렬, 미지정 시 settings.rerank_enabled
 
 class ChatResponse(BaseModel):
     """/chat 응답 포맷"""
     reply: str
     sources: List[str] = []   # 사용한 Document.id 목록
-    session_id: str           # 이어서 대화할 때 필요
\ No newline at end of file
+    session_id: str           # 이어서 대화할 때 필요
+    timings: Optional[dict[str, float]] = None  # 단계별 지연(ms): session/history/retrieval/cache/llm/persist/total
+    tokens: Optional[dict[str, int]] = None  # 프롬프트 토큰 수: system/summary/history/context/input ...
+    cached: bool = False      # 의미 캐시에서 재사용한 답변이면 True (LLM 미호출)
\ No newline at end of file
@@ -0,0 +1,156 @@
+# app/services/answer_cache.py
+"""Semantic cache of first-turn /chat answers.
+
+A stored reply is reused when a new question's embedding is within
+ANSWER_CACHE_THRESHOLD cosine similarity of a cached question *and* retrieval
+returned exactly the same sources, i.e. the model would see the same context.
+Only first turns are cached because later turns depend on the history.
+Entries expire after ANSWER_CACHE_TTL_SECONDS and are deleted as soon as one
+of their source documents is re-ingested (`invalidate_sources`).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import SessionLocal
+from app.embedding import embedding_model_id
+from app.models import AnswerCache
+from app.telemetry import traced
+
+
+class AnswerCacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidated = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.answer_cache_enabled,
+            "threshold": settings.answer_cache_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "invalidated": self.invalidated,
+            "errors": self.errors,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+_stats = AnswerCacheStats()
+_pending_writes: set[asyncio.Task] = set()
+
+
+def stats() -> dict:
+    return _stats.as_dict()
+
+
+def variant_key(system: str) -> str:
+    """생성 조건(LLM 모델/프롬프트/샘플링, 임베딩 공간)이 바뀌면 기존 답변은 재사용하지 않음"""
+    raw = "\x1f".join([
+        settings.llm_provider,
+        settings.openai_model_name,
+        json.dumps(settings.llm_routes, sort_keys=True),
+        str(settings.openai_temperature),
+        str(settings.max_tokens),
+        embedding_model_id(),
+        system,
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@traced("answer_cache_lookup")
+async def lookup(q_vec: list[float], sources: list[str], system: str) -> str | None:
+    """가장 가까운 캐시 답변 (같은 variant + 같은 sources + 유사도 임계값 이상)"""
+    if not settings.answer_cache_enabled:
+        return None
+    dist = AnswerCache.query_embedding.cosine_distance(q_vec)
+    # source_ids 일치로 후보가 소수로 좁혀지므로 거리 계산은 그 안에서만 수행
+    stmt = (
+        select(AnswerCache.id, AnswerCache.reply)
+        .where(
+            AnswerCache.variant == variant_key(system),
+            AnswerCache.source_ids == sources,
+            or_(AnswerCache.expires_at.is_(None), AnswerCache.expires_at > datetime.now(timezone.utc)),
+            dist <= 1 - settings.answer_cache_threshold,
+        )
+        .order_by(dist)
+        .limit(1)
+    )
+    try:
+        async with SessionLocal() as db:
+            row = (await db.execute(stmt)).first()
+    except SQLAlchemyError:
+        # 캐시 장애가 답변 생성을 막지 않도록 miss 로 처리
+        _stats.errors += 1
+        return None
+    if row is None:
+        _stats.misses += 1
+        return None
+    _stats.hits += 1
+    _spawn(_record_hit(row.id))
+    return row.reply
+
+
+def store(q_vec: list[float], query: str, sources: list[str], system: str, reply: str) -> None:
+    """응답 지연을 늘리지 않도록 백그라운드로 저장"""
+    if settings.answer_cache_enabled and reply:
+        _spawn(_store(q_vec, query, sources, system, reply))
+
+
+async def invalidate_sources(db: AsyncSession, doc_ids: list[str]) -> None:
+    """문서가 바뀌면 그 문서를 근거로 한 답변을 삭제 (호출한 트랜잭션 안에서 함께 커밋)"""
+    if not doc_ids:
+        return
+    result = await db.execute(delete(AnswerCache).where(AnswerCache.source_ids.overlap(doc_ids)))
+    _stats.invalidated += result.rowcount or 0
+
+
+async def _store(q_vec: list[float], query: str, sources: list[str], system: str, reply: str) -> None:
+    now = datetime.now(timezone.utc)
+    ttl = settings.answer_cache_ttl_seconds
+    try:
+        async with SessionLocal() as db:
+            await db.execute(insert(AnswerCache).values(
+                variant=variant_key(system),
+                query=query,
+                query_embedding=q_vec,
+                source_ids=sources,
+                reply=reply,
+                expires_at=now + timedelta(seconds=ttl) if ttl > 0 else None,
+            ))
+            # 만료된 항목 정리 (expires_at 인덱스)
+            await db.execute(delete(AnswerCache).where(AnswerCache.expires_at <= now))
+            await db.commit()
+        _stats.stores += 1
+    except SQLAlchemyError:
+        _stats.errors += 1
+
+
+async def _record_hit(entry_id: int) -> None:
+    try:
+        async with SessionLocal() as db:
+            await db.execute(
+                update(AnswerCache).where(AnswerCache.id == entry_id).values(hits=AnswerCache.hits + 1)
+            )
+            await db.commit()
+    except SQLAlchemyError:
+        pass
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
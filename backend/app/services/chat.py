@@ -1,17 +1,30 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import base64
+import json
+import math
 from datetime import datetime, timezone
-from typing import Iterable, Sequence
+from typing import AsyncIterator, Sequence
 from uuid import uuid4
 
-from sqlalchemy import select
+from sqlalchemy import Row, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.llm.openai_client import OpenAIClient
+from app.db import ReadSessionLocal, SessionLocal
+from app.llm import registry
+from app.llm.base import LLMBusyError
 from app.models import ChatSession, Message
-from app.retriever import search_docs
-from app.schemas import ChatRequest, ChatResponse, Role
+from app.prompt import assemble, count_tokens
+from app.reranker import arerank
+from app.embedding import aembed_query
+from app.retriever import search_by_vector
+from app.schemas import ChatRequest, ChatResponse, MessageOut, MessagePage, Role
+from app.services import answer_cache
+from app.services.summary import schedule_compaction, session_summary
+from app.telemetry import span, traced
+from app.timing import StageTimer
 
 SYSTEM_PROMPT = (
     "You are a helpful assistant for a portfolio website. "
@@ -19,113 +32,320 @@ SYSTEM_PROMPT = (
     "If the latest user message contains numbered context like [1], [2], cite them in your reply."
 )
 
-_HISTORY_LIMIT = 20
+_HISTORY_LIMIT = 20  # DB 에서 읽는 최대 메시지 수 (보낼 양은 토큰 예산으로 결정)
 
-_llm_client: OpenAIClient | None = None
+# GET /chat/sessions/{id}/messages 가 읽는 컬럼 (MessageOut 필드와 동일)
+_PAGE_COLUMNS = (Message.id, Message.session_id, Message.role, Message.content, Message.meta, Message.created_at)
 
+async def ask_llm(db: AsyncSession, payload: ChatRequest) -> ChatResponse:
+    """Main chat entry point used by the router."""
+    message = _validate_message(payload)
+    timer = StageTimer()
 
-def _get_llm_client() -> OpenAIClient:
-    global _llm_client
-    if _llm_client is None:
-        _llm_client = OpenAIClient()
-    return _llm_client
+    try:
+        turn = await _prepare_turn(db, payload, message, timer)
+        # 읽기 트랜잭션을 끝내 LLM 생성 동안 커넥션을 풀에 돌려줌 (저장 시 새로 체크아웃)
+        await db.rollback()
+        reply = turn.cached_reply
+        if reply is None:
+            llm = _route(turn)
+            with timer.stage("llm"):
+                reply = await llm.provider.acomplete(messages=turn.llm_messages, system=SYSTEM_PROMPT, model=llm.model)
+            _cache_answer(turn, reply)
+        timings = timer.as_dict()
+        with timer.stage("persist"):
+            await _persist_turn(db, turn, reply, _reply_meta(turn, reply, timings))
+    except Exception:
+        await db.rollback()
+        raise
+    # 요약(압축)은 응답을 돌려준 뒤 백그라운드에서
+    schedule_compaction(turn.session_id, turn.pending_messages, registry.get_provider())
 
+    return ChatResponse(
+        reply=reply,
+        sources=turn.sources,
+        session_id=turn.session_id,
+        timings=timer.as_dict(),
+        tokens=turn.token_usage,
+        cached=turn.cached_reply is not None,
+    )
 
-async def ask_llm(db: AsyncSession, payload: ChatRequest) -> ChatResponse:
-    """Main chat entry point used by the router."""
+
+async def stream_llm(payload: ChatRequest) -> AsyncIterator[str]:
+    """Streaming variant of `ask_llm` producing Server-Sent Events.
+
+    Session, history and retrieval are read on a short-lived session before
+    streaming starts, so no DB connection is held while the model generates.
+    The user and assistant messages are written together on a fresh session
+    once the stream completes, fails or the client disconnects.
+    """
+    message = _validate_message(payload)
+    timer = StageTimer()
+
+    async with SessionLocal() as db:
+        turn = await _prepare_turn(db, payload, message, timer)
+    llm = None
+    if turn.cached_reply is None:
+        llm = _route(turn)
+        # 응답 헤더를 보내기 전에 입장 검사: 대기열이 가득 차면 SSE 대신 429 (LLMBusyError)
+        llm.provider.limiter.check()
+
+    async def events() -> AsyncIterator[str]:
+        parts: list[str] = []
+        finish = "cancelled"
+        try:
+            yield _sse("sources", {"session_id": turn.session_id, "sources": turn.sources})
+            if turn.cached_reply is not None:
+                parts.append(turn.cached_reply)
+                yield _sse("delta", {"text": turn.cached_reply})
+                finish = "completed"
+                yield _sse("done", {"session_id": turn.session_id, "timings": timer.as_dict(), "cached": True})
+                return
+            try:
+                with timer.stage("llm"):
+                    async for delta in llm.provider.astream(
+                        messages=turn.llm_messages, system=SYSTEM_PROMPT, model=llm.model
+                    ):
+                        if not parts:
+                            timer.stages["ttft"] = timer.elapsed_ms("llm")
+                        parts.append(delta)
+                        yield _sse("delta", {"text": delta})
+            except Exception as exc:
+                finish = "error"
+                error = {"detail": str(exc)}
+                if isinstance(exc, LLMBusyError):
+                    error["retry_after"] = math.ceil(exc.retry_after)
+                yield _sse("error", error)
+                return
+            finish = "completed"
+            _cache_answer(turn, "".join(parts))
+            yield _sse("done", {"session_id": turn.session_id, "timings": timer.as_dict()})
+        finally:
+            # 클라이언트가 끊겨 태스크가 취소돼도 저장은 끝까지 수행
+            await asyncio.shield(_persist_stream(turn, "".join(parts), finish, timer.as_dict()))
+
+    return events()
+
+
+class _Turn:
+    """Everything read before the LLM call; nothing is written until `_persist_turn`."""
+
+    __slots__ = (
+        "session_id", "is_new_session", "user_message", "sources", "llm_messages",
+        "query_vec", "first_turn", "token_usage", "pending_messages", "cached_reply", "model",
+    )
+
+    def __init__(
+        self,
+        session_id: str,
+        is_new_session: bool,
+        user_message: str,
+        sources: list[str],
+        llm_messages: list[dict[str, str]],
+        query_vec: list[float],
+        first_turn: bool,
+        token_usage: dict[str, int],
+        pending_messages: int,
+        cached_reply: str | None = None,
+    ):
+        self.session_id = session_id
+        self.is_new_session = is_new_session
+        self.user_message = user_message
+        self.sources = sources
+        self.llm_messages = llm_messages
+        self.query_vec = query_vec
+        self.first_turn = first_turn
+        self.token_usage = token_usage
+        self.pending_messages = pending_messages  # 요약에 아직 포함되지 않은 메시지 수 (이번 턴 포함)
+        self.cached_reply = cached_reply
+        self.model: str | None = None  # 라우팅된 LLM 모델 (캐시 hit 이면 None)
+
+
+def _validate_message(payload: ChatRequest) -> str:
     message = payload.message.strip()
     if not message:
         raise ValueError("message must not be empty")
+    return message
 
-    session = await _get_or_create_session(db, payload.session_id)
 
+async def _prepare_turn(db: AsyncSession, payload: ChatRequest, message: str, timer: StageTimer) -> _Turn:
     top_k = payload.top_k if payload.top_k and payload.top_k > 0 else settings.top_k
-    context_text, sources = await _build_context(db, message, top_k)
+    mode = payload.search_mode.value if payload.search_mode else None
+    rerank = settings.rerank_enabled if payload.rerank is None else payload.rerank
+    # 재정렬 시에는 후보를 넉넉히 뽑고 cross-encoder 로 top_k 개만 남김
+    fetch_k = max(top_k, settings.rerank_candidates) if rerank else top_k
+
+    async def load_session() -> tuple[ChatSession | None, str | None, list[Message]]:
+        with timer.stage("session"):
+            session = await db.get(ChatSession, payload.session_id) if payload.session_id else None
+        if session is None:
+            return None, None, []
+        summary, upto = session_summary(session)
+        with timer.stage("history"):
+            # 요약에 들어간 메시지 이후만 읽음. 실제로 보낼 양은 assemble 이 토큰 예산으로 다시 자름
+            history = await _load_history(db, session.id, _HISTORY_LIMIT, after_id=upto)
+        return session, summary, list(history)
+
+    async def retrieve() -> tuple[list[float], list[dict]]:
+        # 임베딩 + ANN 검색은 히스토리와 무관하므로 별도 커넥션에서 동시에 수행
+        with timer.stage("retrieval"):
+            q_vec = await aembed_query(message)
+            async with ReadSessionLocal() as search_db:
+                hits = await _retrieve_hits(search_db, message, q_vec, fetch_k, mode, payload.filter)
+        if rerank and hits:
+            with timer.stage("rerank"):
+                hits = await arerank(message, hits, top_k)
+        return q_vec, hits
+
+    (session, summary, history), (q_vec, hits) = await asyncio.gather(load_session(), retrieve())
+
+    with timer.stage("prompt"):
+        # 토큰 예산 안에서 청크/히스토리를 고름 (새 사용자 메시지는 아직 저장 전이므로 메모리에서 붙임)
+        prompt = assemble(SYSTEM_PROMPT, [(m.role, m.content) for m in history], message, hits, summary=summary)
+
+    session_id = session.id if session else (payload.session_id or str(uuid4()))
+    turn = _Turn(
+        session_id, session is None, message, prompt.sources, prompt.messages, q_vec,
+        first_turn=not history and summary is None,
+        token_usage=prompt.usage,
+        pending_messages=len(history) + 2,
+    )
+    if turn.first_turn and settings.answer_cache_enabled:
+        # 히스토리가 없는 첫 턴만: 이후 턴의 답변은 앞선 대화에 따라 달라짐
+        with timer.stage("cache"):
+            turn.cached_reply = await answer_cache.lookup(q_vec, turn.sources, SYSTEM_PROMPT)
+    return turn
 
-    try:
-        user_msg = await _save_message(db, session.id, Role.user.value, message)
-        history = await _load_history(db, session.id, _HISTORY_LIMIT)
-        llm_messages = _to_llm_messages(history, user_msg.id, context_text)
-        reply = await _get_llm_client().acomplete(messages=llm_messages, system=SYSTEM_PROMPT)
-        await _save_message(db, session.id, Role.assistant.value, reply, meta={"sources": sources} if sources else None)
-        session.last_activity_at = datetime.now(timezone.utc)
-        await db.commit()
-    except Exception:
-        await db.rollback()
-        raise
 
-    return ChatResponse(reply=reply, sources=sources, session_id=session.id)
+def _route(turn: _Turn) -> registry.Route:
+    """프롬프트 입력 토큰 수로 provider/모델 선택 (LLM_ROUTES)"""
+    llm = registry.route(turn.token_usage.get("input", 0))
+    turn.model = llm.model
+    return llm
 
 
-async def _get_or_create_session(db: AsyncSession, session_id: str | None) -> ChatSession:
-    if session_id:
-        session = await db.get(ChatSession, session_id)
-        if session:
-            return session
-        new_session = ChatSession(id=session_id)
+def _cache_answer(turn: _Turn, reply: str) -> None:
+    if turn.first_turn:
+        answer_cache.store(turn.query_vec, turn.user_message, turn.sources, SYSTEM_PROMPT, reply)
+
+
+@traced("persist_turn")
+async def _persist_turn(db: AsyncSession, turn: _Turn, reply: str, meta: dict | None) -> None:
+    """Write session (if new), user and assistant messages with a single flush at commit."""
+    now = datetime.now(timezone.utc)
+    if turn.is_new_session:
+        db.add(ChatSession(id=turn.session_id, last_activity_at=now))
     else:
-        new_session = ChatSession(id=str(uuid4()))
+        # 세션 행을 다시 읽지 않고 갱신 (prepare 단계의 트랜잭션은 이미 끝났음)
+        await db.execute(
+            update(ChatSession).where(ChatSession.id == turn.session_id).values(last_activity_at=now)
+        )
+    db.add(Message(session_id=turn.session_id, role=Role.user.value, content=turn.user_message))
+    db.add(Message(session_id=turn.session_id, role=Role.assistant.value, content=reply, meta=meta))
+    with span("db_commit"):
+        await db.commit()
+
+
+async def _persist_stream(turn: _Turn, reply: str, finish: str, timings: dict[str, float]) -> None:
+    if not reply and finish != "completed":
+        # ask_llm 실패 시 롤백과 동일하게 아무것도 남기지 않음
+        return
+    meta = _reply_meta(turn, reply, timings)
+    if finish != "completed":
+        meta["finish"] = finish
+    async with SessionLocal() as db:
+        await _persist_turn(db, turn, reply, meta)
+    schedule_compaction(turn.session_id, turn.pending_messages, registry.get_provider())
+
 
-    db.add(new_session)
-    await db.flush()
-    return new_session
+def _reply_meta(turn: _Turn, reply: str, timings: dict[str, float]) -> dict:
+    meta: dict = {"timings": timings}
+    # 캐시 hit 이면 실제 LLM 입력은 0 이지만, 원래 보냈을 양을 남겨 비교할 수 있게 함
+    meta["tokens"] = {**turn.token_usage, "output": count_tokens(reply)}
+    if turn.model:
+        meta["model"] = turn.model
+    if turn.sources:
+        meta["sources"] = turn.sources
+    if turn.cached_reply is not None:
+        meta["cached"] = True
+    return meta
 
 
-async def _load_history(db: AsyncSession, session_id: str, limit: int) -> Sequence[Message]:
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@traced("load_history")
+async def _load_history(db: AsyncSession, session_id: str, limit: int, after_id: int = 0) -> Sequence[Row]:
+    # 프롬프트에 필요한 컬럼만 (meta JSONB 는 읽지 않음). 정렬은 (session_id, created_at, id) 인덱스 역방향 스캔
     stmt = (
-        select(Message)
-        .where(Message.session_id == session_id)
-        .order_by(Message.created_at.desc())
+        select(Message.id, Message.role, Message.content)
+        .where(Message.session_id == session_id, Message.id > after_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
         .limit(limit)
     )
     result = await db.execute(stmt)
-    messages = list(result.scalars())
+    # 여러 컬럼이므로 scalars() 가 아니라 Row 로 (.role/.content 를 씀)
+    messages = list(result.all())
     messages.reverse()
     return messages
 
 
-async def _save_message(
+async def _retrieve_hits(
+    db: AsyncSession,
+    query: str,
+    q_vec: list[float],
+    top_k: int,
+    mode: str | None = None,
+    meta_filter: dict | None = None,
+) -> list[dict]:
+    if top_k <= 0:
+        return []
+    return await search_by_vector(db, q_vec, query, top_k, mode, meta_filter)
+
+
+async def list_messages(
     db: AsyncSession,
     session_id: str,
-    role: str,
-    content: str,
     *,
-    meta: dict | None = None,
-) -> Message:
-    msg = Message(session_id=session_id, role=role, content=content, meta=meta)
-    db.add(msg)
-    await db.flush()
-    return msg
+    limit: int,
+    cursor: str | None = None,
+    order: str = "desc",
+) -> MessagePage | None:
+    """세션 메시지 키셋 페이지 (desc: 최신부터). 세션이 없으면 None.
 
+    커서는 마지막 항목의 (created_at, id) 이므로 OFFSET 과 달리 깊은 페이지도
+    인덱스에서 바로 이어 읽고, 그 사이 새 메시지가 추가돼도 중복/누락이 없다.
+    """
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    key = tuple_(Message.created_at, Message.id)
+    stmt = select(*_PAGE_COLUMNS).where(Message.session_id == session_id)
+    if cursor:
+        after = tuple_(*_decode_cursor(cursor))
+        stmt = stmt.where(key < after if order == "desc" else key > after)
+    if order == "desc":
+        stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc())
+    else:
+        stmt = stmt.order_by(Message.created_at, Message.id)
+    # 한 건 더 읽어 다음 페이지 존재 여부 판단
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    if not rows and not cursor and await db.get(ChatSession, session_id) is None:
+        return None
+    items = [MessageOut.model_validate(row) for row in rows[:limit]]
+    next_cursor = _encode_cursor(items[-1]) if len(rows) > limit else None
+    return MessagePage(items=items, next_cursor=next_cursor)
 
-async def _build_context(db: AsyncSession, query: str, top_k: int) -> tuple[str, list[str]]:
-    if top_k <= 0:
-        return "", []
-
-    hits = await search_docs(db, query, top_k)
-    if not hits:
-        return "", []
-
-    formatted = []
-    sources: list[str] = []
-    for idx, hit in enumerate(hits, start=1):
-        sources.append(hit["id"])
-        snippet = hit["content"].strip()
-        formatted.append(f"[{idx}] {snippet}")
-
-    return "\n\n".join(formatted), sources
-
-
-def _to_llm_messages(history: Iterable[Message], latest_user_id: int, context: str) -> list[dict[str, str]]:
-    messages = []
-    for msg in history:
-        content = msg.content
-        if msg.id == latest_user_id and context:
-            content = (
-                f"{msg.content}\n\n"
-                "Relevant context:\n"
-                f"{context}\n\n"
-                "If the answer uses the context, cite using [number]."
-            )
-        messages.append({"role": msg.role, "content": content})
-    return messages
\ No newline at end of file
+
+def _encode_cursor(message: MessageOut) -> str:
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except ValueError as exc:
+        raise ValueError("invalid cursor") from exc
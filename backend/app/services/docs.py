@@ -1,26 +1,283 @@
 # app/services/docs.py
-from sqlalchemy import text, bindparam
+import hashlib
+import time
+from typing import AsyncIterable, Awaitable, Callable
+
+from sqlalchemy import bindparam, delete, func, literal_column, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.dialects.postgresql import JSONB
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.config import settings
-from app.embedding import embed_texts
-
-async def upsert_doc(db: AsyncSession, doc_id: str, content: str, meta: dict | None):
-    emb = embed_texts([content])[0]  # <- 리스트[float] 그대로
-
-    sql = text("""
-      INSERT INTO docs (id, content, metadata, embedding)
-      VALUES (:id, :content, :meta, :emb)
-      ON CONFLICT (id) DO UPDATE
-        SET content=EXCLUDED.content,
-            metadata=EXCLUDED.metadata,
-            embedding=EXCLUDED.embedding
-    """).bindparams(
-        bindparam("meta", type_=JSONB),                              
-        bindparam("emb",  type_=Vector(settings.embedding_dim)),
+from app.embedding import aembed_texts, embedding_model_id
+from app.models import Document
+from app.chunking import Chunk
+from app.schemas import BulkIngestResponse, BulkItemResult, DocumentCreate, SourceIngestResponse
+from app.services.answer_cache import invalidate_sources
+from app.telemetry import span
+
+# 배치마다 누적 건수(processed/batches/inserted/updated/skipped/failed)를 받는 콜백
+ProgressCallback = Callable[[dict], Awaitable[None]]
+
+async def upsert_doc(db: AsyncSession, doc_id: str, content: str, meta: dict | None) -> str:
+    """단건 적재. inserted | updated | skipped 중 하나를 돌려줌"""
+    [result] = await _upsert_batch(db, [(0, DocumentCreate(id=doc_id, content=content, meta=meta))])
+    if result.status == "failed":
+        raise RuntimeError(result.error)
+    return result.status
+
+
+async def upsert_docs_bulk(
+    db: AsyncSession,
+    items: AsyncIterable[tuple[int, DocumentCreate | str]],
+    *,
+    batch_size: int | None = None,
+    on_batch: ProgressCallback | None = None,
+) -> BulkIngestResponse:
+    """Ingest a stream of documents: batched encode, one multi-row upsert and commit per batch.
+
+    `items` yields `(index, DocumentCreate)` or `(index, error message)` for
+    entries that failed validation upstream, so every index gets a result.
+    `on_batch` receives running counts after every committed batch.
+    """
+    batch_size = max(1, batch_size or settings.ingest_batch_size)
+    started = time.perf_counter()
+    results: list[BulkItemResult] = []
+    counts = dict.fromkeys(("inserted", "updated", "skipped", "duplicate", "failed"), 0)
+    batches = 0
+    batch: list[tuple[int, DocumentCreate]] = []
+
+    def record(new: list[BulkItemResult]) -> None:
+        results.extend(new)
+        for r in new:
+            counts[r.status] += 1
+
+    async for index, item in items:
+        if isinstance(item, str):
+            record([BulkItemResult(index=index, status="failed", error=item)])
+            continue
+        batch.append((index, item))
+        if len(batch) >= batch_size:
+            record(await _upsert_batch(db, batch))
+            batches += 1
+            batch = []
+            if on_batch:
+                await on_batch({"processed": len(results), "batches": batches, **counts})
+    if batch:
+        record(await _upsert_batch(db, batch))
+        batches += 1
+    if on_batch:
+        await on_batch({"processed": len(results), "batches": batches, **counts})
+
+    results.sort(key=lambda r: r.index)
+    elapsed = time.perf_counter() - started
+    ok = counts["inserted"] + counts["updated"] + counts["skipped"]
+    return BulkIngestResponse(
+        total=len(results),
+        inserted=counts["inserted"],
+        updated=counts["updated"],
+        skipped=counts["skipped"],
+        failed=counts["failed"],
+        batches=batches,
+        elapsed_ms=elapsed * 1000,
+        docs_per_sec=(ok / elapsed) if elapsed > 0 else 0.0,
+        items=results,
     )
 
-    await db.execute(sql, {"id": doc_id, "content": content, "meta": meta, "emb": emb})
-    await db.commit()
+
+async def replace_source(
+    db: AsyncSession,
+    parent_id: str,
+    chunks: AsyncIterable[Chunk],
+    meta: dict | None = None,
+    *,
+    batch_size: int | None = None,
+    on_batch: ProgressCallback | None = None,
+) -> SourceIngestResponse:
+    """Replace all chunks of `parent_id` with `chunks` in one transaction.
+
+    Chunks are embedded and written batch by batch, so only one batch of
+    embeddings is in memory at a time. Unchanged chunks (same id and content
+    hash) are not re-encoded. Chunks left over from the previous version are
+    deleted before the single commit, so readers see either the old or the new
+    document, never a mix. An exception from `on_batch` (e.g. cancellation)
+    rolls the whole replacement back.
+    """
+    batch_size = max(1, batch_size or settings.ingest_batch_size)
+    started = time.perf_counter()
+    table = Document.__table__
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    batches = total = 0
+    batch: list[tuple[int, DocumentCreate]] = []
+
+    async def write() -> None:
+        nonlocal batches
+        for result in await _upsert_batch(db, batch, commit=False):
+            counts[result.status] += 1
+        batches += 1
+        batch.clear()
+        if on_batch:
+            await on_batch({"processed": total, "batches": batches, **counts})
+
+    try:
+        # 같은 원문을 동시에 올리면 직렬화 (트랜잭션 종료 시 자동 해제)
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(parent_id))))
+        async for chunk in chunks:
+            chunk_meta = {**(meta or {}), "parent_id": parent_id, "chunk": chunk.index}
+            if chunk.section:
+                chunk_meta["section"] = chunk.section
+            doc = DocumentCreate(
+                id=f"{parent_id}#{chunk.index}",
+                content=chunk.text,
+                meta=chunk_meta,
+                parent_id=parent_id,
+                chunk_index=chunk.index,
+            )
+            batch.append((chunk.index, doc))
+            total += 1
+            if len(batch) >= batch_size:
+                await write()
+        if batch:
+            await write()
+
+        stale = (await db.execute(
+            delete(table)
+            .where(table.c.parent_id == parent_id, table.c.chunk_index >= total)
+            .returning(table.c.id)
+        )).scalars().all()
+        await invalidate_sources(db, list(stale))
+        with span("db_commit"):
+            await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    return SourceIngestResponse(
+        parent_id=parent_id,
+        chunks=total,
+        deleted=len(stale),
+        batches=batches,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+        **counts,
+    )
+
+
+async def _upsert_batch(
+    db: AsyncSession,
+    batch: list[tuple[int, DocumentCreate]],
+    *,
+    commit: bool = True,
+) -> list[BulkItemResult]:
+    """commit=False 면 호출자의 트랜잭션 안에서 쓰기만 하고, 실패는 건별 결과 대신 예외로 올림"""
+    # 같은 배치 안에서 id 가 겹치면 ON CONFLICT 가 한 행을 두 번 건드려 실패하므로 마지막 것만 남김
+    last_index: dict[str, int] = {doc.id: index for index, doc in batch}
+    results = [
+        BulkItemResult(index=index, id=doc.id, status="duplicate", error="superseded by a later item with the same id")
+        for index, doc in batch
+        if last_index[doc.id] != index
+    ]
+    unique = [(index, doc) for index, doc in batch if last_index[doc.id] == index]
+
+    model = embedding_model_id()
+    hashes = {doc.id: content_hash(doc.content) for _, doc in unique}
+    table = Document.__table__
+
+    try:
+        existing = {
+            row.id: row
+            for row in await db.execute(
+                select(
+                    table.c.id,
+                    table.c.content_hash,
+                    table.c.embedding_model,
+                    table.c["metadata"].label("meta"),
+                    table.c.parent_id,
+                    table.c.chunk_index,
+                )
+                .where(table.c.id.in_(list(hashes)))
+            )
+        }
+
+        # 내용 해시와 모델이 같으면 인코딩/embedding 재기록을 건너뜀 (HNSW 인덱스 churn 방지)
+        to_embed: list[DocumentCreate] = []
+        meta_only: list[DocumentCreate] = []
+        statuses: dict[str, str] = {}
+        for _, doc in unique:
+            row = existing.get(doc.id)
+            if row is None:
+                to_embed.append(doc)
+                statuses[doc.id] = "inserted"
+            elif row.content_hash != hashes[doc.id] or row.embedding_model != model:
+                to_embed.append(doc)
+                statuses[doc.id] = "updated"
+            elif (row.meta, row.parent_id, row.chunk_index) != (doc.meta, doc.parent_id, doc.chunk_index):
+                meta_only.append(doc)
+                statuses[doc.id] = "updated"
+            else:
+                statuses[doc.id] = "skipped"
+
+        if to_embed:
+            embeddings = await aembed_texts([doc.content for doc in to_embed], background=True)
+            stmt = insert(table).values([
+                {
+                    "id": doc.id,
+                    "content": doc.content,
+                    "metadata": doc.meta,
+                    "embedding": emb,
+                    "content_hash": hashes[doc.id],
+                    "embedding_model": model,
+                    "parent_id": doc.parent_id,
+                    "chunk_index": doc.chunk_index,
+                }
+                for doc, emb in zip(to_embed, embeddings)
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={
+                    "content": stmt.excluded.content,
+                    "metadata": stmt.excluded["metadata"],
+                    "embedding": stmt.excluded.embedding,
+                    "content_hash": stmt.excluded.content_hash,
+                    "embedding_model": stmt.excluded.embedding_model,
+                    "parent_id": stmt.excluded.parent_id,
+                    "chunk_index": stmt.excluded.chunk_index,
+                },
+            ).returning(table.c.id, literal_column("(xmax = 0)").label("inserted"))
+            for row in (await db.execute(stmt)).fetchall():
+                # 조회 이후 다른 요청이 먼저 넣었을 수도 있으므로 RETURNING 결과를 우선
+                statuses[row[0]] = "inserted" if row[1] else "updated"
+
+        if meta_only:
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("doc_id"))
+                .values({
+                    "metadata": bindparam("meta", type_=table.c["metadata"].type),
+                    "parent_id": bindparam("parent"),
+                    "chunk_index": bindparam("chunk"),
+                }),
+                [
+                    {"doc_id": doc.id, "meta": doc.meta, "parent": doc.parent_id, "chunk": doc.chunk_index}
+                    for doc in meta_only
+                ],
+            )
+
+        # 바뀐 문서를 근거로 한 캐시 답변은 같은 트랜잭션에서 삭제
+        await invalidate_sources(db, [doc.id for doc in to_embed + meta_only])
+        if commit:
+            with span("db_commit"):
+                await db.commit()
+    except SQLAlchemyError as exc:
+        if not commit:
+            raise
+        await db.rollback()
+        error = str(exc.orig) if getattr(exc, "orig", None) is not None else str(exc)
+        results.extend(BulkItemResult(index=index, id=doc.id, status="failed", error=error) for index, doc in unique)
+        return results
+
+    results.extend(BulkItemResult(index=index, id=doc.id, status=statuses[doc.id]) for index, doc in unique)
+    return results
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
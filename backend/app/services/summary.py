@@ -0,0 +1,140 @@
+# app/services/summary.py
+"""Rolling conversation summaries stored in `ChatSession.meta["summary"]`.
+
+Once a session has more than SUMMARY_TRIGGER_MESSAGES messages that are not
+yet covered by the summary, everything except the last SUMMARY_KEEP_MESSAGES
+is folded into the summary by a background task scheduled after the reply.
+Prompts are then built from the summary plus the unsummarized tail, so the
+per-turn history cost stays bounded however long the session grows.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import Integer, func, select, update
+
+from app.config import settings
+from app.db import SessionLocal
+from app.llm.base import LLMProvider
+from app.models import ChatSession, Message
+from app.prompt import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the previous summary with the new messages into one concise summary in the conversation's language. "
+    "Keep facts, names, decisions, open questions and user preferences; drop greetings and repetition. "
+    "Reply with the summary only."
+)
+
+_FOLD_MAX_MESSAGES = 200  # 압축 1회에 읽는 최대 메시지 수 (토큰 예산 전에 DB 읽기량 제한)
+
+# 같은 세션에 대한 요약이 동시에 두 번 돌지 않도록 (워커 간 경합은 UPDATE 조건으로 처리)
+_running: set[str] = set()
+_tasks: set[asyncio.Task] = set()
+
+
+def session_summary(session: ChatSession | None) -> tuple[str | None, int]:
+    """(요약문, 요약에 포함된 마지막 Message.id). 요약이 없으면 (None, 0)"""
+    summary = (session.meta or {}).get("summary") if session is not None else None
+    if not summary:
+        return None, 0
+    return summary.get("text"), int(summary.get("upto_message_id") or 0)
+
+
+def schedule_compaction(session_id: str, pending_messages: int, llm: LLMProvider) -> None:
+    """응답 후 호출: 요약되지 않은 메시지 수가 임계값을 넘으면 백그라운드로 압축"""
+    if not settings.summary_enabled or pending_messages <= settings.summary_trigger_messages:
+        return
+    if session_id in _running:
+        return
+    _running.add(session_id)
+    task = asyncio.create_task(_compact(session_id, llm))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    task.add_done_callback(lambda _: _running.discard(session_id))
+
+
+async def compact_session(session_id: str, llm: LLMProvider) -> bool:
+    """오래된 메시지를 요약에 합침. 갱신했으면 True"""
+    async with SessionLocal() as db:
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            return False
+        previous, upto = session_summary(session)
+        unsummarized = (Message.session_id == session_id, Message.id > upto)
+        pending = await db.scalar(select(func.count()).select_from(Message).where(*unsummarized))
+        if pending <= settings.summary_trigger_messages:
+            return False
+        stmt = select(Message.id, Message.role, Message.content).where(*unsummarized)
+        if settings.summary_keep_messages > 0:
+            # 최근 SUMMARY_KEEP_MESSAGES 개는 원문으로 남김
+            kept = (
+                select(Message.id).where(*unsummarized)
+                .order_by(Message.id.desc()).limit(settings.summary_keep_messages).subquery()
+            )
+            stmt = stmt.where(Message.id < select(func.min(kept.c.id)).scalar_subquery())
+        rows = (await db.execute(stmt.order_by(Message.id).limit(_FOLD_MAX_MESSAGES))).all()
+    # LLM 호출 동안 커넥션을 잡고 있지 않도록 세션을 닫은 뒤 요약
+    fold = _fold_within_budget(rows)
+    if not fold:
+        return False
+
+    transcript = "\n".join(f"{role}: {content}" for _, role, content in fold)
+    prompt = f"Previous summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"
+    text = await llm.acomplete(
+        messages=[{"role": "user", "content": prompt}],
+        system=SUMMARY_PROMPT,
+        max_output_tokens=settings.summary_max_tokens,
+    )
+    text = (text or "").strip()
+    if not text:
+        return False
+
+    meta = dict(session.meta or {})
+    meta["summary"] = {
+        "text": text,
+        "upto_message_id": fold[-1][0],
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    current_upto = func.coalesce(ChatSession.meta[("summary", "upto_message_id")].astext.cast(Integer), 0)
+    async with SessionLocal() as db:
+        # 다른 워커가 먼저 갱신했다면(upto 가 바뀜) 덮어쓰지 않음
+        result = await db.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id, current_upto == upto)
+            # last_activity_at 의 onupdate 가 요약 갱신으로 바뀌지 않도록 기존 값 유지
+            .values(meta=meta, last_activity_at=ChatSession.last_activity_at)
+        )
+        await db.commit()
+    return bool(result.rowcount)
+
+
+def _fold_within_budget(rows) -> list[tuple[int, str, str]]:
+    """SUMMARY_INPUT_MAX_TOKENS 안에 들어가는 앞부분만 (upto 는 여기까지만 전진, 나머지는 다음 압축에서).
+
+    첫 메시지 하나가 예산을 넘으면 잘라서라도 넣어 압축이 매번 같은 곳에서 멈추지 않게 한다.
+    """
+    budget = settings.summary_input_max_tokens
+    fold: list[tuple[int, str, str]] = []
+    used = 0
+    for message_id, role, content in rows:
+        tokens = count_tokens(content) + 4  # "role: " 접두사와 줄바꿈
+        if used + tokens > budget:
+            if not fold:
+                fold.append((message_id, role, truncate_tokens(content, budget)[0]))
+            break
+        fold.append((message_id, role, content))
+        used += tokens
+    return fold
+
+
+async def _compact(session_id: str, llm: LLMProvider) -> None:
+    try:
+        await compact_session(session_id, llm)
+    except Exception:
+        # 요약 실패는 다음 턴에 다시 시도됨 (히스토리는 예산 안에서 그대로 잘려 전송)
+        logger.exception("conversation compaction failed for session %s", session_id)
@@ -0,0 +1,173 @@
+# app/telemetry.py
+"""Hot-path timing spans exported to Prometheus, Server-Timing and OpenTelemetry.
+
+`span(name)` (or the `traced(name)` decorator) times a block. Each span is:
+- observed in the `rag_span_seconds{span=...}` histogram served at GET /metrics,
+- added to the current request's `Server-Timing` header (TelemetryMiddleware),
+- exported as an OpenTelemetry span when OTEL_ENABLED=true and the SDK is installed.
+
+Span names are a small fixed set (see README) so label cardinality stays bounded.
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, TypeVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+SPAN_SECONDS = Histogram("rag_span_seconds", "Duration of instrumented hot-path spans", ["span"], buckets=_BUCKETS)
+SPAN_ERRORS = Counter("rag_span_errors_total", "Spans that ended with an exception", ["span"])
+HTTP_SECONDS = Histogram(
+    "rag_http_request_seconds",
+    "HTTP request duration until the last body byte",
+    ["method", "route", "status"],
+    buckets=_BUCKETS,
+)
+
+# 요청별 span 누적 (Server-Timing). gather 로 만든 하위 태스크도 같은 dict 를 공유
+_request_spans: ContextVar[dict[str, list[float]] | None] = ContextVar("request_spans", default=None)
+_tracer: Any = None  # opentelemetry Tracer (OTEL_ENABLED 일 때만)
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+def setup_tracing() -> None:
+    """OTEL_ENABLED 면 OTLP(HTTP) 내보내기 설정. 엔드포인트 등은 표준 OTEL_* 환경 변수 사용"""
+    global _tracer
+    if not settings.otel_enabled or _tracer is not None:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_ENABLED=true but opentelemetry-sdk / otlp exporter is not installed")
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.otel_service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("app")
+
+
+def shutdown_tracing() -> None:
+    if _tracer is not None:
+        from opentelemetry import trace
+
+        trace.get_tracer_provider().shutdown()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    started = time.perf_counter()
+    otel = _tracer.start_as_current_span(name, attributes=attributes or None) if _tracer else None
+    if otel is not None:
+        otel.__enter__()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        if otel is not None:
+            otel.__exit__(None, None, None)
+        record(name, time.perf_counter() - started, failed=failed, otel=False)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """async 함수 전체를 span(name) 으로 감쌈"""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def record(name: str, seconds: float, *, failed: bool = False, otel: bool = True) -> None:
+    """이미 측정한 구간을 기록 (스트리밍 TTFT 처럼 with 블록으로 감쌀 수 없는 경우)"""
+    SPAN_SECONDS.labels(name).observe(seconds)
+    if failed:
+        SPAN_ERRORS.labels(name).inc()
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.setdefault(name, []).append(seconds)
+    if otel and _tracer is not None:
+        # 제너레이터 안에서는 컨텍스트를 붙였다 떼기 어려우므로 시각만 지정한 span 으로 남김
+        end = time.time_ns()
+        _tracer.start_span(name, start_time=end - int(seconds * 1e9)).end(end_time=end)
+
+
+def server_timing(spans: dict[str, list[float]], total: float) -> str:
+    parts = [f"{name};dur={sum(values) * 1000:.1f}" for name, values in spans.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def metrics_response() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class TelemetryMiddleware:
+    """순수 ASGI 미들웨어: 요청 span 수집, Server-Timing 헤더, HTTP 지연 히스토그램.
+
+    Server-Timing 은 응답 헤더를 보내는 시점까지의 span 만 담는다. 스트리밍 응답
+    (/chat/stream)의 LLM 구간은 `done` 이벤트의 timings 와 /metrics 에서 확인.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        spans: dict[str, list[float]] = {}
+        token = _request_spans.set(spans)
+        status = 500
+        otel = None
+        if _tracer is not None:
+            otel = _tracer.start_as_current_span(f"{scope['method']} {scope['path']}", kind=_server_kind())
+            otel.__enter__()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing_enabled:
+                    value = server_timing(spans, time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", value.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
+            # 라우팅 후 FastAPI 가 scope["route"] 를 채움. 매칭 실패는 하나로 묶어 라벨 폭증 방지
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+            if otel is not None:
+                otel.__exit__(None, None, None)
+
+
+def _server_kind():
+    from opentelemetry.trace import SpanKind
+
+    return SpanKind.SERVER
@@ -0,0 +1,40 @@
+# app/timing.py
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class StageTimer:
+    """Per-request latency breakdown: wall-clock ms per named stage plus total.
+
+    Stages may overlap (e.g. retrieval running concurrently with history
+    loading), so the stage values do not need to add up to `total`.
+    """
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self._open: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        self._open[name] = started
+        try:
+            yield
+        finally:
+            self._open.pop(name, None)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def elapsed_ms(self, name: str) -> float:
+        """Time since the currently open stage `name` started (0 if not open)."""
+        started = self._open.get(name)
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        out = {name: round(ms, 2) for name, ms in self.stages.items()}
+        out["total"] = round((time.perf_counter() - self._started) * 1000, 2)
+        return out
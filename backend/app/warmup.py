@@ -0,0 +1,119 @@
+# app/warmup.py
+"""Model preload and warmup at startup, plus the readiness state behind /readyz.
+
+MODEL_PRELOAD=blocking loads and warms the models before the app accepts
+traffic. With background, the app starts serving right away and /readyz
+returns 503 until warmup is done, while /healthz stays a plain liveness
+probe. With off, models load on the first request as before.
+
+Warmup runs a few encodes of different lengths and batch sizes, so the first
+user does not pay for weight loading, allocator growth or first-call kernel
+selection. It also warms the cross-encoder when RERANK_ENABLED and the
+tiktoken encoding.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WARMUP_TEXTS = [
+    "query: 안녕하세요",
+    "query: 최근 프로젝트에서 사용한 기술 스택은 무엇인가요?",
+    "passage: " + "FastAPI, PostgreSQL, pgvector 로 만든 포트폴리오 챗봇의 검색 파이프라인 설명. " * 20,
+]
+
+_state: dict = {"mode": settings.model_preload, "ready": settings.model_preload == "off", "phase": "pending"}
+_task: asyncio.Task | None = None
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+def state() -> dict:
+    return dict(_state)
+
+
+async def start() -> None:
+    """lifespan 시작 시 호출. blocking 이면 끝날 때까지 기다리고, background 면 태스크만 띄움"""
+    global _task
+    mode = settings.model_preload
+    if mode == "off":
+        _state["phase"] = "lazy"
+        return
+    if mode not in ("blocking", "background"):
+        raise ValueError(f"unknown MODEL_PRELOAD: {mode}")
+    if mode == "blocking":
+        await warm()
+    else:
+        _task = asyncio.create_task(warm())
+
+
+async def stop() -> None:
+    if _task is not None and not _task.done():
+        # 스레드 안의 로드는 중단할 수 없으므로 태스크만 정리
+        _task.cancel()
+
+
+async def warm() -> None:
+    started = time.perf_counter()
+    try:
+        # 로드/encode 는 CPU 를 오래 잡으므로 스레드에서 (background 모드에서 이벤트 루프가 응답할 수 있게)
+        _state["phase"] = "loading"
+        _state.update(await asyncio.to_thread(_load_models))
+        _state["phase"] = "warming"
+        _state.update(await asyncio.to_thread(_warm_models))
+    except Exception as exc:
+        # 준비 실패는 readiness 에만 반영하고, 요청 경로는 기존처럼 지연 로드를 다시 시도
+        logger.exception("model warmup failed")
+        _state.update(phase="failed", error=str(exc))
+        return
+    _state.update(phase="ready", ready=True, total_ms=round((time.perf_counter() - started) * 1000, 1))
+    logger.info("models ready in %.0f ms", _state["total_ms"])
+
+
+def _load_models() -> dict:
+    from app.embedding import get_model
+
+    out = {"backend": settings.embedding_backend}
+    started = time.perf_counter()
+    get_model()
+    out["embedding_load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    if settings.rerank_enabled:
+        from app.reranker import get_reranker
+
+        started = time.perf_counter()
+        get_reranker()
+        out["rerank_load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return out
+
+
+def _warm_models() -> dict:
+    from app.embedding import embed_texts
+    from app.prompt import count_tokens
+
+    out = {}
+    started = time.perf_counter()
+    for text in _WARMUP_TEXTS:
+        embed_texts([text])
+    embed_texts(_WARMUP_TEXTS * max(1, settings.embedding_batch_max_size // len(_WARMUP_TEXTS)))
+    out["embedding_warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    # 첫 encode 이후의 단건 질의 지연: 워밍업이 충분했는지 확인용
+    started = time.perf_counter()
+    embed_texts([_WARMUP_TEXTS[1]])
+    out["embedding_warm_query_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    if settings.rerank_enabled:
+        from app.reranker import score_pairs
+
+        started = time.perf_counter()
+        score_pairs(_WARMUP_TEXTS[1], _WARMUP_TEXTS)
+        out["rerank_warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    count_tokens("warmup")  # tiktoken BPE 로드
+    return out
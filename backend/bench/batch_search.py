@@ -0,0 +1,105 @@
+# bench/batch_search.py
+"""Batch search (`search_batch`) vs N sequential `search_docs` calls.
+
+    python -m bench.batch_search --docs 100000 --batch 1,8,32,64
+    python -m bench.batch_search --reuse --embedder model     # 실제 임베딩 모델 포함
+
+For each batch size N, the script times N back-to-back `search_docs` calls
+(N encodes and N SQL round trips) against one `search_batch` call (one batched
+encode and one unnest + LATERAL query). It reports queries per second, the
+speedup, and how many top-k ids the two paths share (ideally all). The query
+embedding cache is cleared before every run. The stub embedder maps each query
+text to a vector near the corpus. With `--embedder model`, the same texts go
+through the real model, which shows the batched-encode win; result overlap is
+then still checked, but the vectors are no longer tied to the corpus.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+import app.embedding
+from app.db import SessionLocal
+from app.embedding import truncate_embeddings
+from app.embedding_cache import get_query_cache
+from app.retriever import search_batch, search_docs
+from bench.common import BENCH_PREFIX, drop_corpus, print_table, query_vectors, seed_corpus
+from bench.fakes import QUERY_VECTORS, install
+
+
+async def compare(queries: list[str], k: int, rounds: int) -> dict:
+    seq_ms, batch_ms = [], []
+    overlap = []
+    for _ in range(rounds):
+        get_query_cache().clear()
+        async with SessionLocal() as db:
+            started = time.perf_counter()
+            sequential = [await search_docs(db, q, k=k, mode="vector") for q in queries]
+            seq_ms.append((time.perf_counter() - started) * 1000)
+        get_query_cache().clear()
+        async with SessionLocal() as db:
+            started = time.perf_counter()
+            batched = await search_batch(db, queries, k)
+            batch_ms.append((time.perf_counter() - started) * 1000)
+        for a, b in zip(sequential, batched):
+            overlap.append(len({h["id"] for h in a} & {h["id"] for h in b}) / max(1, len(a)))
+    seq, batch = float(np.median(seq_ms)), float(np.median(batch_ms))
+    return {
+        "queries": len(queries),
+        "sequential_ms": seq,
+        "batch_ms": batch,
+        "sequential_qps": len(queries) / seq * 1000 if seq else 0.0,
+        "batch_qps": len(queries) / batch * 1000 if batch else 0.0,
+        "speedup": seq / batch if batch else 0.0,
+        "overlap": sum(overlap) / len(overlap) if overlap else 1.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    install(embedder=args.embedder)
+    if args.reuse:
+        async with SessionLocal() as db:
+            sample = (await db.execute(
+                text("SELECT embedding FROM docs WHERE id LIKE :p LIMIT 1000"), {"p": f"{BENCH_PREFIX}%"}
+            )).scalars().all()
+        if not sample:
+            raise SystemExit("no bench- rows to reuse; run bench.retrieval or this script with --keep first")
+        corpus = np.array([np.asarray(v.to_list() if hasattr(v, "to_list") else v, dtype=np.float32) for v in sample])
+        vectors = query_vectors(corpus, max(args.batch_sizes))
+    else:
+        corpus = await seed_corpus(args.docs)
+        vectors = truncate_embeddings(query_vectors(corpus, max(args.batch_sizes)))
+
+    texts = [f"batch bench query {i}" for i in range(len(vectors))]
+    QUERY_VECTORS.update(zip(texts, (v.tolist() for v in vectors)))
+    try:
+        rows = [await compare(texts[:n], args.k, args.rounds) for n in args.batch_sizes]
+    finally:
+        if not args.keep and not args.reuse:
+            await drop_corpus()
+        await app.embedding.get_batcher().stop()
+
+    print(f"docs={args.docs if not args.reuse else 'reused'} k={args.k} embedder={args.embedder} rounds={args.rounds}")
+    print_table(rows, list(rows[0]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--reuse", action="store_true", help="reuse bench- rows kept by an earlier --keep run")
+    parser.add_argument("--keep", action="store_true")
+    parser.add_argument("--batch", default="1,8,32,64", help="comma separated batch sizes")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=5, help="repeat and report the median")
+    parser.add_argument("--embedder", choices=["stub", "model"], default="stub")
+    args = parser.parse_args()
+    args.batch_sizes = [int(n) for n in args.batch.split(",")]
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
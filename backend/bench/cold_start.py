@@ -0,0 +1,90 @@
+# bench/cold_start.py
+"""Cold-start time and first-request latency per startup configuration.
+
+    python -m bench.cold_start
+    python -m bench.cold_start --variant MODEL_PRELOAD=off --variant MODEL_PRELOAD=blocking \\
+        --variant "MODEL_PRELOAD=blocking EMBEDDING_BACKEND=onnx EMBEDDING_BACKEND_FILE=onnx/model_qint8_avx512_vnni.onnx"
+
+For each variant, the script starts a fresh `uvicorn app.main:app` process
+with the given environment overrides. It records the time until /healthz
+answers (live) and until /readyz returns 200 (ready). It then times the first
+and the second `GET /documents/search` request. With MODEL_PRELOAD=off, the
+first request pays for model loading, and preloading moves that cost before
+`ready`. The model load and warmup breakdown is read from /readyz.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.common import print_table
+
+DEFAULT_VARIANTS = ["MODEL_PRELOAD=off", "MODEL_PRELOAD=blocking", "MODEL_PRELOAD=background"]
+
+
+def _wait(client: httpx.Client, path: str, started: float, timeout: float) -> float | None:
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return (time.perf_counter() - started) * 1000
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def _timed_search(client: httpx.Client, q: str) -> float:
+    started = time.perf_counter()
+    client.get("/documents/search", params={"q": q, "k": 5}).raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def measure(variant: str, args: argparse.Namespace) -> dict:
+    overrides = dict(item.split("=", 1) for item in shlex.split(variant))
+    env = {**os.environ, **overrides}
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=args.timeout) as client:
+            live = _wait(client, "/healthz", started, args.timeout)
+            ready = _wait(client, "/readyz", started, args.timeout)
+            if ready is None:
+                raise RuntimeError(f"{variant}: not ready within {args.timeout}s")
+            models = client.get("/readyz").json().get("models", {})
+            first = _timed_search(client, "첫 요청 지연 측정 질의")
+            second = _timed_search(client, "두 번째 요청 지연 측정 질의")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {
+        "variant": variant,
+        "live_ms": live or 0.0,
+        "ready_ms": ready,
+        "model_load_ms": models.get("embedding_load_ms", "-"),
+        "warmup_ms": models.get("embedding_warmup_ms", "-"),
+        "first_req_ms": first,
+        "second_req_ms": second,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variant", action="append", help="space separated ENV=value overrides (repeatable)")
+    parser.add_argument("--runs", type=int, default=1, help="runs per variant")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    rows = [measure(v, args) for v in (args.variant or DEFAULT_VARIANTS) for _ in range(args.runs)]
+    print_table(rows, list(rows[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# bench/common.py
+"""Shared helpers for the benchmark scripts.
+
+Scripts that touch Postgres use the same `.env` as the app. Point DB_NAME at a
+scratch database: synthetic rows are written to `docs` with the `bench-` id
+prefix and removed again unless `--keep` is given.
+"""
+from __future__ import annotations
+
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.db import SessionLocal
+from app.embedding import truncate_embeddings
+from app.models import Document
+
+BENCH_PREFIX = "bench-"
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(latencies_ms: list[float]) -> dict[str, float]:
+    return {
+        "n": len(latencies_ms),
+        "mean": statistics.fmean(latencies_ms) if latencies_ms else 0.0,
+        "p50": percentile(latencies_ms, 50),
+        "p95": percentile(latencies_ms, 95),
+        "p99": percentile(latencies_ms, 99),
+    }
+
+
+def recall(found: list[str], truth: list[str]) -> float:
+    if not truth:
+        return 1.0
+    return len(set(found) & set(truth)) / len(truth)
+
+
+@contextmanager
+def timed(out: list[float]) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        out.append((time.perf_counter() - started) * 1000)
+
+
+def print_table(rows: list[dict], columns: list[str]) -> None:
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(v) -> str:
+    return f"{v:.2f}" if isinstance(v, float) else str(v)
+
+
+def clustered_vectors(n: int, dim: int, *, clusters: int = 64, spread: float = 0.35, seed: int = 0) -> np.ndarray:
+    """정규화된 가우시안 혼합: 균일 랜덤보다 실제 임베딩 분포에 가까운 합성 벡터"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assign = rng.integers(0, clusters, n)
+    vecs = centers[assign] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs
+
+
+async def seed_corpus(
+    n: int,
+    *,
+    meta_fn: Callable[[int], dict] | None = None,
+    batch: int = 1000,
+    seed: int = 0,
+) -> np.ndarray:
+    """`bench-<i>` 문서 n 개를 적재하고 모델 차원 그대로의 float32 벡터를 돌려줌.
+
+    저장은 app 과 같이 EMBEDDING_TRUNCATE_DIM 에 맞춰 절단된 벡터로 한다.
+    """
+    full = clustered_vectors(n, settings.embedding_dim, seed=seed)
+    vecs = truncate_embeddings(full)
+    table = Document.__table__
+    async with SessionLocal() as db:
+        for start in range(0, n, batch):
+            rows = [
+                {
+                    "id": f"{BENCH_PREFIX}{i}",
+                    "content": f"synthetic benchmark document {i}",
+                    "metadata": meta_fn(i) if meta_fn else None,
+                    "embedding": vecs[i].tolist(),
+                }
+                for i in range(start, min(n, start + batch))
+            ]
+            stmt = insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={"embedding": stmt.excluded.embedding, "metadata": stmt.excluded["metadata"]},
+            )
+            await db.execute(stmt)
+            await db.commit()
+        await db.execute(text("ANALYZE docs"))
+        await db.commit()
+    return full
+
+
+async def drop_corpus() -> None:
+    async with SessionLocal() as db:
+        await db.execute(text("DELETE FROM docs WHERE id LIKE :p"), {"p": f"{BENCH_PREFIX}%"})
+        await db.commit()
+
+
+def query_vectors(corpus: np.ndarray, n: int, *, noise: float = 0.1, seed: int = 1) -> np.ndarray:
+    """코퍼스 벡터에 노이즈를 섞어 '가까운 이웃이 실제로 있는' 질의를 만듦"""
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.integers(0, len(corpus), n)]
+    q = picks + noise * rng.standard_normal(picks.shape).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return q
@@ -0,0 +1,62 @@
+# bench/fakes.py
+"""Local stand-ins for the OpenAI client and the embedding model.
+
+Benchmarks measure our own code: retrieval, prompt assembly, persistence and
+streaming. `install()` registers `app.llm.fake.FakeLLM` as the default LLM
+provider (still behind the provider's concurrency limiter), with configurable
+latency and streaming speed. It can also swap the SentenceTransformer for a
+deterministic hash embedder. The real model is optional (`--embedder model`).
+Nothing here is imported by `app/`.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.llm.fake import FakeLLM
+
+
+# 질의 문자열 → 지정 벡터. 검색 벤치에서 질의가 코퍼스 근처로 떨어지도록 stub 임베더가 먼저 확인
+QUERY_VECTORS: dict[str, list[float]] = {}
+
+
+def stub_embed_texts(texts: list[str], *, encode_ms: float = 0.0) -> list[list[float]]:
+    """텍스트 해시로 시드한 정규화 랜덤 벡터 (같은 텍스트 → 같은 벡터). encode_ms 는 배치당 CPU 지연 흉내"""
+    if encode_ms:
+        # 실제 encode 처럼 executor 스레드를 점유 (sleep 은 GIL 을 놓으므로 CPU 경합까지는 흉내내지 않음)
+        time.sleep(encode_ms / 1000)
+    dim = settings.embedding_store_dim
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        known = QUERY_VECTORS.get(text)
+        if known is not None:
+            out[row] = known
+            continue
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+        out[row] = np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out.tolist()
+
+
+def install(*, llm: FakeLLM | None = None, embedder: str = "stub", encode_ms: float = 0.0) -> None:
+    """앱 모듈 전역을 교체. 앱을 import 한 뒤, 첫 요청 전에 호출"""
+    import app.chunking
+    import app.embedding
+    import app.warmup
+    from app.llm import registry
+
+    if llm is not None:
+        registry.install(llm)
+    if embedder == "stub":
+        # 배처는 호출 시점에 모듈 전역 embed_texts 를 찾으므로 여기만 바꾸면 됨
+        app.embedding.embed_texts = lambda texts: stub_embed_texts(texts, encode_ms=encode_ms)
+        # 청킹도 모델 토크나이저 대신 단어 수 * 1.5 로 근사
+        app.chunking.default_token_counter = lambda: (lambda text: int(len(text.split()) * 1.5) + 1)
+        app.chunking.default_token_windows = lambda: None  # 긴 무공백 토큰은 문자 창으로
+        # 시작 시 워밍업(MODEL_PRELOAD)도 실제 모델을 로드하지 않도록
+        app.warmup._load_models = lambda: {"backend": "stub"}
+    elif embedder != "model":
+        raise ValueError(f"unknown embedder: {embedder}")
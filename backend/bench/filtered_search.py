@@ -0,0 +1,91 @@
+# bench/filtered_search.py
+"""Recall and latency of each metadata-filter strategy vs exact filtered search.
+
+    python -m bench.filtered_search --docs 50000 --queries 200 --k 5
+
+Synthetic docs get `lang` (ko 70% / en 30%), `project` (one of 200, selective)
+and `visibility` metadata. For every filter, each strategy in
+`app.retriever.FILTER_STRATEGIES` is forced and compared with the exact top-k.
+`partial` only applies to filters listed in HOT_FILTERS, so run once with
+HOT_FILTERS='[{"lang":"ko"}]' (and the matching index built) to include it.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from app.db import SessionLocal
+from app.embedding import truncate_embeddings
+from app.retriever import FILTER_STRATEGIES, hot_filter_index_name, search_by_vector
+from bench.common import drop_corpus, print_table, query_vectors, recall, seed_corpus, summarize, timed
+
+FILTERS = [
+    {"lang": "ko"},                          # 넓은 필터 (~70%)
+    {"lang": "en", "visibility": "public"},  # 중간 (~15%)
+    {"project": "p-7"},                      # 좁은 필터 (~0.5%)
+]
+
+
+def _meta(i: int) -> dict:
+    return {
+        "lang": "ko" if i % 10 < 7 else "en",
+        "project": f"p-{i % 200}",
+        "visibility": "public" if i % 2 == 0 else "private",
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    corpus = await seed_corpus(args.docs, meta_fn=_meta)
+    queries = truncate_embeddings(query_vectors(corpus, args.queries))
+    rows = []
+    try:
+        for meta_filter in FILTERS:
+            async with SessionLocal() as db:
+                truth = []
+                for q in queries:
+                    hits = await search_by_vector(db, q.tolist(), k=args.k, mode="vector",
+                                                  meta_filter=meta_filter, filter_strategy="exact")
+                    truth.append([h["id"] for h in hits])
+                await db.rollback()
+
+            for strategy in FILTER_STRATEGIES:
+                if strategy == "partial" and hot_filter_index_name(meta_filter) is None:
+                    continue
+                latencies: list[float] = []
+                recalls: list[float] = []
+                short = 0
+                for q, expected in zip(queries, truth):
+                    async with SessionLocal() as db:
+                        with timed(latencies):
+                            hits = await search_by_vector(db, q.tolist(), k=args.k, mode="vector",
+                                                          meta_filter=meta_filter, filter_strategy=strategy)
+                    ids = [h["id"] for h in hits]
+                    short += len(ids) < len(expected)
+                    recalls.append(recall(ids, expected))
+                stats = summarize(latencies)
+                rows.append({
+                    "filter": str(meta_filter),
+                    "strategy": strategy,
+                    "recall@k": sum(recalls) / len(recalls),
+                    "short_results": short,
+                    "p50_ms": stats["p50"],
+                    "p95_ms": stats["p95"],
+                })
+    finally:
+        if not args.keep:
+            await drop_corpus()
+
+    print_table(rows, ["filter", "strategy", "recall@k", "short_results", "p50_ms", "p95_ms"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic rows")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
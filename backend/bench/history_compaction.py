@@ -0,0 +1,140 @@
+# bench/history_compaction.py
+"""Prompt size and latency over session length, with and without summaries.
+
+    python -m bench.history_compaction --turns 40               # 오프라인: app.prompt 로 토큰 수 계산
+    python -m bench.history_compaction --url http://localhost:8000 --turns 40
+
+Offline mode replays a synthetic session through `app.prompt.assemble` twice.
+The first pass keeps the last _HISTORY_LIMIT messages, as before compaction.
+The second folds older messages into a SUMMARY_MAX_TOKENS summary once
+SUMMARY_TRIGGER_MESSAGES is passed. It reports input tokens and assembly time
+per turn. Live mode sends the turns to a running server's /chat and reports the
+`tokens.input`, `timings.llm` and `timings.total` it returns. To compare
+live, run once with SUMMARY_ENABLED=false and once with true.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+import httpx
+
+from app.config import settings
+from app.prompt import assemble
+from app.services.chat import SYSTEM_PROMPT, _HISTORY_LIMIT
+from bench.common import print_table
+
+_WORDS = (
+    "프로젝트 검색 인덱스 배포 성능 지연 캐시 모델 데이터 사용자 서버 쿼리 "
+    "vector latency deploy postgres embedding rerank stream session"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _session(turns: int, seed: int = 0) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(turns):
+        messages.append(("user", _sentence(rng, rng.randint(8, 40))))
+        messages.append(("assistant", _sentence(rng, rng.randint(60, 200))))
+    return messages
+
+
+def offline(args: argparse.Namespace) -> None:
+    rng = random.Random(1)
+    messages = _session(args.turns)
+    hits = [{"id": f"doc-{i}", "content": _sentence(rng, 120)} for i in range(settings.top_k)]
+    summary_text = _sentence(rng, settings.summary_max_tokens // 2)  # 단어당 ~2 토큰 가정
+
+    rows = []
+    upto = 0  # 요약에 들어간 메시지 수
+    for turn in range(args.turns):
+        before = messages[: 2 * turn]
+        question = messages[2 * turn][1]
+
+        started = time.perf_counter()
+        full = assemble(SYSTEM_PROMPT, before[-_HISTORY_LIMIT:], question, hits, budget=args.budget)
+        full_ms = (time.perf_counter() - started) * 1000
+
+        # 응답 후 백그라운드 압축을 흉내냄: 직전 턴까지 반영된 상태로 이번 턴을 조립
+        if len(before) - upto > settings.summary_trigger_messages:
+            upto = len(before) - settings.summary_keep_messages
+        tail = before[upto:][-_HISTORY_LIMIT:]
+        started = time.perf_counter()
+        compact = assemble(
+            SYSTEM_PROMPT, tail, question, hits, budget=args.budget, summary=summary_text if upto else None
+        )
+        compact_ms = (time.perf_counter() - started) * 1000
+
+        if turn % args.every == 0 or turn == args.turns - 1:
+            rows.append({
+                "turn": turn + 1,
+                "full_input": full.usage["input"],
+                "full_history_msgs": full.usage["history_messages"],
+                "compact_input": compact.usage["input"],
+                "summary_tokens": compact.usage["summary"],
+                "compact_history_msgs": compact.usage["history_messages"],
+                "full_ms": full_ms,
+                "compact_ms": compact_ms,
+            })
+
+    print(
+        f"budget={args.budget} trigger={settings.summary_trigger_messages} "
+        f"keep={settings.summary_keep_messages} summary~{settings.summary_max_tokens} tokens"
+    )
+    print_table(rows, list(rows[0]))
+
+
+def live(args: argparse.Namespace) -> None:
+    messages = [content for role, content in _session(args.turns) if role == "user"]
+    rows = []
+    session_id = None
+    with httpx.Client(base_url=args.url, timeout=120) as client:
+        for turn, message in enumerate(messages):
+            body = {"message": message, "session_id": session_id}
+            started = time.perf_counter()
+            resp = client.post("/chat", json=body)
+            wall_ms = (time.perf_counter() - started) * 1000
+            resp.raise_for_status()
+            data = resp.json()
+            session_id = data["session_id"]
+            tokens = data.get("tokens") or {}
+            timings = data.get("timings") or {}
+            if turn % args.every == 0 or turn == len(messages) - 1:
+                rows.append({
+                    "turn": turn + 1,
+                    "input_tokens": tokens.get("input", 0),
+                    "summary_tokens": tokens.get("summary", 0),
+                    "history_msgs": tokens.get("history_messages", 0),
+                    "llm_ms": timings.get("llm", 0.0),
+                    "total_ms": timings.get("total", 0.0),
+                    "wall_ms": wall_ms,
+                })
+            if args.pause:
+                # 백그라운드 요약이 끝날 시간을 줌
+                time.sleep(args.pause)
+
+    print(f"session={session_id}")
+    print_table(rows, list(rows[0]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--every", type=int, default=5, help="print every N-th turn")
+    parser.add_argument("--budget", type=int, default=settings.prompt_input_budget)
+    parser.add_argument("--url", help="measure a running server instead of the offline simulation")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to wait between live turns")
+    args = parser.parse_args()
+    if args.url:
+        live(args)
+    else:
+        offline(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# bench/history_pagination.py
+"""Session history reads on long threads: composite index and keyset pages.
+
+    python -m bench.history_pagination --sizes 1000,10000,100000
+    python -m bench.history_pagination --sizes 10000 --keep        # 다음 실행에서 재적재 생략
+
+Each size seeds one `bench-history-<n>` session with n messages, two per turn
+sharing a timestamp as in `_persist_turn`. Every session is measured twice on
+the same data. The `session_id` variant drops `messages_session_created_id`
+and recreates the old single-column index inside a transaction that is rolled
+back afterwards. The `composite` variant uses the current schema. Timed reads:
+
+- `history`: `_load_history` (latest _HISTORY_LIMIT messages for the prompt);
+- `keyset_*`: `list_messages` pages at the start, middle and end of the thread,
+  reached through the cursor;
+- `offset_*`: the same pages fetched with LIMIT/OFFSET, for comparison.
+
+`sort` reports whether the history query plan still contains a Sort node.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.db import SessionLocal, engine
+from app.models import ChatSession, Message
+from app.schemas import MessageOut
+from app.services.chat import _HISTORY_LIMIT, _PAGE_COLUMNS, _encode_cursor, _load_history, list_messages
+from bench.common import BENCH_PREFIX, print_table, summarize
+
+_WORDS = "검색 인덱스 세션 메시지 페이지 커서 latency postgres history keyset".split()
+
+
+def _session_id(n: int) -> str:
+    return f"{BENCH_PREFIX}history-{n}"
+
+
+async def seed_session(n: int, batch: int = 5000) -> None:
+    sid = _session_id(n)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    async with SessionLocal() as db:
+        if await db.scalar(select(Message.id).where(Message.session_id == sid).offset(n - 1).limit(1)):
+            print(f"{sid}: reusing {n} messages")
+            return
+        await db.execute(text("DELETE FROM chat_sessions WHERE id = :id"), {"id": sid})
+        db.add(ChatSession(id=sid, title="history pagination bench"))
+        await db.flush()
+        table = Message.__table__
+        for lo in range(0, n, batch):
+            rows = [
+                {
+                    "session_id": sid,
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "content": " ".join(_WORDS[(i + j) % len(_WORDS)] for j in range(40)),
+                    "metadata": {"timings": {"total": 1000.0}, "sources": ["doc-1", "doc-2"]} if i % 2 else None,
+                    # 한 턴(사용자+어시스턴트)은 같은 트랜잭션 시각
+                    "created_at": start + timedelta(seconds=i // 2),
+                }
+                for i in range(lo, min(n, lo + batch))
+            ]
+            await db.execute(insert(table).values(rows))
+        await db.commit()
+        await db.execute(text("ANALYZE messages"))
+        await db.commit()
+    print(f"{sid}: seeded {n} messages")
+
+
+async def drop_sessions() -> None:
+    async with SessionLocal() as db:
+        await db.execute(text("DELETE FROM chat_sessions WHERE id LIKE :p"), {"p": f"{BENCH_PREFIX}history-%"})
+        await db.commit()
+
+
+async def _timed(fn, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)["p50"]
+
+
+async def _history_has_sort(conn: AsyncConnection, sid: str) -> bool:
+    # _load_history 와 같은 모양의 쿼리
+    stmt = (
+        select(Message.id, Message.role, Message.content)
+        .where(Message.session_id == sid, Message.id > 0)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(_HISTORY_LIMIT)
+    )
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = "\n".join(r[0] for r in await conn.exec_driver_sql(f"EXPLAIN {sql}"))
+    return "Sort" in plan
+
+
+async def measure(conn: AsyncConnection, n: int, args: argparse.Namespace, variant: str) -> dict:
+    sid = _session_id(n)
+    db = AsyncSession(bind=conn)
+    page = args.page_size
+    # 페이지 위치: 처음, 가운데, 끝
+    depths = {"first": 0, "middle": max(0, n // 2 // page * page), "last": max(0, (n - 1) // page * page)}
+
+    row = {"messages": n, "variant": variant}
+    row["history_ms"] = await _timed(lambda: _load_history(db, sid, _HISTORY_LIMIT), args.rounds)
+    for name, offset in depths.items():
+        cursor = None
+        if offset:
+            # offset 번째 직전 항목을 커서로 (클라이언트가 앞 페이지들을 넘겨 온 상태)
+            prev = (await db.execute(
+                select(*_PAGE_COLUMNS).where(Message.session_id == sid)
+                .order_by(Message.created_at.desc(), Message.id.desc()).offset(offset - 1).limit(1)
+            )).one()
+            cursor = _encode_cursor(MessageOut.model_validate(prev))
+        row[f"keyset_{name}_ms"] = await _timed(
+            lambda c=cursor: list_messages(db, sid, limit=page, cursor=c), args.rounds
+        )
+        stmt = (
+            select(*_PAGE_COLUMNS).where(Message.session_id == sid)
+            .order_by(Message.created_at.desc(), Message.id.desc()).offset(offset).limit(page + 1)
+        )
+        row[f"offset_{name}_ms"] = await _timed(lambda s=stmt: db.execute(s), args.rounds)
+    row["sort"] = await _history_has_sort(conn, sid)
+    await db.close()
+    return row
+
+
+async def run(args: argparse.Namespace) -> None:
+    sizes = [int(s) for s in args.sizes.split(",")]
+    rows = []
+    try:
+        for n in sizes:
+            await seed_session(n)
+            async with engine.connect() as conn:
+                # 이전 스키마 재현: 복합 인덱스 제거 + session_id 단일 인덱스 (롤백으로 되돌림)
+                trans = await conn.begin()
+                await conn.exec_driver_sql("DROP INDEX IF EXISTS messages_session_created_id")
+                await conn.exec_driver_sql(
+                    "CREATE INDEX IF NOT EXISTS ix_messages_session_id ON messages (session_id)"
+                )
+                rows.append(await measure(conn, n, args, "session_id"))
+                await trans.rollback()
+
+                trans = await conn.begin()
+                await conn.exec_driver_sql(
+                    "CREATE INDEX IF NOT EXISTS messages_session_created_id ON messages (session_id, created_at, id)"
+                )
+                rows.append(await measure(conn, n, args, "composite"))
+                await trans.rollback()
+    finally:
+        if not args.keep:
+            await drop_sessions()
+        await engine.dispose()
+
+    print(f"page_size={args.page_size} rounds={args.rounds} (p50 ms)")
+    print_table(rows, list(rows[0]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="messages per session, comma separated")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded sessions for the next run")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# bench/index_recall.py
+"""recall@k vs latency of the vector index against exact search.
+
+    python -m bench.index_recall --docs 100000 --queries 200 --k 5
+    python -m bench.index_recall --corpus   # 합성 데이터 대신 현재 docs 로 측정
+
+Sweeps hnsw.ef_search (or ivfflat.probes when VECTOR_INDEX_TYPE=ivfflat).
+Exact results come from the same query with index scans disabled. Build the
+index first with `python -m app.indexes build`.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from app.config import settings
+from app.db import SessionLocal
+from app.embedding import truncate_embeddings
+from app.models import embedding_column_type
+from app.retriever import search_by_vector
+from bench.common import drop_corpus, print_table, query_vectors, recall, seed_corpus, summarize, timed
+
+_EXACT_SQL = text("""
+    SELECT id FROM docs ORDER BY embedding <=> :q LIMIT :k
+""").bindparams(bindparam("q", type_=embedding_column_type()))
+
+EF_SEARCH = [10, 20, 40, 80, 160, 320]
+PROBES = [1, 5, 10, 20, 50, 100]
+
+
+async def exact_top_k(q: list[float], k: int) -> tuple[list[str], float]:
+    latencies: list[float] = []
+    async with SessionLocal() as db:
+        await db.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+        with timed(latencies):
+            ids = list((await db.execute(_EXACT_SQL, {"q": q, "k": k})).scalars())
+    return ids, latencies[0]
+
+
+async def corpus_queries(n: int) -> np.ndarray:
+    # 실제 문서 임베딩을 질의로 쓰되 자기 자신은 노이즈로 살짝 비켜 감
+    async with SessionLocal() as db:
+        rows = (await db.execute(text("SELECT embedding FROM docs ORDER BY random() LIMIT :n"), {"n": n})).scalars()
+        vecs = np.array([np.asarray(v, dtype=np.float32) for v in rows])
+    return query_vectors(vecs, n, noise=0.05)
+
+
+async def run(args: argparse.Namespace) -> None:
+    if args.corpus:
+        queries = await corpus_queries(args.queries)
+    else:
+        corpus = await seed_corpus(args.docs)
+        queries = truncate_embeddings(query_vectors(corpus, args.queries))
+
+    try:
+        truth, exact_ms = [], []
+        for q in queries:
+            ids, ms = await exact_top_k(q.tolist(), args.k)
+            truth.append(ids)
+            exact_ms.append(ms)
+        rows = [{"setting": "exact", **_row(summarize(exact_ms), 1.0)}]
+
+        ivf = settings.vector_index_type == "ivfflat"
+        for value in (PROBES if ivf else EF_SEARCH):
+            latencies: list[float] = []
+            recalls: list[float] = []
+            for q, expected in zip(queries, truth):
+                async with SessionLocal() as db:
+                    with timed(latencies):
+                        hits = await search_by_vector(
+                            db, q.tolist(), k=args.k, mode="vector",
+                            ef_search=None if ivf else value, probes=value if ivf else None,
+                        )
+                recalls.append(recall([h["id"] for h in hits], expected))
+            label = f"probes={value}" if ivf else f"ef_search={value}"
+            rows.append({"setting": label, **_row(summarize(latencies), sum(recalls) / len(recalls))})
+    finally:
+        if not args.corpus and not args.keep:
+            await drop_corpus()
+
+    print(f"index={settings.vector_index_type} m={settings.hnsw_m} ef_construction={settings.hnsw_ef_construction} "
+          f"lists={settings.ivfflat_lists} k={args.k} queries={len(queries)}")
+    print_table(rows, ["setting", "recall@k", "p50_ms", "p95_ms", "p99_ms"])
+
+
+def _row(stats: dict, rec: float) -> dict:
+    return {"recall@k": rec, "p50_ms": stats["p50"], "p95_ms": stats["p95"], "p99_ms": stats["p99"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--corpus", action="store_true", help="use the existing docs instead of synthetic rows")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic rows")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# bench/load.py
+"""HTTP load test for /chat, /chat/stream, /documents/search and /documents.
+
+    python -m bench.serve &                      # 가짜 LLM + stub 임베더로 서버 실행
+    python -m bench.load --scenario chat,stream,search,ingest --concurrency 1,8,32 --requests 400
+
+Each (scenario, concurrency) pair runs a warmup. Then `--concurrency`
+workers send requests back to back until `--requests` have completed or
+`--duration` seconds have passed. The report gives throughput, p50/p95/p99
+latency, time to first `delta` event for the stream scenario, and the mean
+server-side span breakdown parsed from the `Server-Timing` header. Requests
+rejected with 429 (LLM backpressure, see LLM_MAX_CONCURRENCY/LLM_MAX_QUEUE)
+are counted in their own column rather than as errors. Queries
+are unique by default, which defeats the embedding and answer caches. Use
+`--distinct-queries N` to replay a small pool instead.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import httpx
+
+from bench.common import print_table, summarize
+
+SCENARIOS = ("chat", "stream", "search", "ingest")
+
+_WORDS = (
+    "포트폴리오 프로젝트 경험 기술 스택 배포 성능 개선 검색 데이터 서버 팀 "
+    "fastapi postgres vector react latency cache deploy python kubernetes"
+).split()
+
+
+@dataclass
+class Run:
+    latencies: list[float] = field(default_factory=list)
+    ttft: list[float] = field(default_factory=list)
+    errors: int = 0
+    rejected: int = 0  # 429 (LLM 동시 실행 한도/대기열 초과)
+    server: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _parse_server_timing(header: str | None, out: dict[str, list[float]]) -> None:
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.startswith("dur="):
+            out[name].append(float(params[4:]))
+
+
+class Driver:
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:8]
+
+    def query(self, n: int) -> str:
+        if self.args.distinct_queries:
+            n %= self.args.distinct_queries
+        return _text(random.Random(n), 6) + f" {n}"
+
+    async def chat(self, n: int, run: Run, session: dict) -> None:
+        body = {"message": self.query(n), "session_id": session.get("id")}
+        started = time.perf_counter()
+        resp = await self.client.post("/chat", json=body)
+        run.latencies.append((time.perf_counter() - started) * 1000)
+        resp.raise_for_status()
+        session["id"] = resp.json()["session_id"]
+        _parse_server_timing(resp.headers.get("server-timing"), run.server)
+
+    async def stream(self, n: int, run: Run, session: dict) -> None:
+        body = {"message": self.query(n), "session_id": session.get("id")}
+        started = time.perf_counter()
+        first = None
+        failed = False
+        async with self.client.stream("POST", "/chat/stream", json=body) as resp:
+            resp.raise_for_status()
+            _parse_server_timing(resp.headers.get("server-timing"), run.server)
+            async for line in resp.aiter_lines():
+                if line == "event: delta" and first is None:
+                    first = (time.perf_counter() - started) * 1000
+                elif line == "event: error":
+                    failed = True
+                elif line.startswith("data:") and session.get("id") is None and '"session_id"' in line:
+                    session["id"] = json.loads(line[5:])["session_id"]
+        run.latencies.append((time.perf_counter() - started) * 1000)
+        if first is not None:
+            run.ttft.append(first)
+        if failed:
+            raise RuntimeError("stream error event")
+
+    async def search(self, n: int, run: Run, session: dict) -> None:
+        started = time.perf_counter()
+        resp = await self.client.get("/documents/search", params={"q": self.query(n), "k": self.args.k})
+        run.latencies.append((time.perf_counter() - started) * 1000)
+        resp.raise_for_status()
+        _parse_server_timing(resp.headers.get("server-timing"), run.server)
+
+    async def ingest(self, n: int, run: Run, session: dict) -> None:
+        # bench- 접두사: bench.common.drop_corpus 로 정리됨
+        body = {"id": f"bench-load-{self.run_id}-{n}", "content": _text(random.Random(-n), self.args.doc_words)}
+        started = time.perf_counter()
+        resp = await self.client.post("/documents", json=body)
+        run.latencies.append((time.perf_counter() - started) * 1000)
+        resp.raise_for_status()
+        _parse_server_timing(resp.headers.get("server-timing"), run.server)
+
+
+async def measure(driver: Driver, scenario: str, concurrency: int, args: argparse.Namespace) -> dict:
+    call = getattr(driver, scenario)
+    offset = random.randrange(10**6)
+
+    async def worker(run: Run, counter, limit: int, deadline: float) -> None:
+        session: dict = {}
+        turns = 0
+        while time.perf_counter() < deadline:
+            n = next(counter)
+            if n >= limit:
+                return
+            if turns >= args.turns:
+                session, turns = {}, 0
+            try:
+                await call(offset + n, run, session)
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code == 429:
+                    run.rejected += 1
+                else:
+                    run.errors += 1
+            except Exception:
+                run.errors += 1
+            turns += 1
+
+    warm, counter = Run(), itertools.count()
+    await asyncio.gather(*(worker(warm, counter, args.warmup, float("inf")) for _ in range(concurrency)))
+
+    run, counter = Run(), itertools.count(args.warmup)
+    started = time.perf_counter()
+    deadline = started + args.duration if args.duration else float("inf")
+    limit = args.warmup + args.requests
+    await asyncio.gather(*(worker(run, counter, limit, deadline) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(run.latencies)
+    ttft = summarize(run.ttft)
+    row = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "n": stats["n"],
+        "errors": run.errors,
+        "429": run.rejected,
+        "rps": stats["n"] / elapsed if elapsed else 0.0,
+        "p50_ms": stats["p50"],
+        "p95_ms": stats["p95"],
+        "p99_ms": stats["p99"],
+        "ttft_p50": ttft["p50"] if run.ttft else "-",
+        "ttft_p95": ttft["p95"] if run.ttft else "-",
+    }
+    server = {name: sum(v) / len(v) for name, v in run.server.items()}
+    return {"row": row, "server": server}
+
+
+async def run(args: argparse.Namespace) -> None:
+    scenarios = [s.strip() for s in args.scenario.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        driver = Driver(client, args)
+        results = [await measure(driver, s, c, args) for s in scenarios for c in levels]
+
+    print(f"url={args.url} requests={args.requests} duration={args.duration or '-'} turns={args.turns}")
+    print_table([r["row"] for r in results], list(results[0]["row"]))
+
+    spans = sorted({name for r in results for name in r["server"]} - {"total"})
+    if spans:
+        print("\nServer-Timing mean ms (spans finished before response headers)")
+        rows = [
+            {"scenario": r["row"]["scenario"], "concurrency": r["row"]["concurrency"],
+             **{name: r["server"].get(name, "-") for name in [*spans, "total"]}}
+            for r in results
+        ]
+        print_table(rows, list(rows[0]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8100")
+    parser.add_argument("--scenario", default="chat", help=f"comma separated: {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated levels")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per level")
+    parser.add_argument("--duration", type=float, default=0.0, help="stop a level after N seconds (0 = no limit)")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=1, help="chat turns per session before starting a new one")
+    parser.add_argument("--distinct-queries", type=int, default=0, help="replay a pool of N queries (cache hits)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--doc-words", type=int, default=150)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# bench/quantization.py
+"""Memory footprint vs recall for embedding storage options.
+
+    python -m bench.quantization --offline          # numpy 시뮬레이션, DB 불필요
+    python -m bench.quantization --docs 50000       # 현재 DB 설정을 실제로 측정
+
+Offline mode simulates float32 / halfvec / Matryoshka truncation / binary
+quantization with float re-rank on a synthetic corpus, and reports recall@k
+against full-precision exact search plus bytes per row. The synthetic vectors
+are not Matryoshka-trained, so truncation numbers are a lower bound; measure
+truncation against a real corpus with DB mode. DB mode seeds the
+current configuration (EMBEDDING_STORAGE, EMBEDDING_QUANTIZATION,
+EMBEDDING_TRUNCATE_DIM; run `python -m app.indexes migrate-storage` after
+changing them). It reports table/index sizes, recall and latency.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+import numpy as np
+
+from app.config import settings
+from app.db import SessionLocal
+from app.embedding import truncate_embeddings
+from app.indexes import storage_report
+from app.retriever import search_by_vector
+from bench.common import (
+    clustered_vectors, drop_corpus, print_table, query_vectors, recall, seed_corpus, summarize, timed,
+)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= scores.shape[1]:
+        return np.argsort(-scores, axis=1)[:, :k]
+    idx = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, idx, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def _index_bytes(vector_bytes: int) -> int:
+    # pgvector HNSW 원소 ≈ 벡터 + 0층 이웃 2m 개 * 6B (+ 헤더), m=HNSW_M
+    return vector_bytes + settings.hnsw_m * 2 * 6 + 24
+
+
+def offline(args: argparse.Namespace) -> None:
+    dim = settings.embedding_dim
+    corpus = clustered_vectors(args.docs, dim)
+    queries = query_vectors(corpus, args.queries)
+    truth = _top_k(queries @ corpus.T, args.k)
+
+    rows = []
+    dims = [dim] + [d for d in (768, 512, 256, 128) if d < dim]
+    for d in dims:
+        c = truncate_embeddings(corpus, d)
+        q = truncate_embeddings(queries, d)
+        label = "" if d == dim else f" @{d}"
+
+        found = _top_k(q @ c.T, args.k)
+        rows.append({"storage": f"vector{label}", "vector_B": 4 * d + 8, "index_B": _index_bytes(4 * d + 8),
+                     "recall@k": _recall(found, truth)})
+
+        c16 = c.astype(np.float16).astype(np.float32)
+        found = _top_k(q.astype(np.float16).astype(np.float32) @ c16.T, args.k)
+        rows.append({"storage": f"halfvec{label}", "vector_B": 2 * d + 8, "index_B": _index_bytes(2 * d + 8),
+                     "recall@k": _recall(found, truth)})
+
+        # binary: 부호 비트의 해밍 거리 = (d - <sign(q), sign(c)>) / 2 이므로 내적 순위와 같음
+        cb = np.where(c > 0, 1.0, -1.0).astype(np.float32)
+        qb = np.where(q > 0, 1.0, -1.0).astype(np.float32)
+        hamming_rank = qb @ cb.T
+        for factor in (1, 4, 10):
+            cand = _top_k(hamming_rank, args.k * factor)
+            rerank = np.take_along_axis(q @ c.T, cand, axis=1)
+            found = np.take_along_axis(cand, _top_k(rerank, args.k), axis=1)
+            rows.append({
+                "storage": f"binary{label} x{factor} rerank",
+                "vector_B": 4 * d + 8,  # 재정렬용 float 컬럼은 그대로 저장
+                "index_B": _index_bytes(d // 8 + 8),
+                "recall@k": _recall(found, truth),
+            })
+
+    print(f"offline: docs={args.docs} queries={args.queries} dim={dim} k={args.k} (index_B is an estimate)")
+    print_table(rows, ["storage", "vector_B", "index_B", "recall@k"])
+
+
+async def live(args: argparse.Namespace) -> None:
+    corpus = await seed_corpus(args.docs)
+    queries = query_vectors(corpus, args.queries)
+    truth = _top_k(queries @ corpus.T, args.k)
+    stored_queries = truncate_embeddings(queries)
+    try:
+        report = await storage_report()
+        latencies: list[float] = []
+        recalls: list[float] = []
+        for q, expected in zip(stored_queries, truth):
+            async with SessionLocal() as db:
+                with timed(latencies):
+                    hits = await search_by_vector(db, q.tolist(), k=args.k, mode="vector")
+            recalls.append(recall([h["id"] for h in hits], [f"bench-{i}" for i in expected]))
+    finally:
+        if not args.keep:
+            await drop_corpus()
+
+    stats = summarize(latencies)
+    print(
+        f"storage={settings.embedding_storage} quantization={settings.embedding_quantization} "
+        f"store_dim={settings.embedding_store_dim} index={settings.vector_index_type}"
+    )
+    print_table([{
+        "column": report["column_type"],
+        "B/row": report["avg_embedding_bytes"],
+        "table_MB": report["table_bytes"] / 1024 / 1024,
+        "index_MB": report["index_bytes"] / 1024 / 1024,
+        "recall@k": sum(recalls) / len(recalls),
+        "p50_ms": stats["p50"],
+        "p95_ms": stats["p95"],
+    }], ["column", "B/row", "table_MB", "index_MB", "recall@k", "p50_ms", "p95_ms"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offline", action="store_true", help="simulate all options in numpy")
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic rows")
+    args = parser.parse_args()
+    if args.offline:
+        offline(args)
+    else:
+        asyncio.run(live(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# bench/retrieval.py
+"""Retrieval and ingestion regression check on a synthetic corpus (10k – 1M rows).
+
+    python -m bench.retrieval --docs 10000 --build-index
+    python -m bench.retrieval --docs 1000000 --keep --build-index    # 큰 코퍼스는 남겨 두고 재사용
+    python -m bench.retrieval --docs 1000000 --reuse --concurrency 1,16
+
+Search: `search_docs` (query embedding + SQL) is called with the stub embedder.
+Each query text maps to a vector near the corpus, so the HNSW walk looks like
+real traffic. Calls run at each concurrency level for both vector and hybrid
+modes, and the script reports qps and p50/p95/p99.
+Ingestion: `upsert_docs_bulk` writes `--ingest` new documents through the
+stub embedder. It then replays the same batch, where every row should take
+the unchanged-hash skip path. Compare runs of the same size across commits.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+import app.embedding
+from app.config import settings
+from app.db import SessionLocal
+from app.embedding import truncate_embeddings
+from app.embedding_cache import get_query_cache
+from app.indexes import build_indexes
+from app.retriever import search_docs
+from app.schemas import DocumentCreate
+from app.services.docs import upsert_docs_bulk
+from bench.common import BENCH_PREFIX, drop_corpus, print_table, query_vectors, seed_corpus, summarize
+from bench.fakes import QUERY_VECTORS, install
+
+
+async def search_level(queries: np.ndarray, mode: str, concurrency: int, k: int) -> dict:
+    # 수준마다 새 질의 문자열 → 질의 임베딩 캐시 hit 없이 매번 임베딩 경로를 탐
+    label = f"{mode}-{concurrency}-{time.perf_counter_ns()}"
+    texts = [f"bench query {label} {i}" for i in range(len(queries))]
+    QUERY_VECTORS.update(zip(texts, (q.tolist() for q in queries)))
+    pending = iter(texts)
+    latencies: list[float] = []
+
+    async def worker() -> None:
+        async with SessionLocal() as db:
+            for query in pending:
+                started = time.perf_counter()
+                await search_docs(db, query, k=k, mode=mode)
+                latencies.append((time.perf_counter() - started) * 1000)
+                await db.rollback()  # SET LOCAL 범위를 질의마다 끝냄
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stats = summarize(latencies)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "n": stats["n"],
+        "qps": stats["n"] / elapsed if elapsed else 0.0,
+        "p50_ms": stats["p50"],
+        "p95_ms": stats["p95"],
+        "p99_ms": stats["p99"],
+    }
+
+
+async def ingest(n: int, words: int) -> list[dict]:
+    rng = np.random.default_rng(7)
+    vocab = [f"w{i}" for i in range(5000)]
+    docs = [
+        DocumentCreate(id=f"{BENCH_PREFIX}ingest-{i}", content=" ".join(rng.choice(vocab, words)))
+        for i in range(n)
+    ]
+
+    async def items():
+        for i, doc in enumerate(docs):
+            yield i, doc
+
+    rows = []
+    for label in ("new", "unchanged"):
+        async with SessionLocal() as db:
+            started = time.perf_counter()
+            result = await upsert_docs_bulk(db, items())
+            elapsed = time.perf_counter() - started
+        rows.append({
+            "ingest": label,
+            "docs": n,
+            "seconds": elapsed,
+            "docs_per_s": n / elapsed if elapsed else 0.0,
+            "inserted": result.inserted,
+            "updated": result.updated,
+            "skipped": result.skipped,
+            "failed": result.failed,
+        })
+    return rows
+
+
+async def run(args: argparse.Namespace) -> None:
+    install(embedder="stub", encode_ms=args.encode_ms)
+
+    if args.reuse:
+        async with SessionLocal() as db:
+            sample = (await db.execute(
+                text("SELECT embedding FROM docs WHERE id LIKE :p LIMIT :n"),
+                {"p": f"{BENCH_PREFIX}%", "n": max(1000, args.queries)},
+            )).scalars().all()
+        if not sample:
+            raise SystemExit("no bench- rows to reuse; run once with --keep first")
+        # halfvec 저장이면 HalfVector 로 돌아옴
+        corpus = np.array([np.asarray(v.to_list() if hasattr(v, "to_list") else v, dtype=np.float32) for v in sample])
+        queries = query_vectors(corpus, args.queries)
+    else:
+        started = time.perf_counter()
+        corpus = await seed_corpus(args.docs)
+        print(f"seeded {args.docs} rows in {time.perf_counter() - started:.1f}s")
+        queries = truncate_embeddings(query_vectors(corpus, args.queries))
+
+    try:
+        if args.build_index:
+            await build_indexes()
+        modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+        levels = [int(c) for c in args.concurrency.split(",")]
+        search_rows = []
+        for mode in modes:
+            for level in levels:
+                get_query_cache().clear()
+                search_rows.append(await search_level(queries, mode, level, args.k))
+        ingest_rows = await ingest(args.ingest, args.doc_words) if args.ingest else []
+    finally:
+        if not args.keep and not args.reuse:
+            await drop_corpus()
+        elif args.ingest:
+            async with SessionLocal() as db:
+                await db.execute(text("DELETE FROM docs WHERE id LIKE :p"), {"p": f"{BENCH_PREFIX}ingest-%"})
+                await db.commit()
+        await app.embedding.get_batcher().stop()
+        await app.embedding.get_background_batcher().stop()
+
+    print(
+        f"docs={args.docs if not args.reuse else 'reused'} k={args.k} index={settings.vector_index_type} "
+        f"storage={settings.embedding_storage} quantization={settings.embedding_quantization} "
+        f"encode_ms={args.encode_ms}"
+    )
+    print_table(search_rows, list(search_rows[0]))
+    if ingest_rows:
+        print(f"\ningest batch_size={settings.ingest_batch_size}")
+        print_table(ingest_rows, list(ingest_rows[0]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10_000, help="synthetic corpus size (10k – 1M)")
+    parser.add_argument("--reuse", action="store_true", help="reuse bench- rows kept by an earlier --keep run")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic rows")
+    parser.add_argument("--build-index", action="store_true", help="run app.indexes build before searching")
+    parser.add_argument("--queries", type=int, default=300, help="queries per (mode, concurrency) level")
+    parser.add_argument("--concurrency", default="1,8")
+    parser.add_argument("--modes", default="vector,hybrid")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ingest", type=int, default=2000, help="documents for the ingestion check (0 = skip)")
+    parser.add_argument("--doc-words", type=int, default=150)
+    parser.add_argument("--encode-ms", type=float, default=0.0, help="simulated encode time per batch")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
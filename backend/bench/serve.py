@@ -0,0 +1,44 @@
+# bench/serve.py
+"""Run the API with the fake LLM (and optionally the stub embedder) for load tests.
+
+    python -m bench.serve --ttft-ms 300 --tokens-per-sec 60 --embedder stub
+    python -m bench.load --url http://127.0.0.1:8100 --scenario chat --concurrency 16
+
+It uses the same `.env` and database as the app, with a scratch DB_NAME
+recommended. Set ANSWER_CACHE_ENABLED=false to measure the full pipeline on
+every request, because with the stub embedder the same query text always
+gives the same vector.
+"""
+from __future__ import annotations
+
+import argparse
+
+import uvicorn
+
+from app.main import app
+from bench.fakes import FakeLLM, install
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="fake LLM time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=60.0, help="fake LLM streaming speed")
+    parser.add_argument("--reply-tokens", type=int, default=120)
+    parser.add_argument("--embedder", choices=["stub", "model"], default="stub",
+                        help="stub: deterministic hash vectors, model: EMBEDDING_MODEL_NAME")
+    parser.add_argument("--encode-ms", type=float, default=0.0, help="simulated encode time per stub batch")
+    args = parser.parse_args()
+
+    install(
+        llm=FakeLLM(ttft_ms=args.ttft_ms, tokens_per_sec=args.tokens_per_sec, reply_tokens=args.reply_tokens),
+        embedder=args.embedder,
+        encode_ms=args.encode_ms,
+    )
+    # 단일 프로세스: 패치가 워커 프로세스에 전달되지 않으므로 --workers 는 지원하지 않음
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# tests/conftest.py
+"""Offline test setup: no Postgres, model download or OpenAI key needed.
+
+`app.config.settings` requires the DB_* variables at import, so placeholders
+are set before any `app` module is imported (a local .env still wins). Tests
+that need a database use an in-memory SQLite engine (aiosqlite) with only the
+tables they touch.
+"""
+from __future__ import annotations
+
+import os
+
+for _name, _value in {
+    "DB_HOST": "localhost",
+    "DB_NAME": "test",
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+
+
+# JSONB 컬럼을 SQLite 에서도 만들 수 있도록 (값은 JSON 문자열로 저장)
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return "JSON"
@@ -0,0 +1,144 @@
+# tests/test_chat.py
+"""Chat round trips with the fake LLM on an in-memory SQLite database.
+
+Embedding and vector search are replaced with fixed results so the test only
+exercises session/history loading, prompt assembly and persistence.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.llm import registry
+from app.llm.fake import FakeLLM
+from app.models import ChatSession, Message
+from app.schemas import ChatRequest, MessageOut
+from app.services import chat
+
+_HITS = [{"id": "doc-1", "content": "The portfolio backend uses FastAPI and pgvector.", "score": 0.9}]
+
+
+class RecordingLLM(FakeLLM):
+    """FakeLLM 이 받은 messages 를 호출마다 남김"""
+
+    def __init__(self):
+        super().__init__(ttft_ms=0, tokens_per_sec=0, reply_tokens=8)
+        self.calls: list[list[dict[str, str]]] = []
+
+    async def acomplete(self, *, messages, **kwargs):
+        self.calls.append(messages)
+        return await super().acomplete(messages=messages, **kwargs)
+
+    async def astream(self, *, messages, **kwargs):
+        self.calls.append(messages)
+        async for delta in super().astream(messages=messages, **kwargs):
+            yield delta
+
+
+@pytest.fixture
+def llm(monkeypatch) -> RecordingLLM:
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    monkeypatch.setattr(settings, "summary_enabled", False)
+    monkeypatch.setattr(settings, "rerank_enabled", False)
+    monkeypatch.setattr(settings, "llm_routes", [])
+    monkeypatch.setattr(registry, "_providers", {})
+
+    async def embed(_text: str) -> list[float]:
+        return [0.1, 0.2, 0.3]
+
+    async def retrieve(*_args, **_kwargs) -> list[dict]:
+        return [dict(hit) for hit in _HITS]
+
+    monkeypatch.setattr(chat, "aembed_query", embed)
+    monkeypatch.setattr(chat, "_retrieve_hits", retrieve)
+    provider = RecordingLLM()
+    registry.install(provider)
+    return provider
+
+
+def _run(monkeypatch, scenario):
+    """scenario(make_session) 를 새 SQLite DB 위에서 한 이벤트 루프로 실행"""
+
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(ChatSession.__table__.create)
+            await conn.run_sync(Message.__table__.create)
+        make_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        monkeypatch.setattr(chat, "SessionLocal", make_session)
+        monkeypatch.setattr(chat, "ReadSessionLocal", make_session)
+        try:
+            return await scenario(make_session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _stored(make_session, session_id: str) -> list[tuple[str, str]]:
+    async with make_session() as db:
+        rows = await db.execute(
+            select(Message.role, Message.content).where(Message.session_id == session_id).order_by(Message.id)
+        )
+        return [tuple(row) for row in rows]
+
+
+def test_ask_llm_two_turns_on_one_session(monkeypatch, llm):
+    async def scenario(make_session):
+        async with make_session() as db:
+            first = await chat.ask_llm(db, ChatRequest(message="백엔드 스택이 뭐야?"))
+        async with make_session() as db:
+            second = await chat.ask_llm(db, ChatRequest(session_id=first.session_id, message="DB 는?"))
+        return first, second, await _stored(make_session, first.session_id)
+
+    first, second, stored = _run(monkeypatch, scenario)
+
+    assert second.session_id == first.session_id
+    assert first.sources == second.sources == ["doc-1"]
+    assert [role for role, _ in stored] == ["user", "assistant", "user", "assistant"]
+    assert stored[1][1] == first.reply and stored[3][1] == second.reply
+    # 두 번째 턴의 프롬프트에는 첫 턴의 질문/답변이 히스토리로 들어감
+    assert llm.calls[1][:2] == [
+        {"role": "user", "content": "백엔드 스택이 뭐야?"},
+        {"role": "assistant", "content": first.reply},
+    ]
+    assert llm.calls[1][-1]["role"] == "user" and llm.calls[1][-1]["content"].startswith("DB 는?")
+
+
+def test_stream_llm_continues_a_session(monkeypatch, llm):
+    async def consume(payload: ChatRequest) -> list[str]:
+        return [event async for event in await chat.stream_llm(payload)]
+
+    async def scenario(make_session):
+        async with make_session() as db:
+            first = await chat.ask_llm(db, ChatRequest(message="안녕"))
+        events = await consume(ChatRequest(session_id=first.session_id, message="이어서 설명해줘"))
+        return first, events, await _stored(make_session, first.session_id)
+
+    first, events, stored = _run(monkeypatch, scenario)
+
+    assert events[0].startswith("event: sources") and events[-1].startswith("event: done")
+    assert not any(event.startswith("event: error") for event in events)
+    assert len(stored) == 4 and stored[2] == ("user", "이어서 설명해줘")
+    assert llm.calls[1][0] == {"role": "user", "content": "안녕"}
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 12, 30, 45, 123456, tzinfo=timezone.utc)
+    message = MessageOut(id=42, session_id="s", role="user", content="hi", created_at=created_at)
+    cursor = chat._encode_cursor(message)
+
+    assert "=" not in cursor and "|" not in cursor  # URL 에 그대로 쓰는 토큰
+    assert chat._decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "MjAyNi0wMy0wMQ", "Zm9vfGJhcg"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="invalid cursor"):
+        chat._decode_cursor(cursor)
@@ -0,0 +1,88 @@
+# tests/test_chunking.py
+"""`chunk_text` with a character-based token counter (no model tokenizer)."""
+from __future__ import annotations
+
+from app.chunking import Chunker, _window_starts, chunk_text
+
+
+def _count(text: str) -> int:
+    # 대략 4자 = 1토큰
+    return (len(text) + 3) // 4
+
+
+def _chunks(text: str, **kwargs):
+    kwargs.setdefault("count_tokens", _count)
+    return list(chunk_text(text, **kwargs))
+
+
+def test_chunks_stay_within_max_tokens_and_keep_order():
+    paragraphs = [f"Paragraph {i} " + " ".join(["word"] * 30) for i in range(20)]
+    chunks = _chunks("\n\n".join(paragraphs), max_tokens=100, overlap_tokens=0)
+
+    assert len(chunks) > 1
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+    assert all(_count(c.text) <= 100 for c in chunks)
+    # 오버랩이 없으면 모든 문단이 순서대로 정확히 한 번씩
+    assert "\n\n".join(c.text for c in chunks) == "\n\n".join(paragraphs)
+
+
+def test_overlap_repeats_trailing_blocks():
+    paragraphs = [f"Block {i}: " + "x" * 60 for i in range(10)]
+    chunks = _chunks("\n\n".join(paragraphs), max_tokens=60, overlap_tokens=20)
+
+    assert len(chunks) > 1
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert nxt.text.startswith(prev.text.split("\n\n")[-1])
+
+
+def test_headings_start_a_new_chunk_without_overlap():
+    text = "# Intro\nhello there\n\n## Setup\ninstall things\n\n## Usage\nrun it"
+    chunks = _chunks(text, max_tokens=200, overlap_tokens=50)
+
+    assert [c.section for c in chunks] == ["Intro", "Setup", "Usage"]
+    assert chunks[1].text == "## Setup\n\ninstall things"
+    assert "hello" not in chunks[1].text
+
+
+def test_fenced_code_is_one_block():
+    text = "intro\n\n```python\ndef f():\n\n    return 1\n```\n\noutro"
+    chunks = _chunks(text, max_tokens=200)
+
+    assert len(chunks) == 1
+    assert "```python\ndef f():\n\n    return 1\n```" in chunks[0].text
+
+
+def test_long_sentences_are_split_on_words():
+    text = " ".join(f"w{i:04d}" for i in range(400))  # 문장 경계 없는 긴 문단
+    chunks = _chunks(text, max_tokens=50, overlap_tokens=0)
+
+    assert all(_count(c.text) <= 50 for c in chunks)
+    assert " ".join(c.text for c in chunks).split() == text.split()
+
+
+def test_whitespace_free_run_is_cut_into_windows():
+    blob = "QUJD" * 1000  # 인라인 base64 처럼 공백 없는 4000자
+    chunks = _chunks(f"before\n\n{blob}\n\nafter", max_tokens=64, overlap_tokens=0)
+
+    assert all(_count(c.text) <= 64 for c in chunks)
+    assert "".join(c.text for c in chunks).replace("\n\n", "") == f"before{blob}after"
+
+
+def test_token_windows_are_used_for_long_words():
+    calls = []
+
+    def windows(text: str, size: int, overlap: int) -> list[str]:
+        calls.append((size, overlap))
+        return [text[i:i + size] for i in range(0, len(text), size - overlap)]
+
+    chunker = Chunker(max_tokens=32, overlap_tokens=8, count_tokens=len, token_windows=windows)
+    chunks = list(chunker.feed("z" * 100, None)) + list(chunker.flush())
+
+    assert calls == [(32, 8)]
+    assert chunks and all(len(block) <= 32 for c in chunks for block in c.text.split("\n\n"))
+
+
+def test_window_starts_cover_the_end_without_empty_tail():
+    assert list(_window_starts(10, 4, 1)) == [0, 3, 6]
+    assert list(_window_starts(3, 4, 1)) == [0]
+    assert list(_window_starts(0, 4, 1)) == [0]
@@ -0,0 +1,72 @@
+# tests/test_embedding_cache.py
+"""In-process query embedding cache: LRU order, byte budget, TTL and keys."""
+from __future__ import annotations
+
+from app import embedding_cache
+from app.embedding_cache import QueryEmbeddingCache, cache_key
+
+
+def _cache(**kwargs) -> QueryEmbeddingCache:
+    kwargs.setdefault("max_entries", 3)
+    kwargs.setdefault("max_bytes", 1 << 20)
+    kwargs.setdefault("ttl_seconds", 0)
+    return QueryEmbeddingCache(**kwargs)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = _cache()
+    for key in "abc":
+        cache.put(key, [1.0, 2.0])
+    assert cache.get("a") == [1.0, 2.0]  # a 를 최근으로
+    cache.put("d", [3.0, 4.0])
+
+    assert cache.get("b") is None
+    assert [cache.get(k) is not None for k in "acd"] == [True, True, True]
+    assert cache.evictions == 1
+
+
+def test_byte_budget_evicts_before_entry_limit():
+    cache = _cache(max_entries=100, max_bytes=4 * 8)  # float32 8개
+    cache.put("a", [0.0] * 4)
+    cache.put("b", [0.0] * 4)
+    cache.put("c", [0.0] * 4)
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 4 * 8
+
+
+def test_put_replaces_an_existing_key():
+    cache = _cache()
+    cache.put("a", [1.0])
+    cache.put("a", [2.0])
+
+    assert cache.get("a") == [2.0]
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 4
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: now[0])
+    cache = _cache(ttl_seconds=60)
+    cache.put("a", [1.0])
+
+    now[0] += 59
+    assert cache.get("a") == [1.0]
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_zero_limits_disable_the_cache():
+    cache = _cache(max_entries=0)
+    cache.put("a", [1.0])
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+
+
+def test_cache_key_normalizes_whitespace_and_width_but_not_model():
+    assert cache_key("  소개해 줘 ") == cache_key("소개해 줘")
+    assert cache_key("ＡＢＣ") == cache_key("ABC")  # NFKC 전각 → 반각
+    assert cache_key("abc") != cache_key("abd")
+    assert cache_key("abc", model="m1") != cache_key("abc", model="m2")
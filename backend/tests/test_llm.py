@@ -0,0 +1,110 @@
+# tests/test_llm.py
+"""Per-provider concurrency limiting (`ConcurrencyLimiter` / `LimitedProvider`) with the fake LLM."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.llm.base import ConcurrencyLimiter, LimitedProvider, LLMBusyError
+from app.llm.fake import FakeLLM
+
+
+def _limiter(**kwargs) -> ConcurrencyLimiter:
+    kwargs.setdefault("max_concurrency", 1)
+    kwargs.setdefault("max_queue", 1)
+    kwargs.setdefault("queue_timeout", 5)
+    return ConcurrencyLimiter("test", **kwargs)
+
+
+async def _hold(limiter: ConcurrencyLimiter, release: asyncio.Event) -> None:
+    async with limiter.slot():
+        await release.wait()
+
+
+def test_full_queue_is_rejected_without_waiting():
+    async def main():
+        limiter = _limiter()
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(limiter, release))
+        queued = asyncio.create_task(_hold(limiter, release))
+        await asyncio.sleep(0.01)
+        assert (limiter.in_flight, limiter.waiting) == (1, 1)
+
+        with pytest.raises(LLMBusyError) as exc:
+            async with limiter.slot():
+                pass
+        assert exc.value.retry_after >= 1 and exc.value.reason == "busy"
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return limiter.stats()
+
+    stats = asyncio.run(main())
+    assert stats["rejected"] == 1 and stats["completed"] == 2
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0
+
+
+def test_waiting_longer_than_queue_timeout_is_rejected():
+    async def main():
+        limiter = _limiter(queue_timeout=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(limiter, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMBusyError):
+            async with limiter.slot():
+                pass
+        release.set()
+        await running
+        # 타임아웃 뒤에도 슬롯이 새지 않음
+        async with limiter.slot():
+            pass
+        return limiter.stats()
+
+    stats = asyncio.run(main())
+    assert stats["timed_out"] == 1 and stats["waiting"] == 0 and stats["completed"] == 2
+
+
+def test_upstream_rate_limit_starts_a_cooldown():
+    async def main():
+        limiter = _limiter(max_concurrency=4)
+        with pytest.raises(LLMBusyError):
+            async with limiter.slot():
+                raise LLMBusyError("test", 30, "rate limited")
+        with pytest.raises(LLMBusyError) as exc:
+            limiter.check()
+        return limiter, exc.value
+
+    limiter, error = asyncio.run(main())
+    assert error.reason == "rate limited" and 29 <= error.retry_after <= 30
+    assert limiter.upstream_limited == 1 and limiter.rejected == 1
+
+
+class CountingLLM(FakeLLM):
+    """동시에 실행 중인 acomplete 수의 최댓값을 기록"""
+
+    def __init__(self):
+        super().__init__(ttft_ms=20, tokens_per_sec=0, reply_tokens=3)
+        self.active = self.peak = 0
+
+    async def acomplete(self, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().acomplete(**kwargs)
+        finally:
+            self.active -= 1
+
+
+def test_limited_provider_caps_concurrent_calls():
+    inner = CountingLLM()
+    provider = LimitedProvider(inner, _limiter(max_concurrency=2, max_queue=10))
+
+    async def main():
+        calls = (provider.acomplete(messages=[{"role": "user", "content": f"q{i}"}]) for i in range(6))
+        return await asyncio.gather(*calls)
+
+    replies = asyncio.run(main())
+    assert all(len(reply.split()) == 3 for reply in replies)
+    assert inner.peak == 2
+    assert provider.limiter.stats()["completed"] == 6 and provider.limiter.rejected == 0
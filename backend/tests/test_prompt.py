@@ -0,0 +1,86 @@
+# tests/test_prompt.py
+"""`assemble` budget trimming. Budgets are derived from `count_tokens` so the
+assertions hold for whichever tiktoken encoding OPENAI_MODEL_NAME maps to."""
+from __future__ import annotations
+
+from app.prompt import _MESSAGE_OVERHEAD, assemble, count_tokens
+
+SYSTEM = "You are a test assistant."
+
+
+def _cost(text: str) -> int:
+    return count_tokens(text) + _MESSAGE_OVERHEAD
+
+
+def _history(turns: int) -> list[tuple[str, str]]:
+    history = []
+    for i in range(turns):
+        history.append(("user", f"question number {i} about the deployment pipeline"))
+        history.append(("assistant", f"answer number {i}: it builds, tests and ships the containers"))
+    return history
+
+
+def test_everything_fits_in_a_large_budget():
+    history = _history(3)
+    prompt = assemble(SYSTEM, history, "latest?", [], budget=10_000)
+
+    assert prompt.messages[:-1] == [{"role": r, "content": c} for r, c in history]
+    assert prompt.messages[-1] == {"role": "user", "content": "latest?"}
+    assert prompt.usage["history_dropped"] == 0
+    assert prompt.usage["input"] <= 10_000
+
+
+def test_history_is_trimmed_oldest_first_within_budget():
+    history = _history(10)
+    keep = history[-4:]
+    budget = _cost(SYSTEM) + _cost("latest?") + sum(_cost(c) for _, c in keep)
+    prompt = assemble(SYSTEM, history, "latest?", [], budget=budget)
+
+    assert prompt.messages[:-1] == [{"role": r, "content": c} for r, c in keep]
+    assert prompt.usage["history_dropped"] == len(history) - len(keep)
+    assert prompt.usage["input"] <= budget
+
+
+def test_trimmed_history_never_starts_with_an_assistant_reply():
+    history = _history(5)
+    # 마지막 3개(assistant, user, assistant)만 들어가는 예산 → 앞의 assistant 는 버려짐
+    budget = _cost(SYSTEM) + _cost("latest?") + sum(_cost(c) for _, c in history[-3:])
+    prompt = assemble(SYSTEM, history, "latest?", [], budget=budget)
+
+    assert prompt.messages[0]["role"] == "user"
+    assert prompt.messages[:-1] == [{"role": r, "content": c} for r, c in history[-2:]]
+
+
+def test_summary_is_always_kept_first():
+    prompt = assemble(SYSTEM, _history(10), "latest?", [], budget=_cost(SYSTEM) + 200, summary="We discussed CI.")
+
+    assert prompt.messages[0]["role"] == "system"
+    assert "We discussed CI." in prompt.messages[0]["content"]
+    assert prompt.usage["summary"] > 0
+
+
+def test_chunks_are_deduplicated_truncated_and_limited():
+    long_text = " ".join(f"token{i}" for i in range(400))
+    hits = [
+        {"id": "a", "content": "Postgres stores the vectors in a HNSW index for fast search."},
+        {"id": "dup", "content": "Postgres stores the vectors in a HNSW index for fast search."},
+        {"id": "long", "content": long_text},
+        {"id": "c", "content": "The frontend is written in React and talks to FastAPI."},
+    ]
+    prompt = assemble(SYSTEM, [], "where are vectors stored?", hits, budget=10_000, context_max=10_000, chunk_max=50)
+
+    assert prompt.sources == ["a", "long", "c"]
+    assert prompt.usage["chunks_deduped"] == 1
+    assert prompt.usage["chunks_truncated"] == 1
+    assert "[1] Postgres" in prompt.messages[-1]["content"]
+    assert "token399" not in prompt.messages[-1]["content"]
+
+
+def test_context_budget_drops_lower_ranked_chunks():
+    hits = [{"id": str(i), "content": f"distinct passage {i} " + "filler " * 40} for i in range(5)]
+    one = count_tokens(f"[1] {hits[0]['content'].strip()}") + 2
+    prompt = assemble(SYSTEM, [], "q", hits, budget=10_000, context_max=one * 2 + 1)
+
+    assert prompt.sources == ["0", "1"]
+    assert prompt.usage["chunks_dropped"] == 3
+    assert prompt.usage["context"] <= one * 2 + 1